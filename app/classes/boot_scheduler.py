@@ -0,0 +1,53 @@
+import asyncio
+import time
+from typing import Iterable
+
+# Seconds Discord wants between two identifies in the same bucket
+IDENTIFY_INTERVAL = 5
+
+
+class BootScheduler:
+    """Starts clusters in parallel, without letting two clusters identify
+    shards in the same bucket at the same time.
+
+    Discord allows one identify per bucket every 5 seconds, where a
+    shard's bucket is shard_id % max_concurrency. A cluster holds the
+    buckets of all of its shards until it is ready."""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.busy: set[int] = set()
+        # bucket -> time.monotonic() at which it may identify again
+        self.free_at: dict[int, float] = {}
+        self.cond = asyncio.Condition()
+
+    def buckets(self, shard_ids: Iterable[int]) -> set[int]:
+        return {s % self.max_concurrency for s in shard_ids}
+
+    async def _acquire(self, buckets: set[int]) -> None:
+        async with self.cond:
+            await self.cond.wait_for(lambda: not buckets & self.busy)
+            self.busy |= buckets
+        delay = (
+            max(self.free_at.get(b, 0.0) for b in buckets) - time.monotonic()
+        )
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _release(self, buckets: set[int]) -> None:
+        async with self.cond:
+            self.busy -= buckets
+            free_at = time.monotonic() + IDENTIFY_INTERVAL
+            for bucket in buckets:
+                self.free_at[bucket] = free_at
+            self.cond.notify_all()
+
+    async def start(self, cluster) -> bool:
+        """Waits for the cluster's buckets to be free, then starts it and
+        waits for it to be ready. Returns whether it started."""
+        buckets = self.buckets(cluster.shard_ids)
+        await self._acquire(buckets)
+        try:
+            return await cluster.start()
+        finally:
+            await self._release(buckets)
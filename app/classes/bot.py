@@ -19,13 +19,20 @@ from pretty_help import PrettyHelp
 from app import i18n
 from app.classes.context import CustomContext
 from app.classes.ipc_connection import WebsocketConnection
+from app.classes.point_counter import PointCounter
+from app.classes.profiler import Profiler
+from app.classes.regex_engine import RegexEngine
 from app.i18n.i18n import t_
 from app.menus import HelpMenu
 
 from ..database.database import Database
 
+# Seconds between the heartbeats sent to the launcher
+HEARTBEAT_INTERVAL = 5
+
 if typing.TYPE_CHECKING:
     from app.cogs.cache.cache import Cache
+    from app.cogs.leveling.xp_buffer import XPBuffer
 
 load_dotenv()
 
@@ -76,8 +83,15 @@ class Bot(commands.AutoShardedBot):
         self.stats = {}
         self.locale_cache = {}
         self.to_cleanup: dict[int, LimitedList] = {}
+        self.point_counter = PointCounter()
+        self.regex = RegexEngine()
+        self.profiler = Profiler(loop)
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        # Seconds the event loop was late to run the last heartbeat
+        self.loop_lag = 0.0
 
         self.cache: "Cache"
+        self.xp_buffer: "XPBuffer"
 
         super().__init__(
             help_command=PrettyHelp(
@@ -114,11 +128,16 @@ class Bot(commands.AutoShardedBot):
         self.pipe = kwargs.pop("pipe")
         self.slash = SlashCommand(self, override_type=True, sync_commands=True)
         self.websocket = WebsocketConnection(
-            self.cluster_name, self.handle_websocket_command, self.loop
+            self.cluster_name,
+            self.handle_websocket_command,
+            self.loop,
+            shard_ids=kwargs["shard_ids"],
+            shard_count=kwargs["shard_count"],
         )
 
         self.loop.run_until_complete(self.websocket.ensure_connection())
         self.loop.run_until_complete(self.db.init_database())
+        self.db.configs.on_change = self.send_config_change
 
         self.log.info(
             f'[Cluster#{self.cluster_name}] {kwargs["shard_ids"]}, '
@@ -129,6 +148,7 @@ class Bot(commands.AutoShardedBot):
             self.load_extension(ext)
 
         self.loop.run_until_complete(self.set_session())
+        self.profiler.start()
 
         try:
             self.run(kwargs["token"])
@@ -206,6 +226,52 @@ class Bot(commands.AutoShardedBot):
             return commands.when_mentioned_or(*prefixes)(bot, message)
         return prefixes
 
+    def dispatch(self, event_name: str, *args, **kwargs) -> None:
+        self.profiler.count_event(event_name)
+        super().dispatch(event_name, *args, **kwargs)
+
+    def _schedule_event(self, coro, event_name: str, *args, **kwargs):
+        # Every listener, including those of cogs, is scheduled here
+        return super()._schedule_event(
+            self.profiler.timed(coro), event_name, *args, **kwargs
+        )
+
+    def start_heartbeat(self) -> None:
+        if self.heartbeat_task is None:
+            self.heartbeat_task = self.loop.create_task(self.send_heartbeats())
+
+    async def send_heartbeats(self) -> None:
+        """Tells the launcher that the event loop is still running. A
+        blocked loop stops sending them, and the launcher restarts it."""
+        while not self.is_closed():
+            start = self.loop.time()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            self.loop_lag = self.loop.time() - start - HEARTBEAT_INTERVAL
+            try:
+                self.pipe.send(("heartbeat", self.loop_lag))
+            except (BrokenPipeError, OSError):
+                return
+
+    def send_config_change(self, change: dict[str, int]) -> None:
+        """Tells the other clusters and the dashboard that a config
+        changed, so that they drop their cached copy."""
+        self.profiler.create_task(
+            "config invalidations", self._send_config_change(change)
+        )
+
+    async def _send_config_change(self, change: dict[str, int]) -> None:
+        try:
+            await self.websocket.send_command("config_invalidate", change)
+        except Exception as e:
+            self.dispatch(
+                "log_error", "Error sending config change", e, [change]
+            )
+
+    def request_restart(self, mode: str) -> None:
+        """Asks the launcher to restart the clusters. See
+        Launcher.on_cluster_message for the modes."""
+        self.pipe.send(("restart", mode))
+
     def cleanup_code(self, content):
         """Automatically removes code blocks from the code."""
         # remove ```py\n```
@@ -216,10 +282,16 @@ class Bot(commands.AutoShardedBot):
         return content.strip("` \n")
 
     async def close(self, *args, **kwargs):
+        # Only set once the leveling extension has loaded
+        xp_buffer = getattr(self, "xp_buffer", None)
+        if xp_buffer is not None:
+            await xp_buffer.close()
         await self.db.pool.close()
         await self.session.close()
         self.log.info("shutting down")
         await self.websocket.close()
+        self.regex.close()
+        self.profiler.stop()
         await super().close()
 
     async def exec(self, code):
@@ -285,11 +357,12 @@ class Bot(commands.AutoShardedBot):
             else:
                 ret = False
         elif cmd == "channel_names":
+            # Keys are strings, whichever codec the IPC connection uses
             ret = {}
             for cid in data["channel_ids"]:
                 obj = self.get_channel(cid)
                 if obj:
-                    ret[cid] = obj.name
+                    ret[str(cid)] = obj.name
         elif cmd == "guild_channels":
             guild = self.get_guild(data["guild_id"])
             ret = {}
@@ -297,7 +370,23 @@ class Bot(commands.AutoShardedBot):
                 for c in guild.text_channels:
                     key = str(c.category or "No Category")
                     ret.setdefault(key, {})
-                    ret[key][c.id] = c.name
+                    ret[key][str(c.id)] = c.name
+        elif cmd == "sql_stats":
+            ret = self.db.sql_stats.export()
+        elif cmd == "profile":
+            ret = self.profiler.export()
+        elif cmd == "cache_stats":
+            ret = self.cache.message_stats.to_dict()
+        elif cmd == "config_invalidate":
+            # Every client gets it, including the one that sent it
+            if msg["author"] != self.cluster_name:
+                self.db.configs.apply_change(data)
+        elif cmd == "xpr_stats":
+            ret = self.get_cog("XPREvents").stats()
+        elif cmd == "update_queue_stats":
+            ret = self.get_cog("StarboardEvents").queue.stats()
+        elif cmd == "xp_buffer_stats":
+            ret = self.xp_buffer.stats()
         elif cmd == "donate_event":
             self.dispatch("donatebot_event", data["data"], data["auth"])
         elif cmd == "update_prem_roles":
@@ -2,11 +2,13 @@ import logging
 import multiprocessing
 import os
 import signal
+import time
+from typing import Any
 
 from discord import AllowedMentions, Intents
 
 import config
-from app.classes.bot import Bot
+from app.classes.bot import HEARTBEAT_INTERVAL, Bot
 from app.utils import webhooklog
 
 INTENTS = Intents(
@@ -36,6 +38,18 @@ class Cluster:
             chunk_guilds_at_startup=False,
         )
         self.name = name
+        self.shard_ids = shard_ids
+        # Seconds the last start took, from spawning the process until
+        # the bot was ready
+        self.boot_time = None
+
+        # The launcher's end of the pipe, once the bot is ready
+        self.pipe = None
+        self.last_heartbeat = 0.0
+        self.loop_lag = 0.0
+        # Set while the launcher is stopping or starting the cluster, so
+        # that the supervisor leaves it alone
+        self.restarting = False
         self.log = logging.getLogger(f"Cluster#{name}")
         self.log.setLevel(logging.DEBUG)
         hdlr = logging.StreamHandler()
@@ -70,21 +84,88 @@ class Cluster:
             UPTIME_HOOK,
         )
 
+        self.pipe = None
         stdout, stdin = multiprocessing.Pipe()
         kw = self.kwargs
         kw["pipe"] = stdin
         self.process = multiprocessing.Process(
             target=Bot, kwargs=kw, daemon=True
         )
+        start = time.perf_counter()
         self.process.start()
+        # Only the child should hold this end, so that recv raises
+        # EOFError instead of blocking forever if the child dies
+        stdin.close()
         self.log.info(f"Process started with PID {self.process.pid}")
 
-        if await self.launcher.loop.run_in_executor(None, stdout.recv) == 1:
+        try:
+            ready = await self.launcher.loop.run_in_executor(None, stdout.recv)
+        except EOFError:
+            ready = None
+        if ready != 1:
             stdout.close()
-            self.log.info("Process started successfully")
+            self.log.error(
+                f"Process exited before it was ready "
+                f"(exit code {self.process.exitcode})"
+            )
+            return False
 
+        self.boot_time = time.perf_counter() - start
+        self.pipe = stdout
+        self.last_heartbeat = time.monotonic()
+        self.log.info(f"Process started successfully in {self.boot_time:.1f}s")
         return True
 
+    def read_pipe(self) -> list[Any]:
+        """Reads everything the bot sent since the last call, and returns
+        the messages that aren't heartbeats."""
+        messages = []
+        if self.pipe is None:
+            return messages
+        try:
+            while self.pipe.poll():
+                msg = self.pipe.recv()
+                if isinstance(msg, tuple) and msg[0] == "heartbeat":
+                    self.last_heartbeat = time.monotonic()
+                    self.loop_lag = msg[1]
+                else:
+                    messages.append(msg)
+        except (EOFError, OSError):
+            # The process died, which the supervisor notices on its own
+            self.pipe.close()
+            self.pipe = None
+        return messages
+
+    def is_responsive(self, missed: int) -> bool:
+        """Whether the bot sent a heartbeat within the last `missed`
+        heartbeat intervals."""
+        return time.monotonic() - self.last_heartbeat < (
+            missed * HEARTBEAT_INTERVAL
+        )
+
+    async def stop_gracefully(self, timeout: float = 30) -> None:
+        """Lets the bot close its connections, and kills it if it doesn't
+        exit within `timeout` seconds."""
+        self.log.info("Shutting down gracefully")
+        webhooklog(
+            f":brown_circle: Cluster **{self.name}** shutting down...",
+            UPTIME_HOOK,
+        )
+        if self.pipe:
+            self.pipe.close()
+            self.pipe = None
+        try:
+            os.kill(self.process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        await self.launcher.loop.run_in_executor(
+            None, self.process.join, timeout
+        )
+        if self.process.is_alive():
+            self.log.warning(f"Did not exit after {timeout}s, killing it")
+            self.process.kill()
+            await self.launcher.loop.run_in_executor(None, self.process.join)
+
     def stop(self, sign=signal.SIGINT):
         self.log.info(f"Shutting down with signal {sign!r}")
         webhooklog(
@@ -0,0 +1,143 @@
+import json
+import zlib
+from typing import Any, Optional, Union
+
+import msgpack
+
+# Frames larger than this are compressed by codecs that support it
+COMPRESS_THRESHOLD = 1024
+
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+
+
+class JsonCodec:
+    """The original format. Used with clients and servers that don't
+    negotiate a codec."""
+
+    name = "json"
+
+    def encode(self, msg: Any) -> bytes:
+        return json.dumps(msg).encode("utf-8")
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """msgpack, prefixed with a byte that says whether the rest of the
+    frame is zlib-compressed."""
+
+    name = "msgpack"
+
+    def __init__(self, compress_threshold: int = COMPRESS_THRESHOLD):
+        self.compress_threshold = compress_threshold
+
+    def encode(self, msg: Any) -> bytes:
+        data = msgpack.packb(msg, use_bin_type=True)
+        if len(data) > self.compress_threshold:
+            return _ZLIB + zlib.compress(data, 1)
+        return _RAW + data
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str):
+            # Never sent by a client that negotiated msgpack, but keeps a
+            # misbehaving one from crashing the connection
+            return json.loads(data)
+        payload = data[1:]
+        if data[:1] == _ZLIB:
+            payload = zlib.decompress(payload)
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+CODECS = {codec.name: codec for codec in (MsgpackCodec(), JsonCodec())}
+# Most preferred first. The pure-Python fallback of msgpack is several
+# times slower than json, so it's only preferred when compiled.
+PREFERENCE = (
+    ["msgpack", "json"]
+    if msgpack.Packer.__module__ != "msgpack.fallback"
+    else ["json", "msgpack"]
+)
+DEFAULT = CODECS["json"]
+
+
+def negotiate(offered: Optional[list[str]]):
+    """Picks the first codec in PREFERENCE that the other side offered.
+    Peers that don't offer any codecs only know JSON."""
+    for name in PREFERENCE:
+        if name in (offered or ()):
+            return CODECS[name]
+    return DEFAULT
+
+
+def _benchmark(runs: int = 2000) -> None:
+    """Compares the codecs on payloads shaped like the real commands."""
+    import timeit
+
+    def command(name, data):
+        return {
+            "type": "command",
+            "name": name,
+            "respond": True,
+            "callback": "1234",
+            "data": data,
+            "author": "Alpha (0)",
+            "to": None,
+            "guild_id": None,
+        }
+
+    def response(data):
+        return {
+            "type": "response",
+            "callback": "1234",
+            "data": data,
+            "author": "Beta (1)",
+            "to": "Dashboard",
+            "empty": False,
+        }
+
+    guild_ids = [800000000000000000 + x * 7919 for x in range(200)]
+    channels = {
+        f"Category {c}": {
+            str(800000000000000000 + c * 100 + x): f"channel-{c}-{x}"
+            for x in range(20)
+        }
+        for c in range(10)
+    }
+    samples = {
+        "set_stats": command(
+            "set_stats", {"guild_count": 12345, "member_count": 9876543}
+        ),
+        "is_mutual": response(True),
+        "get_mutual (200 guilds)": command("get_mutual", guild_ids),
+        "get_mutual response": response(guild_ids[:120]),
+        "channel_names response": response(
+            {str(g): f"starboard-{x}" for x, g in enumerate(guild_ids[:10])}
+        ),
+        "guild_channels response": response(channels),
+        "eval response": response("None"),
+    }
+
+    codecs = [
+        ("json", JsonCodec()),
+        ("msgpack", MsgpackCodec(compress_threshold=2**62)),
+        ("msgpack+z", MsgpackCodec()),
+    ]
+    print(f"msgpack implementation: {msgpack.Packer.__module__}")
+    print(
+        f"{'payload':<26}{'codec':<11}{'bytes':>8}{'enc us':>9}{'dec us':>9}"
+    )
+    for label, msg in samples.items():
+        for name, codec in codecs:
+            data = codec.encode(msg)
+            assert codec.decode(data) == msg
+            enc = timeit.timeit(lambda: codec.encode(msg), number=runs)
+            dec = timeit.timeit(lambda: codec.decode(data), number=runs)
+            print(
+                f"{label:<26}{name:<11}{len(data):>8}"
+                f"{enc / runs * 1e6:>9.1f}{dec / runs * 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    _benchmark()
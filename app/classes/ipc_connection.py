@@ -1,14 +1,58 @@
 import asyncio
 import json
+import logging
 import pathlib
 import ssl
+import time
 from typing import Any, Callable, Optional
 
 import websockets
 
+from app.classes import ipc_codec
+
 SSL_CONTEXT = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
 SSL_CONTEXT.load_verify_locations(pathlib.Path("localhost.pem"))
 
+log = logging.getLogger("IPC")
+
+
+class Responses(list):
+    """The responses to a command. `missing` lists the clients that
+    didn't respond before the deadline."""
+
+    def __init__(self, responses: list[dict[str, Any]], missing: list[str]):
+        super().__init__(responses)
+        self.missing = missing
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+class _Gather:
+    __slots__ = ("expected", "responded", "responses", "future", "sent")
+
+    def __init__(self, expected: list[str], future: asyncio.Future):
+        self.expected = expected
+        self.responded: set[str] = set()
+        self.responses: list[dict[str, Any]] = []
+        self.future = future
+        self.sent = time.perf_counter()
+
+
+class ResponderStats:
+    __slots__ = ("responses", "total", "max", "missed")
+
+    def __init__(self):
+        self.responses = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.missed = 0
+
+    @property
+    def average(self) -> float:
+        return self.total / self.responses if self.responses else 0.0
+
 
 class WebsocketConnection:
     def __init__(
@@ -16,21 +60,43 @@ class WebsocketConnection:
         name: str,
         on_command: Callable[[dict[str, Any]], Any],
         loop: Optional[asyncio.AbstractEventLoop] = None,
+        shard_ids: Optional[list[int]] = None,
+        shard_count: Optional[int] = None,
     ):
         self.on_command = on_command
+        # Lets the IPC server route messages for a guild to this client
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
 
-        self.callbacks: dict[str, list[dict[str, Any]]] = {}
+        self.callbacks: dict[str, _Gather] = {}
         self.current_callback = 0
 
+        # Names of every client connected to the IPC server, including
+        # this one. Kept up to date by the server.
+        self.clients: list[str] = []
+        self.responder_stats: dict[str, ResponderStats] = {}
+
         self.websocket: Optional[websockets.WebSocketCommonProtocol] = None
+        # Chosen by the IPC server during the handshake
+        self.codec = ipc_codec.DEFAULT
         self.loop = loop or asyncio.get_event_loop()
         self.task = None
 
         self.name_id = name
 
     async def send_command(
-        self, name: str, data: dict, expect_resp: bool = False
-    ) -> Optional[list[dict[str, Any]]]:
+        self,
+        name: str,
+        data: dict,
+        expect_resp: bool = False,
+        timeout: float = 5.0,
+        to: Optional[str] = None,
+        guild_id: Optional[int] = None,
+    ) -> Optional[Responses]:
+        """Sends a command to the client named `to`, the cluster that has
+        `guild_id`, or otherwise every client. If expect_resp is True,
+        waits until every recipient has responded or the timeout has
+        passed, and returns the responses that arrived."""
         if not self.websocket:
             raise Exception("Websocket not initialized.")
 
@@ -41,24 +107,95 @@ class WebsocketConnection:
             "callback": self._next_callback() if expect_resp else None,
             "data": data,
             "author": self.name_id,
+            "to": to,
+            "guild_id": guild_id,
         }
 
-        if expect_resp:
-            self.callbacks[to_send["callback"]] = []
+        if not expect_resp:
+            await self._send(to_send)
+            return None
+
+        # Until the server says who the command was routed to
+        expected = [to] if to else list(self.clients)
+        gather = _Gather(expected, self.loop.create_future())
+        self.callbacks[to_send["callback"]] = gather
+        try:
+            if not await self._send(to_send):
+                return None
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(gather.future), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            self.callbacks.pop(to_send["callback"], None)
+
+        missing = [c for c in gather.expected if c not in gather.responded]
+        if missing:
+            for client in missing:
+                self._stats(client).missed += 1
+            log.warning(
+                f"{name}: no response from {', '.join(missing)} "
+                f"after {timeout}s"
+            )
+        return Responses(gather.responses, missing)
 
+    async def _send(self, to_send: dict[str, Any]) -> bool:
         try:
-            await self.websocket.send(json.dumps(to_send).encode("utf-8"))
+            await self.websocket.send(self.codec.encode(to_send))
         except websockets.ConnectionClosed as exc:
             if exc.code == 1000:
-                return None
+                return False
             raise
+        return True
+
+    def _stats(self, client: str) -> ResponderStats:
+        stats = self.responder_stats.get(client)
+        if stats is None:
+            stats = self.responder_stats[client] = ResponderStats()
+        return stats
+
+    def _on_response(self, msg: dict[str, Any]) -> None:
+        # Callback ids are only unique per client
+        if msg.get("to") not in (None, self.name_id):
+            return
+        gather = self.callbacks.get(msg["callback"])
+        if gather is None or msg["author"] in gather.responded:
+            return
+        gather.responded.add(msg["author"])
+
+        latency = time.perf_counter() - gather.sent
+        stats = self._stats(msg["author"])
+        stats.responses += 1
+        stats.total += latency
+        stats.max = max(stats.max, latency)
+
+        # Clients that had nothing to say still respond, so that the
+        # command doesn't have to wait for them
+        if not msg.get("empty"):
+            gather.responses.append(msg)
+        self._check_done(gather)
+
+    def _check_done(self, gather: _Gather) -> None:
+        # Clients that disconnected are not waited for, but they are
+        # still reported as missing
+        waiting = [
+            c
+            for c in gather.expected
+            if c in self.clients and c not in gather.responded
+        ]
+        if not waiting and not gather.future.done():
+            gather.future.set_result(None)
 
-        if expect_resp:
-            await asyncio.sleep(0.1)
-            return self.callbacks.pop(to_send["callback"])
-        return None
+    def _set_clients(self, clients: list[str]) -> None:
+        self.clients = clients
+        for gather in list(self.callbacks.values()):
+            self._check_done(gather)
 
-    async def send_response(self, callback: int, data: Any) -> None:
+    async def send_response(
+        self, callback: int, data: Any, to: Optional[str] = None
+    ) -> None:
         if not self.websocket:
             raise Exception("Websocket not initialized.")
 
@@ -67,19 +204,15 @@ class WebsocketConnection:
             "callback": callback,
             "data": data,
             "author": self.name_id,
+            "to": to,
+            "empty": data is None,
         }
-
-        try:
-            await self.websocket.send(json.dumps(to_send).encode("utf-8"))
-        except websockets.ConnectionClosed as exc:
-            if exc.code == 1000:
-                return
-            raise
+        await self._send(to_send)
 
     async def handle_command(self, msg: dict[str, Any]):
         resp = await self.on_command(msg)
-        if msg["respond"] and resp:
-            await self.send_response(msg["callback"], resp)
+        if msg["respond"]:
+            await self.send_response(msg["callback"], resp, msg["author"])
 
     async def recv_loop(self):
         if not self.websocket:
@@ -93,21 +226,46 @@ class WebsocketConnection:
                     return
                 raise
 
-            msg: dict[str, Any] = json.loads(msg)
+            msg: dict[str, Any] = self.codec.decode(msg)
 
             if msg["type"] == "response":
-                if msg["callback"] in self.callbacks:
-                    self.callbacks[msg["callback"]].append(msg)
+                self._on_response(msg)
+                continue
+            if msg["type"] == "clients":
+                self._set_clients(msg["clients"])
+                continue
+            if msg["type"] == "routed":
+                gather = self.callbacks.get(msg["callback"])
+                if gather:
+                    gather.expected = msg["recipients"]
+                    self._check_done(gather)
                 continue
 
-            await self.loop.create_task(self.handle_command(msg))
+            # Not awaited, so that a slow command can't hold up the
+            # responses to this client's own commands
+            self.loop.create_task(self.handle_command(msg))
 
     async def ensure_connection(self):
         self.websocket = await websockets.connect(
             "wss://localhost:4000", ssl=SSL_CONTEXT
         )
-        await self.websocket.send(self.name_id.encode("utf-8"))
-        await self.websocket.recv()
+        await self.websocket.send(
+            json.dumps(
+                {
+                    "name": self.name_id,
+                    "shard_ids": self.shard_ids,
+                    "shard_count": self.shard_count,
+                    "codecs": ipc_codec.PREFERENCE,
+                }
+            ).encode("utf-8")
+        )
+        # The handshake is always JSON. Servers that don't know about
+        # codecs don't send one, and only speak JSON.
+        status = json.loads(await self.websocket.recv())
+        self.codec = ipc_codec.CODECS.get(
+            status.get("codec"), ipc_codec.DEFAULT
+        )
+        self.clients = status.get("clients", [self.name_id])
 
         self.task = self.loop.create_task(self.recv_loop())
         self.task.add_done_callback(self._done_callback)
@@ -0,0 +1,110 @@
+import itertools
+from typing import Iterable, Optional
+
+PERM_KEYS = (
+    "allow_commands",
+    "on_starboard",
+    "give_stars",
+    "gain_xp",
+    "pos_roles",
+    "xp_roles",
+)
+
+
+class _CompiledGroup:
+    __slots__ = ("id", "channels", "starboards", "rules")
+
+    def __init__(self, group: dict):
+        self.id = int(group["id"])
+        # An empty scope means the group applies everywhere
+        self.channels = frozenset(int(c) for c in group["channels"] or [])
+        self.starboards = frozenset(int(s) for s in group["starboards"] or [])
+        self.rules: list[tuple[int, tuple[Optional[bool], ...]]] = []
+
+    def matches(
+        self, channel_id: Optional[int], starboard_id: Optional[int]
+    ) -> bool:
+        if (
+            self.channels
+            and channel_id is not None
+            and channel_id not in self.channels
+        ):
+            return False
+        if (
+            self.starboards
+            and starboard_id is not None
+            and starboard_id not in self.starboards
+        ):
+            return False
+        return True
+
+
+class PermTable:
+    """The permgroups and permroles of a single guild, compiled so
+    that permissions can be resolved without touching the database."""
+
+    _versions = itertools.count()
+
+    def __init__(self, groups: list[dict], permroles: list[dict]):
+        # Unique per compiled table, so anything derived from a table can
+        # tell when it was replaced
+        self.version = next(self._versions)
+        self.groups = [
+            _CompiledGroup(g) for g in sorted(groups, key=lambda g: g["index"])
+        ]
+        by_id = {g.id: g for g in self.groups}
+        for pr in sorted(permroles, key=lambda pr: pr["index"]):
+            group = by_id.get(int(pr["permgroup_id"]))
+            if group is None:
+                continue
+            group.rules.append(
+                (int(pr["role_id"]), tuple(pr[k] for k in PERM_KEYS))
+            )
+
+        self.group_ids = frozenset(by_id.keys())
+        self._scopes: dict[
+            tuple[Optional[int], Optional[int]], tuple[_CompiledGroup, ...]
+        ] = {}
+
+    def same_as(self, other: "PermTable") -> bool:
+        """Whether both tables were compiled from the same rows."""
+        return [
+            (g.id, g.channels, g.starboards, g.rules) for g in self.groups
+        ] == [(g.id, g.channels, g.starboards, g.rules) for g in other.groups]
+
+    def _scope(
+        self, channel_id: Optional[int], starboard_id: Optional[int]
+    ) -> tuple[_CompiledGroup, ...]:
+        key = (channel_id, starboard_id)
+        scope = self._scopes.get(key)
+        if scope is None:
+            scope = tuple(
+                g
+                for g in self.groups
+                if g.rules and g.matches(channel_id, starboard_id)
+            )
+            self._scopes[key] = scope
+        return scope
+
+    def resolve(
+        self,
+        roles: Iterable[int],
+        channel_id: Optional[int],
+        starboard_id: Optional[int],
+    ) -> dict[str, bool]:
+        values = [True] * len(PERM_KEYS)
+        scope = self._scope(
+            None if channel_id is None else int(channel_id),
+            None if starboard_id is None else int(starboard_id),
+        )
+        if scope:
+            role_set = set(roles)
+            for group in scope:
+                for role_id, overrides in group.rules:
+                    if role_id not in role_set:
+                        continue
+                    for x, value in enumerate(overrides):
+                        if value is not None:
+                            values[x] = value
+
+        return dict(zip(PERM_KEYS, values))
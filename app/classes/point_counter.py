@@ -0,0 +1,157 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Iterable, Optional
+
+from cachetools import LRUCache
+
+
+class _Entry:
+    __slots__ = ("key", "guild_id", "reactors", "users", "created")
+
+    def __init__(
+        self,
+        key: Any,
+        guild_id: int,
+        reactors: dict[int, dict[int, int]],
+        users: Iterable[int],
+    ) -> None:
+        self.key = key
+        self.guild_id = guild_id
+        self.reactors = reactors
+        # Everyone who reacted, including the ones that weren't counted
+        self.users = set(users)
+        self.created = time.monotonic()
+
+
+class _EntryLRU(LRUCache):
+    def __init__(
+        self, maxsize: int, on_evict: Callable[[int, _Entry], None]
+    ) -> None:
+        super().__init__(maxsize=maxsize)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._on_evict(key, value)
+        return key, value
+
+
+class PointCounter:
+    """Keeps the valid reactors of recently updated messages, so that a
+    single reaction can be applied as a delta instead of recounting every
+    reaction on the message.
+
+    Each entry maps starboard_id -> {user_id: number of counted emojis},
+    and the points of a starboard are the number of users in it. Entries
+    are tagged with a key describing the config they were calculated
+    with, and are discarded as soon as that config changes, or once they
+    are older than `ttl`.
+
+    Whether a reactor is counted also depends on their roles, so the
+    messages each member reacted to are indexed, and their entries are
+    discarded when that member changes."""
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 600):
+        self.ttl = ttl
+        self.entries = _EntryLRU(maxsize, self._unindex)
+        # (guild_id, user_id) -> messages with entries they reacted to
+        self.reactors: dict[tuple[int, int], set[int]] = {}
+        # message_id -> [lock, number of tasks using it]
+        self._locks: dict[int, list] = {}
+
+    @asynccontextmanager
+    async def lock(self, message_id: int):
+        lock = self._locks.get(message_id)
+        if lock is None:
+            lock = self._locks[message_id] = [asyncio.Lock(), 0]
+        lock[1] += 1
+        try:
+            async with lock[0]:
+                yield
+        finally:
+            lock[1] -= 1
+            if lock[1] == 0:
+                del self._locks[message_id]
+
+    def _index(self, message_id: int, guild_id: int, user_id: int) -> None:
+        self.reactors.setdefault((guild_id, user_id), set()).add(message_id)
+
+    def _unindex(self, message_id: int, entry: _Entry) -> None:
+        for user_id in entry.users:
+            key = (entry.guild_id, user_id)
+            message_ids = self.reactors.get(key)
+            if message_ids is None:
+                continue
+            message_ids.discard(message_id)
+            if not message_ids:
+                del self.reactors[key]
+
+    def _entry(self, message_id: int, key: Any) -> Optional[_Entry]:
+        entry = self.entries.get(message_id)
+        if entry is None:
+            return None
+        if entry.key != key or time.monotonic() - entry.created > self.ttl:
+            self.invalidate(message_id)
+            return None
+        return entry
+
+    def get(self, message_id: int, key: Any) -> Optional[dict[int, int]]:
+        entry = self._entry(message_id, key)
+        if entry is None:
+            return None
+        return {sid: len(users) for sid, users in entry.reactors.items()}
+
+    def set(
+        self,
+        message_id: int,
+        guild_id: int,
+        key: Any,
+        reactors: dict[int, dict[int, int]],
+        user_ids: Iterable[int],
+    ) -> None:
+        self.invalidate(message_id)
+        entry = self.entries[message_id] = _Entry(
+            key, guild_id, reactors, user_ids
+        )
+        for user_id in entry.users:
+            self._index(message_id, guild_id, user_id)
+
+    def track(self, message_id: int, user_id: int) -> None:
+        """Records a user who reacted to a message, whether or not the
+        reaction was counted."""
+        entry = self.entries.get(message_id)
+        if entry is not None and user_id not in entry.users:
+            entry.users.add(user_id)
+            self._index(message_id, entry.guild_id, user_id)
+
+    def apply(
+        self,
+        message_id: int,
+        key: Any,
+        starboard_id: int,
+        user_id: int,
+        delta: int,
+    ) -> bool:
+        """Applies a +1/-1 delta for a single user. Returns False if
+        there was no valid entry to apply it to."""
+        entry = self._entry(message_id, key)
+        if entry is None:
+            return False
+        users = entry.reactors.setdefault(starboard_id, {})
+        count = users.get(user_id, 0) + delta
+        if count > 0:
+            users[user_id] = count
+        else:
+            users.pop(user_id, None)
+        return True
+
+    def invalidate(self, message_id: int) -> None:
+        entry = self.entries.pop(message_id, None)
+        if entry is not None:
+            self._unindex(message_id, entry)
+
+    def invalidate_member(self, guild_id: int, user_id: int) -> None:
+        """Discards the entries of every message the member reacted to."""
+        for message_id in self.reactors.pop((guild_id, user_id), ()):
+            self.invalidate(message_id)
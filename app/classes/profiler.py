@@ -0,0 +1,154 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from app.database.sql_stats import Histogram
+
+
+class ListenerStats:
+    __slots__ = ("errors", "time")
+
+    def __init__(self) -> None:
+        self.errors = 0
+        self.time = Histogram()
+
+
+class BackgroundStats:
+    __slots__ = ("started", "finished", "failed")
+
+    def __init__(self) -> None:
+        self.started = 0
+        self.finished = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return self.started - self.finished - self.failed
+
+
+class Profiler:
+    """Keeps track of where a cluster spends its time: how late the event
+    loop runs callbacks, how often each event is dispatched, how long
+    each listener takes, and how much background work is queued."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = 0.5):
+        self.loop = loop
+        self.interval = interval
+        self.lag = Histogram()
+        self.last_lag = 0.0
+        self.events: dict[str, int] = {}
+        # listener qualname -> stats
+        self.listeners: dict[str, ListenerStats] = {}
+        self.background: dict[str, BackgroundStats] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = self.loop.create_task(self._sample_lag())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _sample_lag(self) -> None:
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, self.loop.time() - start - self.interval)
+            self.lag.record(self.last_lag)
+
+    def count_event(self, event_name: str) -> None:
+        self.events[event_name] = self.events.get(event_name, 0) + 1
+
+    def timed(
+        self, coro: Callable[..., Awaitable[Any]]
+    ) -> Callable[..., Awaitable[Any]]:
+        """Wraps a listener so that the time it takes is recorded."""
+        stats = self.listeners.get(coro.__qualname__)
+        if stats is None:
+            stats = self.listeners[coro.__qualname__] = ListenerStats()
+
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await coro(*args, **kwargs)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.time.record(time.perf_counter() - start)
+
+        return wrapper
+
+    def create_task(self, name: str, coro: Awaitable[Any]) -> asyncio.Task:
+        """Like loop.create_task, but counts the task under `name` while
+        it is pending."""
+        stats = self.background.get(name)
+        if stats is None:
+            stats = self.background[name] = BackgroundStats()
+        stats.started += 1
+
+        def done(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is not None:
+                stats.failed += 1
+            else:
+                stats.finished += 1
+
+        task = self.loop.create_task(coro)
+        task.add_done_callback(done)
+        return task
+
+    def export(self) -> dict[str, Any]:
+        """A serializable snapshot, so that it can be sent over IPC and
+        merged with merge_exports."""
+        return {
+            "lag": self.lag.to_dict(),
+            "last_lag": self.last_lag,
+            "tasks": len(asyncio.all_tasks(self.loop)),
+            "events": dict(self.events),
+            "listeners": {
+                name: {"errors": s.errors, "time": s.time.to_dict()}
+                for name, s in self.listeners.items()
+            },
+            "background": {
+                name: {
+                    "started": s.started,
+                    "finished": s.finished,
+                    "failed": s.failed,
+                }
+                for name, s in self.background.items()
+            },
+        }
+
+    @staticmethod
+    def merge_exports(exports: Iterable[dict[str, Any]]) -> dict[str, Any]:
+        """Merges exports from several clusters. Histograms in the result
+        are Histogram objects instead of dicts."""
+        lag = Histogram()
+        merged: dict[str, Any] = {
+            "lag": lag,
+            "last_lag": 0.0,
+            "tasks": 0,
+            "events": {},
+            "listeners": {},
+            "background": {},
+        }
+        for export in exports:
+            lag.merge(Histogram.from_dict(export["lag"]))
+            merged["last_lag"] = max(merged["last_lag"], export["last_lag"])
+            merged["tasks"] += export["tasks"]
+            for name, count in export["events"].items():
+                merged["events"][name] = merged["events"].get(name, 0) + count
+            for name, data in export["listeners"].items():
+                listener = merged["listeners"].setdefault(
+                    name, {"errors": 0, "time": Histogram()}
+                )
+                listener["errors"] += data["errors"]
+                listener["time"].merge(Histogram.from_dict(data["time"]))
+            for name, data in export["background"].items():
+                background = merged["background"].setdefault(
+                    name, {"started": 0, "finished": 0, "failed": 0}
+                )
+                for key, value in data.items():
+                    background[key] += value
+        return merged
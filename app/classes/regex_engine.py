@@ -0,0 +1,113 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import regex
+from cachetools import LRUCache
+
+
+class PatternCost:
+    __slots__ = ("calls", "total", "max", "timeouts", "warned")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.timeouts = 0
+        self.warned = False
+
+    @property
+    def average(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+    def record(self, elapsed: float, timed_out: bool = False) -> None:
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        if timed_out:
+            self.timeouts += 1
+
+
+class RegexEngine:
+    """Evaluates user-supplied regexes off of the event loop.
+
+    Patterns are compiled once and searched in a bounded pool of threads.
+    The `regex` module releases the GIL while searching and stops the
+    search itself once `timeout` is reached, so a slow pattern can
+    neither block the loop nor keep a worker busy."""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        timeout: float = 0.01,
+        warn_time: float = 0.002,
+        min_calls: int = 10,
+        max_patterns: int = 2048,
+    ) -> None:
+        self.timeout = timeout
+        self.warn_time = warn_time
+        self.min_calls = min_calls
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="regex"
+        )
+        self._compiled: LRUCache = LRUCache(maxsize=max_patterns)
+        self.costs: LRUCache = LRUCache(maxsize=max_patterns)
+
+    def compile(self, pattern: str) -> regex.Pattern:
+        compiled = self._compiled.get(pattern)
+        if compiled is None:
+            compiled = regex.compile(pattern, flags=regex.V0)
+            self._compiled[pattern] = compiled
+        return compiled
+
+    def cost(self, pattern: str) -> Optional[PatternCost]:
+        return self.costs.get(pattern)
+
+    def _search(
+        self, compiled: regex.Pattern, string: str
+    ) -> tuple[bool, float]:
+        start = time.perf_counter()
+        match = compiled.search(string, timeout=self.timeout, concurrent=True)
+        return match is not None, time.perf_counter() - start
+
+    async def search(self, pattern: str, string: str) -> bool:
+        """Returns whether the pattern matches the string. Raises
+        TimeoutError if the search takes longer than `timeout`, and
+        regex.error if the pattern is invalid."""
+        compiled = self.compile(pattern)
+        cost = self.costs.get(pattern)
+        if cost is None:
+            cost = self.costs[pattern] = PatternCost()
+
+        loop = asyncio.get_running_loop()
+        try:
+            matched, elapsed = await loop.run_in_executor(
+                self._executor, self._search, compiled, string
+            )
+        except TimeoutError:
+            cost.record(self.timeout, timed_out=True)
+            raise
+        cost.record(elapsed)
+        return matched
+
+    def is_expensive(self, pattern: str) -> bool:
+        cost = self.costs.get(pattern)
+        if cost is None or cost.calls < self.min_calls:
+            return False
+        return cost.average >= self.warn_time
+
+    def should_warn(self, pattern: str) -> bool:
+        """Returns True the first time a pattern is found to be expensive,
+        so that the guild is only warned once."""
+        if not self.is_expensive(pattern):
+            return False
+        cost = self.costs[pattern]
+        if cost.warned:
+            return False
+        cost.warned = True
+        return True
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,116 @@
+import asyncio
+import collections
+import logging
+import time
+from typing import Any, Optional
+
+import msgpack
+
+log = logging.getLogger("MessageStore")
+
+# Seconds to wait before reconnecting after the store was unreachable
+RETRY_AFTER = 30
+
+
+def pack_frame(obj: Any) -> bytes:
+    data = msgpack.packb(obj, use_bin_type=True)
+    return len(data).to_bytes(4, "big") + data
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Any:
+    size = int.from_bytes(await reader.readexactly(4), "big")
+    return msgpack.unpackb(
+        await reader.readexactly(size), raw=False, strict_map_key=False
+    )
+
+
+class StoreConnection:
+    """Client for the shared message store in app/message_store.py.
+
+    The store answers "get" requests in the order they were sent, so
+    responses are matched to requests by position. If the store can't be
+    reached, every call behaves like a miss."""
+
+    def __init__(self, path: str, timeout: float = 0.5) -> None:
+        self.path = path
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.waiting: collections.deque[asyncio.Future] = collections.deque()
+        self.retry_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def _connect(self) -> bool:
+        if self.writer is not None:
+            return True
+        if time.monotonic() < self.retry_at:
+            return False
+        async with self.lock:
+            if self.writer is not None:
+                return True
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(
+                    self.path
+                )
+            except OSError as e:
+                log.warning(f"Could not connect to {self.path}: {e}")
+                self.retry_at = time.monotonic() + RETRY_AFTER
+                return False
+            asyncio.get_event_loop().create_task(self._read_loop())
+        return True
+
+    async def _send(self, request: list[Any]) -> bool:
+        try:
+            self.writer.write(pack_frame(request))
+            await self.writer.drain()
+        except (ConnectionError, AttributeError):
+            # AttributeError if the connection was reset meanwhile
+            return False
+        return True
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                value = await read_frame(self.reader)
+                future = self.waiting.popleft()
+                if not future.done():
+                    future.set_result(value)
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError):
+            pass
+        finally:
+            self._reset()
+
+    def _reset(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+        while self.waiting:
+            future = self.waiting.popleft()
+            if not future.done():
+                future.set_result(None)
+
+    async def get(self, key: int) -> Any:
+        if not await self._connect():
+            return None
+        future = asyncio.get_event_loop().create_future()
+        self.waiting.append(future)
+        if not await self._send(["get", key]):
+            if future in self.waiting:
+                self.waiting.remove(future)
+            return None
+        try:
+            # Shielded, so that a late response still pops its future
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def set(self, key: int, value: Any, ttl: float) -> None:
+        if await self._connect():
+            await self._send(["set", key, value, ttl])
+
+    async def delete(self, key: int) -> None:
+        if await self._connect():
+            await self._send(["delete", key])
+
+    def close(self) -> None:
+        self._reset()
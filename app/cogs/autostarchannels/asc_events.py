@@ -22,7 +22,9 @@ class AutoStarEvents(commands.Cog):
     ) -> None:
         if not isinstance(channel, discord.TextChannel):
             return
-        aschannel = await self.bot.db.aschannels.get(channel.id)
+        aschannel = await self.bot.db.aschannels.get(
+            channel.id, channel.guild.id
+        )
         if not aschannel:
             return
         await self.bot.db.aschannels.delete(channel.id)
@@ -40,7 +42,11 @@ class AutoStarEvents(commands.Cog):
     async def on_message(self, message: discord.Message) -> None:
         if message.author.bot:
             return
-        aschannel = await self.bot.db.aschannels.get(message.channel.id)
+        if not message.guild:
+            return
+        aschannel = await self.bot.db.aschannels.get(
+            message.channel.id, message.guild.id
+        )
         if not aschannel:
             return
 
@@ -1,6 +1,3 @@
-import re
-from typing import Optional
-
 import discord
 
 from app import utils
@@ -8,11 +5,9 @@ from app.classes.bot import Bot
 from app.i18n import t_
 
 
-async def try_regex(
-    bot: Bot, message: discord.Message, pattern: str
-) -> Optional[re.Match]:
+async def try_regex(bot: Bot, message: discord.Message, pattern: str) -> bool:
     try:
-        result = utils.safe_regex(message.system_content, pattern)
+        result = await bot.regex.search(pattern, message.system_content)
     except TimeoutError:
         async with bot.temp_locale(message.guild):
             bot.dispatch(
@@ -23,11 +18,24 @@ async def try_regex(
                     "Try improving the efficiency of your regex, and "
                     "feel free to join the support server for help."
                 ).format(pattern, message),
+                "error",
+                message.guild,
             )
         return True
-    if result is not None:
-        return True
-    return False
+
+    if bot.regex.should_warn(pattern):
+        async with bot.temp_locale(message.guild):
+            bot.dispatch(
+                "guild_log",
+                t_(
+                    "The regex `{0}` is slow to match against messages. "
+                    "Try improving its efficiency, or it may start to "
+                    "time out."
+                ).format(pattern),
+                "info",
+                message.guild,
+            )
+    return result
 
 
 async def is_valid(
@@ -1,98 +1,165 @@
 import asyncio
+import time
 import typing
+from typing import Any
 
 import discord
 from discord.ext import commands, tasks
 
 from app.cogs.permroles import pr_functions
+from app.database.sql_stats import Histogram
 
 if typing.TYPE_CHECKING:
     from app.classes.bot import Bot
 
+# Seconds between reconciliation cycles
+CYCLE = 5
+# Role requests per guild per cycle. Discord allows roughly 10 member
+# edits per guild every 10 seconds, and other commands need some too.
+REQUESTS_PER_CYCLE = 5
+# Members whose roles are checked at once
+CHUNK = 50
+
 
 async def set_xp_roles(
-    to_add: list[int], to_remove: list[int], member: discord.Member
+    to_add: set[int], to_remove: set[int], member: discord.Member
 ):
-    curr = [r.id for r in member.roles]
-    to_add = [member.guild.get_role(r) for r in to_add if r not in curr]
-    to_remove = [member.guild.get_role(r) for r in to_remove if r in curr]
+    """Adds and removes each role with its own request, so that roles
+    changed by anything else in the meantime are left alone."""
+    add = [r for r in map(member.guild.get_role, to_add) if r]
+    remove = [r for r in map(member.guild.get_role, to_remove) if r]
     try:
-        await member.remove_roles(*to_remove)
-        await member.add_roles(*to_add)
+        if remove:
+            await member.remove_roles(*remove)
+        if add:
+            await member.add_roles(*add)
     except discord.Forbidden:
         pass
 
 
 class XPREvents(commands.Cog):
+    """Brings the XP roles of members up to date after their XP changes.
+
+    Members are queued once, however many times their XP changes, and
+    are reconciled in the order they were queued. Members whose roles
+    are already correct don't use any of the request budget."""
+
     def __init__(self, bot: "Bot"):
         self.bot = bot
-        self.queue: dict[int, list[int]] = {}
+        # guild_id -> user_id -> when the member was first queued
+        self.queue: dict[int, dict[int, float]] = {}
+
+        # Seconds between a member being queued and being reconciled
+        self.lag = Histogram()
+        self.checked = 0
+        self.requests = 0
+        self.last_cycle = 0.0
+
         self.update_xpr_loop.start()
 
+    def cog_unload(self) -> None:
+        self.update_xpr_loop.cancel()
+
     @commands.Cog.listener()
     async def on_update_xpr(self, guild_id: int, user_id: int):
-        self.queue.setdefault(guild_id, [])
-        self.queue[guild_id].append(user_id)
+        self.queue.setdefault(guild_id, {}).setdefault(
+            user_id, time.monotonic()
+        )
 
-    @tasks.loop(seconds=5)
+    @tasks.loop(seconds=CYCLE)
     async def update_xpr_loop(self):
-        tasks: list[asyncio.Task] = []
-        for gid in list(self.queue.keys()):
-            to_update = self.queue[gid]
-            if len(to_update) == 0:
-                del self.queue[gid]
-                continue
-            n = to_update.pop()
-            guild = self.bot.get_guild(gid)
-            _member = await self.bot.cache.get_members([n], guild)
-            if n not in _member:
-                continue
-            member = _member[n]
-
-            perms = await pr_functions.get_perms(
-                self.bot,
-                [r.id for r in member.roles],
-                member.guild.id,
-                None,
-                None,
-            )
-
-            if perms["xp_roles"]:
-                sql_member = await self.bot.db.members.get(
-                    member.id, member.guild.id
+        start = time.monotonic()
+        guild_ids = list(self.queue.keys())
+        results = await asyncio.gather(
+            *(self.reconcile_guild(gid) for gid in guild_ids),
+            return_exceptions=True,
+        )
+        for gid, result in zip(guild_ids, results):
+            if isinstance(result, Exception):
+                self.bot.dispatch(
+                    "log_error", "Error in update_xpr_loop", result, [gid]
                 )
-                to_add = [
-                    int(r["role_id"])
-                    for r in await self.bot.db.fetch(
-                        """SELECT * FROM xproles
-                        WHERE guild_id=$1
-                        AND required <= $2""",
-                        gid,
-                        sql_member["xp"],
-                    )
-                ]
-                to_remove = [
-                    int(r["role_id"])
-                    for r in await self.bot.db.fetch(
-                        """SELECT * FROM xproles
-                        WHERE guild_id=$1
-                        AND required > $2""",
-                        gid,
-                        sql_member["xp"],
-                    )
-                ]
-            else:
-                to_add = []
-                to_remove = [
-                    int(r["role_id"])
-                    for r in await self.bot.db.execute(
-                        """SELECT * FROM xproles
-                        WHERE guild_id=$1""",
-                        gid,
-                    )
-                ]
-            t = asyncio.create_task(set_xp_roles(to_add, to_remove, member))
-            tasks.append(t)
+        self.last_cycle = time.monotonic() - start
+
+    async def reconcile_guild(self, guild_id: int) -> None:
+        queued = self.queue.get(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        if not queued or guild is None:
+            self.queue.pop(guild_id, None)
+            return
+
+        xp_roles = {
+            int(r["role_id"]): int(r["required"])
+            for r in await self.bot.db.xproles.get_many(guild_id)
+        }
+        if not xp_roles:
+            self.queue.pop(guild_id, None)
+            return
+
+        edits: list[Any] = []
+        # Each role added or removed is a request
+        requests = 0
+        uids = list(queued.keys())
+        for offset in range(0, len(uids), CHUNK):
+            if requests >= REQUESTS_PER_CYCLE:
+                break
+            chunk = uids[offset : offset + CHUNK]
+            members = await self.bot.cache.get_members(chunk, guild)
+            for uid in chunk:
+                if requests >= REQUESTS_PER_CYCLE:
+                    break
+                queued_at = queued.pop(uid, None)
+                member = members.get(uid)
+                if queued_at is None or member is None:
+                    continue
+                self.checked += 1
+                self.lag.record(time.monotonic() - queued_at)
+
+                to_add, to_remove = await self.role_changes(member, xp_roles)
+                if to_add or to_remove:
+                    requests += len(to_add) + len(to_remove)
+                    edits.append(set_xp_roles(to_add, to_remove, member))
+
+        if not queued:
+            # Members queued while this ran are kept for the next cycle
+            self.queue.pop(guild_id, None)
+        self.requests += requests
+        await asyncio.gather(*edits)
+
+    async def role_changes(
+        self, member: discord.Member, xp_roles: dict[int, int]
+    ) -> tuple[set[int], set[int]]:
+        perms = await pr_functions.get_perms(
+            self.bot,
+            [r.id for r in member.roles],
+            member.guild.id,
+            None,
+            None,
+        )
+        if perms["xp_roles"]:
+            xp, _ = await self.bot.xp_buffer.get(member.guild.id, member.id)
+            wanted = {rid for rid, req in xp_roles.items() if req <= xp}
+        else:
+            wanted = set()
+
+        current = {r.id for r in member.roles}
+        return wanted - current, (xp_roles.keys() - wanted) & current
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        oldest = min(
+            (min(q.values()) for q in self.queue.values() if q),
+            default=now,
+        )
+        return {
+            "queued": sum(len(q) for q in self.queue.values()),
+            "guilds": len(self.queue),
+            "oldest": now - oldest,
+            "lag": self.lag.to_dict(),
+            "checked": self.checked,
+            "requests": self.requests,
+            "last_cycle": self.last_cycle,
+        }
 
 
 def setup(bot: "Bot"):
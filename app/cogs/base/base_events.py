@@ -143,6 +143,7 @@ class BaseEvents(commands.Cog):
             self.bot.pipe.send(1)
         except BrokenPipeError:
             pass
+        self.bot.start_heartbeat()
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
@@ -271,6 +272,6 @@ def setup(bot: Bot) -> None:
         if ctx.guild is None:
             return
 
-        await bot.db.guilds.create(ctx.guild.id)
-        await bot.db.users.create(ctx.author.id, ctx.author.bot)
-        await bot.db.members.create(ctx.author.id, ctx.guild.id)
+        await bot.db.entities.ensure(
+            ctx.guild.id, [(ctx.author.id, ctx.author.bot)]
+        )
@@ -1,20 +1,124 @@
-from typing import Optional
+import asyncio
+from typing import Any, Optional, Union
 
 import discord
 from aiocache import Cache as MemCache
 from aiocache import SimpleMemoryCache
+from cachetools import TTLCache
 
+import config
 from app import utils
 from app.classes.bot import Bot
-from app.classes.nonexist import nonexist
+from app.classes.store_connection import StoreConnection
 
+# Parts of the message payload that are cached. Reactions are left out
+# because they go stale quickly; code that needs them should pass
+# fresh=True to fetch_message, which returns the full payload.
+MESSAGE_FIELDS = (
+    "id",
+    "channel_id",
+    "guild_id",
+    "type",
+    "content",
+    "author",
+    "member",
+    "attachments",
+    "embeds",
+    "mentions",
+    "mention_roles",
+    "mention_everyone",
+    "message_reference",
+    "referenced_message",
+    "edited_timestamp",
+    "pinned",
+    "tts",
+    "flags",
+    "webhook_id",
+    "stickers",
+)
 
-class Cache:
-    def __init__(self, bot) -> None:
-        self.messages: SimpleMemoryCache = MemCache(
-            namespace="messages", ttl=10
+# Fields a payload needs to be turned into a discord.Message, so that a
+# full edit payload can be cached even if the message wasn't
+REQUIRED_FIELDS = frozenset(
+    (
+        "id",
+        "channel_id",
+        "type",
+        "content",
+        "author",
+        "attachments",
+        "embeds",
+        "edited_timestamp",
+        "pinned",
+        "mention_everyone",
+        "tts",
+    )
+)
+
+
+def project(data: dict[str, Any], nested: bool = False) -> dict[str, Any]:
+    """Keeps only the parts of a message payload that are used. The
+    result can be turned back into a discord.Message, and is plain data,
+    so that it can be shared with other processes."""
+    projected = {k: data[k] for k in MESSAGE_FIELDS if k in data}
+    if nested:
+        projected.pop("referenced_message", None)
+    elif projected.get("referenced_message"):
+        projected["referenced_message"] = project(
+            projected["referenced_message"], nested=True
         )
+    return projected
+
+
+class MessageCacheStats:
+    __slots__ = (
+        "hits",
+        "missing_hits",
+        "shared_hits",
+        "fetches",
+        "deleted",
+        "patches",
+    )
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.missing_hits = 0
+        self.shared_hits = 0
+        self.fetches = 0
+        self.deleted = 0
+        self.patches = 0
+
+    def to_dict(self) -> dict[str, int]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class Cache:
+    """Messages are cached in two tiers: an LRU in this process, and
+    optionally the shared store at config.MESSAGE_STORE, which every
+    cluster can read. Messages that don't exist are cached as well, for
+    a shorter time."""
+
+    def __init__(
+        self,
+        bot,
+        max_messages: int = 20_000,
+        ttl: float = 600,
+        missing_ttl: float = 120,
+    ) -> None:
         self.bot = bot
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        # message_id -> projected payload
+        self.messages: TTLCache = TTLCache(max_messages, ttl)
+        # message_id -> True, for messages that don't exist
+        self.missing: TTLCache = TTLCache(max_messages, missing_ttl)
+        self.shared: Optional[StoreConnection] = (
+            StoreConnection(config.MESSAGE_STORE)
+            if config.MESSAGE_STORE
+            else None
+        )
+        self.message_stats = MessageCacheStats()
+        self._inflight: dict[int, asyncio.Future] = {}
         self.users: SimpleMemoryCache = MemCache(namespace="users", ttl=10)
 
     async def fetch_user(self, user_id: int) -> discord.User:
@@ -48,23 +152,122 @@ class Cache:
         return result
 
     async def fetch_message(
-        self, guild_id: int, channel_id: int, message_id: int
+        self,
+        guild_id: int,
+        channel_id: int,
+        message_id: int,
+        *,
+        fresh: bool = False,
     ) -> Optional[discord.Message]:
-        cached = await self.messages.get(message_id)
-        if not cached:
-            guild = self.bot.get_guild(guild_id)
-            if not guild:
-                return None
-            channel = guild.get_channel(channel_id)
-            if not channel:
-                return None
-            try:
-                message = await channel.fetch_message(message_id)
-            except discord.errors.NotFound:
-                message = None
-            await self.messages.set(message_id, message or nonexist)
-            return message
-        return cached if cached is not nonexist else None
+        guild = self.bot.get_guild(guild_id)
+        if not guild:
+            return None
+        channel = guild.get_channel(channel_id)
+        if not channel:
+            return None
+
+        if fresh:
+            # Not shared with other fetches, since those may have started
+            # before the reactions changed
+            data = await self._fetch(channel_id, message_id)
+        else:
+            data = await self._get_cached(message_id)
+        if data is None:
+            # Concurrent fetches of the same message share one request
+            future = self._inflight.get(message_id)
+            if future is None:
+                future = self._inflight[message_id] = asyncio.ensure_future(
+                    self._fetch(channel_id, message_id)
+                )
+                future.add_done_callback(
+                    lambda _: self._inflight.pop(message_id, None)
+                )
+            data = await asyncio.shield(future)
+        if data is False:
+            return None
+        return self.bot._connection.create_message(channel=channel, data=data)
+
+    async def _get_cached(
+        self, message_id: int
+    ) -> Union[dict[str, Any], bool, None]:
+        """Returns the projected message, False if it is known not to
+        exist, or None if it isn't cached."""
+        data = self.messages.get(message_id)
+        if data is not None:
+            self.message_stats.hits += 1
+            return data
+        if message_id in self.missing:
+            self.message_stats.missing_hits += 1
+            return False
+        if self.shared:
+            data = await self.shared.get(message_id)
+            if data is not None:
+                self.message_stats.shared_hits += 1
+                self._store_local(message_id, data)
+                return data
+        return None
+
+    async def _fetch(
+        self, channel_id: int, message_id: int
+    ) -> Union[dict[str, Any], bool]:
+        """Returns the full message payload, or False if it doesn't
+        exist. Only the projected payload is cached."""
+        self.message_stats.fetches += 1
+        try:
+            data = await self.bot.http.get_message(channel_id, message_id)
+        except discord.errors.NotFound:
+            await self._store(message_id, False)
+            return False
+        await self._store(message_id, project(data))
+        return data
+
+    def _store_local(
+        self, message_id: int, data: Union[dict[str, Any], bool]
+    ) -> None:
+        if data is False:
+            self.messages.pop(message_id, None)
+            self.missing[message_id] = True
+        else:
+            self.missing.pop(message_id, None)
+            self.messages[message_id] = data
+
+    async def _store(
+        self, message_id: int, data: Union[dict[str, Any], bool]
+    ) -> None:
+        self._store_local(message_id, data)
+        if self.shared:
+            await self.shared.set(
+                message_id,
+                data,
+                self.missing_ttl if data is False else self.ttl,
+            )
+
+    async def invalidate(self, message_id: int) -> None:
+        """Forgets a message that changed, so that it is fetched again."""
+        self.messages.pop(message_id, None)
+        self.missing.pop(message_id, None)
+        if self.shared:
+            await self.shared.delete(message_id)
+
+    async def patch(self, message_id: int, data: dict[str, Any]) -> None:
+        """Applies a message update from the gateway to the cached copy.
+        Updates only contain the fields that changed, so messages that
+        aren't cached are only cached if the update is complete."""
+        cached = self.messages.get(message_id)
+        if cached is not None:
+            patched = {**cached, **project(data)}
+        elif REQUIRED_FIELDS <= data.keys():
+            patched = project(data)
+        else:
+            # The shared store may have a copy that can't be patched here
+            await self.invalidate(message_id)
+            return
+        self.message_stats.patches += 1
+        await self._store(message_id, patched)
+
+    async def mark_deleted(self, message_id: int) -> None:
+        self.message_stats.deleted += 1
+        await self._store(message_id, False)
 
 
 def setup(bot: Bot) -> None:
@@ -14,7 +14,7 @@ class CacheEvents(commands.Cog):
     ) -> None:
         if not payload.guild_id:
             return
-        await self.bot.cache.messages.delete(payload.message_id)
+        await self.bot.cache.mark_deleted(payload.message_id)
 
     @commands.Cog.listener()
     async def on_raw_bulk_message_delete(
@@ -23,7 +23,15 @@ class CacheEvents(commands.Cog):
         if not payload.guild_id:
             return
         for mid in payload.message_ids:
-            await self.bot.cache.messages.delete(mid)
+            await self.bot.cache.mark_deleted(mid)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(
+        self, payload: discord.RawMessageUpdateEvent
+    ) -> None:
+        if not payload.data.get("guild_id"):
+            return
+        await self.bot.cache.patch(payload.message_id, payload.data)
 
 
 def setup(bot: Bot) -> None:
@@ -83,6 +83,8 @@ class Fun(commands.Cog):
                 t_("That user has their profile set to private.").format(user)
             )
             return
+        # Stars are counted in memory for a few seconds before being saved
+        await self.bot.xp_buffer.flush()
         sql_member = await self.bot.db.members.get(user.id, ctx.guild.id)
 
         # Guild Stats
@@ -1,40 +1,33 @@
+from typing import Optional
+
 import discord
 
 from app.classes.bot import Bot
+from app.i18n import t_
 
 
-async def get_guild_leaderboard(bot: Bot, guild: discord.Guild) -> dict:
+async def get_guild_leaderboard(
+    bot: Bot, guild: discord.Guild, offset: int = 0, limit: int = 200
+) -> dict:
+    """Ranks come from the XP index, and count members who have left, so
+    that they always match get_rank."""
     leaderboard = {}
-    top_users = await bot.db.fetch(
-        """SELECT * FROM members
-        WHERE guild_id=$1
-        AND xp > 0
-        ORDER BY xp DESC
-        LIMIT 200""",
-        guild.id,
+    top_users = await bot.db.xp_ranks.page(guild.id, offset, limit)
+    user_lookup = await bot.cache.get_members(
+        [uid for _, uid, _, _ in top_users], guild
     )
-    uids = [int(u["user_id"]) for u in top_users]
-    user_lookup = await bot.cache.get_members(uids, guild)
-    current_rank = 0
-    for u in top_users:
-        obj = user_lookup.get(int(u["user_id"]))
-        if not obj:
-            continue
-        if obj.bot:
-            continue
-
-        current_rank += 1
-
-        leaderboard[obj.id] = {
-            "name": str(obj),
-            "xp": u["xp"],
-            "level": u["level"],
-            "rank": current_rank,
+    for rank, uid, xp, level in top_users:
+        obj = user_lookup.get(uid)
+        leaderboard[uid] = {
+            "name": str(obj) if obj else t_("Unknown User"),
+            "xp": xp,
+            "level": level,
+            "rank": rank,
         }
     return leaderboard
 
 
-async def get_rank(bot: Bot, guild: discord.Guild, user_id: int) -> int:
-    lb = await get_guild_leaderboard(bot, guild)
-    u = lb.get(user_id)
-    return None if not u else u["rank"]
+async def get_rank(
+    bot: Bot, guild: discord.Guild, user_id: int
+) -> Optional[int]:
+    return await bot.db.xp_ranks.rank(guild.id, user_id)
@@ -1,12 +1,10 @@
-from typing import Optional
-
 from discord.ext import commands
 
 from app import cooldowns
 from app.classes.bot import Bot
 from app.cogs.permroles import pr_functions
 
-from . import leveling_funcs
+from .xp_buffer import XPBuffer
 
 
 class LevelingEvents(commands.Cog):
@@ -58,68 +56,31 @@ class LevelingEvents(commands.Cog):
         else:
             gain_xp = True
 
-        await self.bot.db.members.create(giver_id, guild_id)
-        sql_giver = await self.bot.db.members.get(giver_id, guild_id)
-        await self.bot.db.members.create(receiver_id, guild_id)
-
-        await self.bot.db.execute(
-            """UPDATE members SET stars_given = stars_given + $1
-            WHERE user_id=$2 AND guild_id=$3""",
-            points,
-            sql_giver["user_id"],
-            sql_giver["guild_id"],
-        )
+        xp = 0
+        if gain_xp:
+            sql_guild = await self.bot.db.guilds.get(guild_id)
+            cooldown = sql_guild["xp_cooldown"]
+            per = sql_guild["xp_cooldown_per"]
+            xp = points
+            if per != 0:
+                bucket = self.cooldown.get_bucket(
+                    (giver_id, receiver_id), cooldown, per
+                )
+                if bucket.update_rate_limit():
+                    xp = 0
 
-        await self.bot.db.execute(
-            """UPDATE members
-            SET stars_received = stars_received + $1
-            WHERE user_id=$2 AND guild_id=$3""",
-            points,
-            receiver_id,
-            guild_id,
+        await self.bot.xp_buffer.add(guild_id, giver_id, given=points)
+        leveled_up = await self.bot.xp_buffer.add(
+            guild_id, receiver_id, received=points, xp=xp
         )
-
-        if not gain_xp:
+        if not xp:
             return
 
-        leveled_up: Optional[int] = None
-
-        sql_guild = await self.bot.db.guilds.get(guild_id)
-        cooldown, per = sql_guild["xp_cooldown"], sql_guild["xp_cooldown_per"]
-
-        if per != 0:
-            bucket = self.cooldown.get_bucket(
-                (giver_id, receiver_id), cooldown, per
-            )
-            retry_after = bucket.update_rate_limit()
-            if retry_after:
-                return
-
-        async with self.bot.db.pool.acquire() as con:
-            await con.execute(
-                """UPDATE members
-                SET xp = xp + $1
-                WHERE user_id=$2 AND guild_id=$3""",
-                points,
-                receiver_id,
-                guild_id,
-            )
-            sql_receiver = await con.fetchrow(
-                """SELECT * FROM members WHERE user_id=$1
-                AND guild_id=$2 FOR UPDATE""",
-                receiver_id,
-                guild_id,
+        if not receiver.bot:
+            xp_total, level = await self.bot.xp_buffer.get(
+                guild_id, receiver_id
             )
-            new_level = leveling_funcs.current_level(sql_receiver["xp"])
-            if new_level > sql_receiver["level"]:
-                leveled_up = new_level
-                await con.execute(
-                    """UPDATE members SET level=$1
-                    WHERE user_id=$2 AND guild_id=$3""",
-                    new_level,
-                    receiver_id,
-                    guild_id,
-                )
+            self.bot.db.xp_ranks.update(guild_id, receiver_id, xp_total, level)
 
         if leveled_up:
             guild = self.bot.get_guild(guild_id)
@@ -131,4 +92,5 @@ class LevelingEvents(commands.Cog):
 
 
 def setup(bot: Bot) -> None:
+    bot.xp_buffer = XPBuffer(bot)
     bot.add_cog(LevelingEvents(bot))
@@ -0,0 +1,243 @@
+import asyncio
+from typing import Optional
+
+import asyncpg
+from cachetools import TTLCache
+from discord.ext import tasks
+
+from app.classes.bot import Bot
+
+from . import leveling_funcs
+
+# Seconds between flushes
+FLUSH_INTERVAL = 5
+# Number of members with pending changes that causes an early flush
+FLUSH_AT = 500
+# The counters are SMALLINT columns
+MIN_VALUE = -32768
+MAX_VALUE = 32767
+
+
+class _Delta:
+    __slots__ = ("given", "received", "xp", "level")
+
+    def __init__(self) -> None:
+        self.given = 0
+        self.received = 0
+        self.xp = 0
+        # The level the member reached, or 0 if they didn't level up
+        self.level = 0
+
+    def merge(self, other: "_Delta") -> None:
+        self.given += other.given
+        self.received += other.received
+        self.xp += other.xp
+        self.level = max(self.level, other.level)
+
+
+class XPBuffer:
+    """Buffers changes to the stars and XP of members, and writes them
+    to the database with a single statement every FLUSH_INTERVAL
+    seconds, or as soon as FLUSH_AT members have changes.
+
+    The XP and level of recently active members are kept in memory, so
+    that level ups are found as soon as they happen. Code that writes
+    the XP of members directly must call `flush` first, and `forget`
+    afterwards."""
+
+    # Counters are clamped, so that one member reaching the limit of the
+    # column doesn't make the whole batch fail
+    FLUSH = """UPDATE members m SET
+        stars_given = GREATEST(LEAST(
+            m.stars_given + v.given, 32767), -32768),
+        stars_received = GREATEST(LEAST(
+            m.stars_received + v.received, 32767), -32768),
+        xp = GREATEST(LEAST(m.xp + v.xp, 32767), -32768),
+        level = GREATEST(m.level, v.level)
+        FROM unnest(
+            $1::numeric[], $2::numeric[], $3::int[],
+            $4::int[], $5::int[], $6::int[]
+        ) AS v(guild_id, user_id, given, received, xp, level)
+        WHERE m.guild_id=v.guild_id AND m.user_id=v.user_id"""
+
+    def __init__(
+        self, bot: Bot, max_members: int = 50_000, ttl: float = 600
+    ) -> None:
+        self.bot = bot
+        # (guild_id, user_id) -> changes that haven't been written
+        self.pending: dict[tuple[int, int], _Delta] = {}
+        # (guild_id, user_id) -> [xp, level], including pending changes
+        self.totals: TTLCache = TTLCache(max_members, ttl)
+        self._flush_lock = asyncio.Lock()
+        # (guild_id, user_id) -> the load in progress
+        self._loading: dict[tuple[int, int], asyncio.Future] = {}
+        self._early_flush: Optional[asyncio.Task] = None
+
+        self.events = 0
+        self.flushes = 0
+        self.rows = 0
+
+        self.flush_loop.start()
+
+    async def _totals(self, guild_id: int, user_id: int) -> list[int]:
+        key = (guild_id, user_id)
+        totals = self.totals.get(key)
+        if totals is not None:
+            return totals
+
+        # Concurrent loads of the same member share one, so that the
+        # member is only created once
+        future = self._loading.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._loading[key] = asyncio.get_event_loop().create_future()
+        try:
+            totals = await self._load(guild_id, user_id)
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved, so that it isn't logged if nobody else waited
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+            if not future.done():
+                # The load was cancelled
+                future.cancel()
+
+        future.set_result(totals)
+        return totals
+
+    async def _load(self, guild_id: int, user_id: int) -> list[int]:
+        key = (guild_id, user_id)
+        sql_member = await self.bot.db.members.get(user_id, guild_id)
+        if sql_member is None:
+            await self.bot.db.members.create(user_id, guild_id)
+            xp = level = 0
+        else:
+            xp, level = int(sql_member["xp"]), int(sql_member["level"])
+
+        # The member may have been forgotten with changes still pending
+        delta = self.pending.get(key)
+        if delta is not None:
+            xp += delta.xp
+            level = max(level, delta.level)
+        totals = self.totals[key] = [xp, level]
+        return totals
+
+    async def get(self, guild_id: int, user_id: int) -> tuple[int, int]:
+        """The current XP and level of a member, including changes that
+        haven't been written yet."""
+        xp, level = await self._totals(guild_id, user_id)
+        return xp, level
+
+    async def add(
+        self,
+        guild_id: int,
+        user_id: int,
+        given: int = 0,
+        received: int = 0,
+        xp: int = 0,
+    ) -> Optional[int]:
+        """Adds to the stars and XP of a member, creating them if needed.
+        Returns the new level if the member leveled up."""
+        key = (guild_id, user_id)
+        totals = await self._totals(guild_id, user_id)
+        self.events += 1
+
+        delta = self.pending.get(key)
+        if delta is None:
+            delta = self.pending[key] = _Delta()
+        delta.given += given
+        delta.received += received
+        delta.xp += xp
+
+        leveled_up: Optional[int] = None
+        if xp:
+            totals[0] = max(MIN_VALUE, min(totals[0] + xp, MAX_VALUE))
+            new_level = leveling_funcs.current_level(totals[0])
+            if new_level > totals[1]:
+                leveled_up = totals[1] = delta.level = new_level
+
+        if len(self.pending) >= FLUSH_AT and self._early_flush is None:
+            self._early_flush = self.bot.profiler.create_task(
+                "xp flushes", self._flush_early()
+            )
+        return leveled_up
+
+    def forget(self, guild_id: int, user_id: Optional[int] = None) -> None:
+        """Drops the XP kept for a member, or for every member of a
+        guild, so that it is read from the database again."""
+        if user_id is not None:
+            self.totals.pop((guild_id, user_id), None)
+            return
+        for key in [k for k in self.totals.keys() if k[0] == guild_id]:
+            self.totals.pop(key, None)
+
+    async def _flush_early(self) -> None:
+        try:
+            await self.flush()
+        finally:
+            self._early_flush = None
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+            try:
+                await self._write(pending)
+            except asyncpg.exceptions.DataError:
+                # Retrying the batch would fail forever, so the rows are
+                # written one at a time and the bad ones are dropped
+                for key, delta in pending.items():
+                    try:
+                        await self._write({key: delta})
+                    except asyncpg.exceptions.DataError as e:
+                        self.forget(*key)
+                        self.bot.dispatch(
+                            "log_error", "Error in XPBuffer", e, [key]
+                        )
+            except Exception as e:
+                # Keep the changes, so that the next flush retries them
+                for key, delta in pending.items():
+                    current = self.pending.get(key)
+                    if current is None:
+                        self.pending[key] = delta
+                    else:
+                        delta.merge(current)
+                        self.pending[key] = delta
+                self.bot.dispatch(
+                    "log_error", "Error in XPBuffer", e, [len(pending)]
+                )
+                return
+            self.flushes += 1
+            self.rows += len(pending)
+
+    async def _write(self, pending: dict[tuple[int, int], _Delta]) -> None:
+        await self.bot.db.execute(
+            self.FLUSH,
+            [k[0] for k in pending],
+            [k[1] for k in pending],
+            [d.given for d in pending.values()],
+            [d.received for d in pending.values()],
+            [d.xp for d in pending.values()],
+            [d.level for d in pending.values()],
+        )
+
+    @tasks.loop(seconds=FLUSH_INTERVAL)
+    async def flush_loop(self) -> None:
+        await self.flush()
+
+    async def close(self) -> None:
+        self.flush_loop.cancel()
+        await self.flush()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self.pending),
+            "cached": len(self.totals),
+            "events": self.events,
+            "flushes": self.flushes,
+            "rows": self.rows,
+        }
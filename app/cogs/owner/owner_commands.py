@@ -10,6 +10,9 @@ from discord.ext import commands
 
 from ... import checks, menus, utils
 from ...classes.bot import Bot
+from ...classes.profiler import Profiler
+from ...database import index_advisor
+from ...database.sql_stats import Histogram, SQLStats
 
 
 class Owner(commands.Cog):
@@ -27,9 +30,249 @@ class Owner(commands.Cog):
         )
 
         msgs = [f"```py\n{m['author']}: {m['data']}\n```" for m in _msgs]
+        if _msgs.missing:
+            msgs.append(f"No response from {', '.join(_msgs.missing)}")
 
         await ctx.send(" ".join(msgs))
 
+    @commands.command(name="ipcstats")
+    @checks.is_owner()
+    async def ipc_stats(self, ctx: commands.Context) -> None:
+        """Shows how quickly each client responds to IPC commands"""
+        stats = self.bot.websocket.responder_stats
+        if len(stats) == 0:
+            await ctx.send("Nothing to show")
+            return
+
+        lines = [
+            f"**{name}**: {utils.ms(s.average)} MS AVG | "
+            f"{utils.ms(s.max)} MS MAX | "
+            f"{s.responses} RESPONSES | {s.missed} MISSED"
+            for name, s in sorted(stats.items())
+        ]
+        await ctx.send(
+            embed=discord.Embed(
+                title="IPC Response Times",
+                description="\n".join(lines),
+                color=self.bot.theme_color,
+            )
+        )
+
+    @commands.command(name="loopstats", aliases=["perf"])
+    @checks.is_owner()
+    async def loop_stats(
+        self, ctx: commands.Context, scope: str = "cluster"
+    ) -> None:
+        """Shows event loop lag, listener times and queued background
+        work. Use scope `all` to include every cluster"""
+        if scope == "all":
+            responses = await self.bot.websocket.send_command(
+                "profile", {}, expect_resp=True
+            )
+            exports = [r["data"] for r in responses]
+        else:
+            exports = [self.bot.profiler.export()]
+        stats = Profiler.merge_exports(exports)
+
+        lag = stats["lag"]
+        pag = commands.Paginator(prefix="", suffix="", max_size=1000)
+        pag.add_line(
+            f"**Loop lag**: {utils.ms(lag.percentile(50))}/"
+            f"{utils.ms(lag.percentile(99))}/{utils.ms(lag.max)} MS "
+            f"P50/P99/MAX | {utils.ms(stats['last_lag'])} MS LAST\n"
+            f"**Tasks**: {stats['tasks']}\n"
+        )
+
+        pag.add_line("**Background work**")
+        for name, b in sorted(stats["background"].items()):
+            pending = b["started"] - b["finished"] - b["failed"]
+            pag.add_line(
+                f"`{name}`: {pending} PENDING | {b['finished']} FINISHED | "
+                f"{b['failed']} FAILED"
+            )
+
+        pag.add_line("\n**Listeners**")
+        listeners = sorted(
+            stats["listeners"].items(),
+            key=lambda ls: ls[1]["time"].total,
+            reverse=True,
+        )
+        for name, ls in listeners:
+            t = ls["time"]
+            pag.add_line(
+                f"`{name}`: {utils.ms(t.average)} MS AVG | "
+                f"{utils.ms(t.percentile(99))} MS P99 | "
+                f"{round(t.total, 2)} SECONDS TOTAL | {t.count} CALLS | "
+                f"{ls['errors']} ERRORS"
+            )
+
+        pag.add_line("\n**Events**")
+        events = sorted(
+            stats["events"].items(), key=lambda e: e[1], reverse=True
+        )
+        for name, count in events:
+            pag.add_line(f"`{name}`: {count}")
+
+        await menus.Paginator(
+            embeds=[
+                discord.Embed(
+                    title="Loop Stats",
+                    description=p,
+                    color=self.bot.theme_color,
+                )
+                for p in pag.pages
+            ],
+            delete_after=True,
+        ).start(ctx)
+
+    @commands.command(name="cachestats")
+    @checks.is_owner()
+    async def cache_stats(
+        self, ctx: commands.Context, scope: str = "cluster"
+    ) -> None:
+        """Shows how often messages are found in the message cache. Use
+        scope `all` to include every cluster"""
+        if scope == "all":
+            responses = await self.bot.websocket.send_command(
+                "cache_stats", {}, expect_resp=True
+            )
+            exports = [(r["author"], r["data"]) for r in responses]
+        else:
+            exports = [
+                (
+                    self.bot.cluster_name,
+                    self.bot.cache.message_stats.to_dict(),
+                )
+            ]
+
+        lines = []
+        for name, s in sorted(exports):
+            hits = s["hits"] + s["missing_hits"] + s["shared_hits"]
+            lookups = hits + s["fetches"]
+            rate = round(hits / lookups * 100, 1) if lookups else 0.0
+            lines.append(
+                f"**{name}**: {rate}% HIT RATE | {s['hits']} LOCAL | "
+                f"{s['shared_hits']} SHARED | {s['missing_hits']} MISSING | "
+                f"{s['fetches']} FETCHES | {s['patches']} PATCHED | "
+                f"{s['deleted']} DELETED"
+            )
+        await ctx.send(
+            embed=discord.Embed(
+                title="Message Cache",
+                description="\n".join(lines),
+                color=self.bot.theme_color,
+            )
+        )
+
+    @commands.command(name="xprstats")
+    @checks.is_owner()
+    async def xpr_stats(
+        self, ctx: commands.Context, scope: str = "cluster"
+    ) -> None:
+        """Shows how far behind XP role updates are. Use scope `all` to
+        include every cluster"""
+        if scope == "all":
+            responses = await self.bot.websocket.send_command(
+                "xpr_stats", {}, expect_resp=True
+            )
+            exports = [(r["author"], r["data"]) for r in responses]
+        else:
+            exports = [
+                (self.bot.cluster_name, self.bot.get_cog("XPREvents").stats())
+            ]
+
+        lines = []
+        for name, s in sorted(exports):
+            lag = Histogram.from_dict(s["lag"])
+            lines.append(
+                f"**{name}**: {s['queued']} QUEUED in {s['guilds']} GUILDS | "
+                f"{round(s['oldest'], 1)} SECONDS OLDEST | "
+                f"{round(lag.percentile(50), 1)}/"
+                f"{round(lag.percentile(99), 1)} SECONDS LAG P50/P99 | "
+                f"{s['checked']} CHECKED | {s['requests']} ROLE REQUESTS | "
+                f"{utils.ms(s['last_cycle'])} MS LAST CYCLE"
+            )
+        await ctx.send(
+            embed=discord.Embed(
+                title="XP Roles",
+                description="\n".join(lines),
+                color=self.bot.theme_color,
+            )
+        )
+
+    @commands.command(name="updatestats")
+    @checks.is_owner()
+    async def update_queue_stats(
+        self, ctx: commands.Context, scope: str = "cluster"
+    ) -> None:
+        """Shows how many starboard updates were coalesced. Use scope
+        `all` to include every cluster"""
+        if scope == "all":
+            responses = await self.bot.websocket.send_command(
+                "update_queue_stats", {}, expect_resp=True
+            )
+            exports = [(r["author"], r["data"]) for r in responses]
+        else:
+            exports = [
+                (
+                    self.bot.cluster_name,
+                    self.bot.get_cog("StarboardEvents").queue.stats(),
+                )
+            ]
+
+        lines = []
+        for name, s in sorted(exports):
+            rate = (
+                round(s["coalesced"] / s["scheduled"] * 100, 1)
+                if s["scheduled"]
+                else 0.0
+            )
+            lines.append(
+                f"**{name}**: {s['pending']} PENDING | "
+                f"{s['scheduled']} SCHEDULED | {s['coalesced']} COALESCED "
+                f"({rate}%) | {s['updates']} UPDATES"
+            )
+        await ctx.send(
+            embed=discord.Embed(
+                title="Starboard Updates",
+                description="\n".join(lines),
+                color=self.bot.theme_color,
+            )
+        )
+
+    @commands.command(name="xpstats")
+    @checks.is_owner()
+    async def xp_buffer_stats(
+        self, ctx: commands.Context, scope: str = "cluster"
+    ) -> None:
+        """Shows how many star and XP changes are waiting to be saved. Use
+        scope `all` to include every cluster"""
+        if scope == "all":
+            responses = await self.bot.websocket.send_command(
+                "xp_buffer_stats", {}, expect_resp=True
+            )
+            exports = [(r["author"], r["data"]) for r in responses]
+        else:
+            exports = [(self.bot.cluster_name, self.bot.xp_buffer.stats())]
+
+        lines = []
+        for name, s in sorted(exports):
+            per_flush = (
+                round(s["rows"] / s["flushes"], 1) if s["flushes"] else 0
+            )
+            lines.append(
+                f"**{name}**: {s['pending']} PENDING | {s['cached']} CACHED | "
+                f"{s['events']} EVENTS | {s['flushes']} FLUSHES | "
+                f"{s['rows']} ROWS ({per_flush} PER FLUSH)"
+            )
+        await ctx.send(
+            embed=discord.Embed(
+                title="XP Buffer",
+                description="\n".join(lines),
+                color=self.bot.theme_color,
+            )
+        )
+
     @commands.command(name="eval")
     @checks.is_owner()
     async def _eval(self, ctx, *, body: str):
@@ -81,43 +324,62 @@ class Owner(commands.Cog):
     @commands.command(name="sqltimes")
     @checks.is_owner()
     async def get_sql_times(
-        self, ctx: commands.Context, sort_by: str = "total"
+        self,
+        ctx: commands.Context,
+        sort_by: str = "total",
+        scope: str = "cluster",
     ) -> None:
-        """Shows stats on SQL queries"""
-        if sort_by not in ["avg", "total", "exec"]:
-            await ctx.send("Valid optons are `avg`, `total`, and `exec`.")
+        """Shows stats on SQL queries. Use scope `all` to include every
+        cluster"""
+        sorters = {
+            "avg": lambda q: q["execute"].average,
+            "total": lambda q: q["execute"].total,
+            "exec": lambda q: q["calls"],
+            "p99": lambda q: q["execute"].percentile(99),
+            "recent": lambda q: q["recent"].percentile(99),
+        }
+        if sort_by not in sorters:
+            await ctx.send(
+                "Valid optons are `avg`, `total`, `exec`, `p99`, "
+                "and `recent`."
+            )
             return
 
-        times = []
-        for sql in self.bot.db.sql_times:
-            total_time = 0
-            executions = 0
-            for exec_time in self.bot.db.sql_times[sql]:
-                executions += 1
-                total_time += exec_time
-            times.append(
-                (sql, (total_time / executions, total_time, executions))
+        if scope == "all":
+            responses = await self.bot.websocket.send_command(
+                "sql_stats", {}, expect_resp=True
             )
-        pag = commands.Paginator(prefix="", suffix="", max_size=1000)
-        if len(times) == 0:
+            exports = [r["data"] for r in responses]
+        else:
+            exports = [self.bot.db.sql_stats.export()]
+        stats = SQLStats.merge_exports(exports)
+
+        if len(stats["queries"]) == 0:
             await ctx.send("Nothing to show")
             return
 
-        def sorter(t):
-            if sort_by == "avg":
-                return t[1][0]
-            elif sort_by == "total":
-                return t[1][1]
-            elif sort_by == "exec":
-                return t[1][2]
-
-        times.sort(key=sorter, reverse=True)
-        for sql, exec_time in times:
+        queries = sorted(
+            stats["queries"].items(),
+            key=lambda q: sorters[sort_by](q[1]),
+            reverse=True,
+        )
+        acquire = stats["acquire"]
+        pag = commands.Paginator(prefix="", suffix="", max_size=1000)
+        pag.add_line(
+            f"CONNECTION WAIT: {utils.ms(acquire.percentile(50))} MS P50 | "
+            f"{utils.ms(acquire.percentile(99))} MS P99\n"
+        )
+        for sql, q in queries:
+            execute, recent = q["execute"], q["recent"]
             pag.add_line(
                 f"```{sql}```"
-                f"{utils.ms(exec_time[0])} MS AVG | "
-                f"{round(exec_time[1], 2)} SECONDS TOTAL | "
-                f"{exec_time[2]} EXECUTIONS\n"
+                f"{utils.ms(execute.average)} MS AVG | "
+                f"{utils.ms(execute.percentile(50))}/"
+                f"{utils.ms(execute.percentile(95))}/"
+                f"{utils.ms(execute.percentile(99))} MS P50/95/99 | "
+                f"{utils.ms(recent.percentile(99))} MS RECENT P99 | "
+                f"{round(execute.total, 2)} SECONDS TOTAL | "
+                f"{q['calls']} EXECUTIONS | {q['rows']} ROWS\n"
             )
 
         await menus.Paginator(
@@ -132,10 +394,82 @@ class Owner(commands.Cog):
             delete_after=True,
         ).start(ctx)
 
+    @commands.command(name="indexadvisor", aliases=["seqscans"])
+    @checks.is_owner()
+    async def index_advisor(
+        self, ctx: commands.Context, min_executions: int = 10
+    ) -> None:
+        """Shows frequent SQL queries that use sequential scans"""
+        async with ctx.typing():
+            scans = await index_advisor.find_seq_scans(
+                self.bot.db, min_executions
+            )
+        if len(scans) == 0:
+            await ctx.send("Nothing to show")
+            return
+
+        pag = commands.Paginator(prefix="", suffix="", max_size=1000)
+        for scan in scans:
+            pag.add_line(
+                f"```{scan.sql}```"
+                f"SEQ SCAN ON {', '.join(scan.tables)} | "
+                f"{utils.ms(scan.total / scan.executions)} MS AVG | "
+                f"{round(scan.total, 2)} SECONDS TOTAL | "
+                f"{scan.executions} EXECUTIONS\n"
+            )
+
+        await menus.Paginator(
+            embeds=[
+                discord.Embed(
+                    title="Index Advisor",
+                    description=p,
+                    color=self.bot.theme_color,
+                )
+                for p in pag.pages
+            ],
+            delete_after=True,
+        ).start(ctx)
+
+    @commands.command(name="sqlbench")
+    @checks.is_owner()
+    async def sql_bench(self, ctx: commands.Context, runs: int = 100) -> None:
+        """Benchmarks read-only statements with and without transactions"""
+        async with ctx.typing():
+            results = await self.bot.db.benchmark_statements(runs)
+        if len(results) == 0:
+            await ctx.send("Nothing to show")
+            return
+
+        lines = [
+            f"`{name}`: {utils.ms(old)} MS -> {utils.ms(new)} MS "
+            f"({round(old / new, 2)}x)"
+            for name, old, new in results
+        ]
+        await ctx.send(
+            embed=discord.Embed(
+                title=f"SQL Bench ({runs} runs)",
+                description="\n".join(lines),
+                color=self.bot.theme_color,
+            )
+        )
+
     @commands.command(name="restart")
     @checks.is_owner()
-    async def restart_bot(self, ctx: commands.Context) -> None:
-        """Restars all clusters"""
+    async def restart_bot(
+        self, ctx: commands.Context, mode: str = "all"
+    ) -> None:
+        """Restars all clusters. With the "rolling" mode, the launcher
+        restarts them one at a time instead of all at once."""
+        if mode == "rolling":
+            if not await menus.Confirm(
+                "Restart the clusters one at a time?"
+            ).start(ctx):
+                await ctx.send("Cancelled")
+                return
+            self.bot.request_restart("rolling")
+            await ctx.send("Rolling restart started.")
+            return
+
         if not await menus.Confirm("Restart all clusters?").start(ctx):
             await ctx.send("Cancelled")
             return
@@ -44,47 +44,5 @@ async def get_perms(
     channel_id: Optional[int],
     starboard_id: Optional[int],
 ) -> dict[str, bool]:
-    groups = await bot.db.fetch(
-        """SELECT * FROM permgroups
-        WHERE guild_id=$1
-        AND (
-            channels='{}'
-            OR $2::numeric IS NULL
-            OR $2::numeric=any(channels)
-        )
-        AND (
-            starboards='{}'
-            OR $3::numeric IS NULL
-            OR $3::numeric=any(starboards)
-        )
-        """,
-        guild_id,
-        channel_id,
-        starboard_id,
-    )
-
-    permroles = []
-    for g in groups:
-        permroles += await bot.db.fetch(
-            """SELECT * FROM permroles
-            WHERE permgroup_id=$1
-            AND role_id=any($2::numeric[])""",
-            g["id"],
-            roles,
-        )
-
-    perms = {
-        "allow_commands": True,
-        "on_starboard": True,
-        "give_stars": True,
-        "gain_xp": True,
-        "pos_roles": True,
-        "xp_roles": True,
-    }
-    for pr in permroles:
-        for key in perms.keys():
-            if pr[key] is None:
-                continue
-            perms[key] = pr[key]
-
-    return perms
+    table = await bot.db.permgroups.get_table(guild_id)
+    return table.resolve(roles, channel_id, starboard_id)
@@ -47,7 +47,9 @@ class DonateEvents(commands.Cog):
         )
 
         await self.bot.websocket.send_command(
-            "update_prem_roles", {"user_id": discord_id}
+            "update_prem_roles",
+            {"user_id": discord_id},
+            guild_id=config.ROLE_SERVER,
         )
 
         await alert_donator(
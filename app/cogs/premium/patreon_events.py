@@ -5,6 +5,7 @@ import typing
 import discord
 from discord.ext import commands, tasks
 
+import config
 from app.i18n import t_
 
 from . import patreon
@@ -95,7 +96,9 @@ class PatreonEvents(commands.Cog):
                 await alert_patron(self.bot, int(sql_user["id"]), text)
 
             await self.bot.websocket.send_command(
-                "update_prem_roles", {"user_id": int(patron["discord_id"])}
+                "update_prem_roles",
+                {"user_id": int(patron["discord_id"])},
+                guild_id=config.ROLE_SERVER,
             )
 
         # Check for removed/cancelled patrons
@@ -114,7 +117,9 @@ class PatreonEvents(commands.Cog):
             )
 
             await self.bot.websocket.send_command(
-                "update_prem_roles", {"user_id": int(p["id"])}
+                "update_prem_roles",
+                {"user_id": int(p["id"])},
+                guild_id=config.ROLE_SERVER,
             )
 
             await alert_patron(
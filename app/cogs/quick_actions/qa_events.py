@@ -70,7 +70,7 @@ class QAEvents(commands.Cog):
             return
 
         orig_message = await starboard_funcs.orig_message(
-            self.bot, payload.message_id
+            self.bot, payload.message_id, payload.guild_id
         )
         if not orig_message:
             await self.bot.db.messages.create(
@@ -99,10 +99,12 @@ async def qa_recount(
 ) -> bool:
     if not member.guild_permissions.manage_messages:
         return False
+    # Reactions aren't cached, so the message is always fetched
     message = await bot.cache.fetch_message(
         int(orig_message["guild_id"]),
         int(orig_message["channel_id"]),
         int(orig_message["id"]),
+        fresh=True,
     )
     if not message:
         return
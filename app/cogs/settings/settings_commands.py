@@ -84,16 +84,12 @@ class Settings(commands.Cog):
     ) -> None:
         guild = await self.bot.db.guilds.get(ctx.guild.id)
         name = command.qualified_name
-        new_commands = guild["disabled_commands"]
+        new_commands = list(guild["disabled_commands"])
         if name in new_commands:
             raise errors.AlreadyDisabled(name)
         new_commands.append(name)
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET disabled_commands=$1::text[]
-            WHERE id=$2""",
-            new_commands,
-            ctx.guild.id,
+        await self.bot.db.guilds.set(
+            ctx.guild.id, disabled_commands=new_commands
         )
         await ctx.send(t_("Disabled `{0}`.").format(name))
 
@@ -104,16 +100,12 @@ class Settings(commands.Cog):
     ) -> None:
         guild = await self.bot.db.guilds.get(ctx.guild.id)
         name = command.qualified_name
-        new_commands = guild["disabled_commands"]
+        new_commands = list(guild["disabled_commands"])
         if name not in new_commands:
             raise errors.NotDisabled(name)
         new_commands.remove(name)
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET disabled_commands=$1::text[]
-            WHERE id=$2""",
-            new_commands,
-            ctx.guild.id,
+        await self.bot.db.guilds.set(
+            ctx.guild.id, disabled_commands=new_commands
         )
         await ctx.send(t_("Enabled `{0}`.").format(name))
 
@@ -214,9 +206,7 @@ class Settings(commands.Cog):
     )
     @commands.has_guild_permissions(manage_messages=True)
     async def enable_quickactions(self, ctx: commands.Context) -> None:
-        await self.bot.db.execute(
-            """UPDATE guilds SET qa_enabled=True WHERE id=$1""", ctx.guild.id
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, qa_enabled=True)
         await ctx.send(t_("Enabled quickActions."))
 
     @quickactions.command(
@@ -226,9 +216,7 @@ class Settings(commands.Cog):
     )
     @commands.has_guild_permissions(manage_messages=True)
     async def disable_quickactions(self, ctx: commands.Context) -> None:
-        await self.bot.db.execute(
-            """UPDATE guilds SET qa_enabled=False WHERE id=$1""", ctx.guild.id
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, qa_enabled=False)
         await ctx.send(t_("Disabled quickActions."))
 
     @quickactions.command(
@@ -236,16 +224,14 @@ class Settings(commands.Cog):
     )
     @commands.has_guild_permissions(manage_messages=True)
     async def reset_quickactions(self, ctx: commands.Context) -> None:
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET qa_force='🔒',
-            qa_unforce='🔓',
-            qa_freeze='❄️',
-            qa_trash='🗑️',
-            qa_recount='🔃',
-            qa_save='📥'
-            WHERE id=$1""",
+        await self.bot.db.guilds.set(
             ctx.guild.id,
+            qa_force="🔒",
+            qa_unforce="🔓",
+            qa_freeze="❄️",
+            qa_trash="🗑️",
+            qa_recount="🔃",
+            qa_save="📥",
         )
         await ctx.send(t_("Reset quickActions."))
 
@@ -258,13 +244,7 @@ class Settings(commands.Cog):
     ) -> None:
         clean = utils.clean_emoji(emoji)
         await raise_if_exists(clean, ctx)
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET qa_force=$1
-            WHERE id=$2""",
-            clean,
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, qa_force=clean)
         await ctx.send(t_("Set the force quickAction to {0}.").format(emoji))
 
     @quickactions.command(
@@ -276,13 +256,7 @@ class Settings(commands.Cog):
     ) -> None:
         clean = utils.clean_emoji(emoji)
         await raise_if_exists(clean, ctx)
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET qa_unforce=$1
-            WHERE id=$2""",
-            clean,
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, qa_unforce=clean)
         await ctx.send(t_("Set the unforce quickAction to {0}.").format(emoji))
 
     @quickactions.command(
@@ -296,13 +270,7 @@ class Settings(commands.Cog):
     ) -> None:
         clean = utils.clean_emoji(emoji)
         await raise_if_exists(clean, ctx)
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET qa_freeze=$1
-            WHERE id=$2""",
-            clean,
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, qa_freeze=clean)
         await ctx.send(
             t_("Set the freeze/unfreeze quickAction to {0}.").format(emoji)
         )
@@ -316,13 +284,7 @@ class Settings(commands.Cog):
     ) -> None:
         clean = utils.clean_emoji(emoji)
         await raise_if_exists(clean, ctx)
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET qa_trash=$1
-            WHERE id=$2""",
-            clean,
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, qa_trash=clean)
         await ctx.send(
             t_("Set the trash/untrash quickAction to {0}.").format(emoji)
         )
@@ -336,13 +298,7 @@ class Settings(commands.Cog):
     ) -> None:
         clean = utils.clean_emoji(emoji)
         await raise_if_exists(clean, ctx)
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET qa_recount=$1
-            WHERE id=$2""",
-            clean,
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, qa_recount=clean)
         await ctx.send(t_("Set the recount quickAction to {0}.").format(emoji))
 
     @quickactions.command(
@@ -354,13 +310,7 @@ class Settings(commands.Cog):
     ) -> None:
         clean = utils.clean_emoji(emoji)
         await raise_if_exists(clean, ctx)
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET qa_save=$1
-            WHERE id=$2""",
-            clean,
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, qa_save=clean)
         await ctx.send(t_("Set the save quickAction to {0}.").format(emoji))
 
     @commands.group(
@@ -405,15 +355,8 @@ class Settings(commands.Cog):
         guild = await self.bot.db.guilds.get(ctx.guild.id)
         if prefix in guild["prefixes"]:
             raise errors.AlreadyPrefix(prefix)
-        new_prefixes = guild["prefixes"] + [prefix]
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET prefixes=$1
-            WHERE id=$2""",
-            new_prefixes,
-            ctx.guild.id,
-        )
-        await self.bot.db.guilds.cache.delete(ctx.guild.id)
+        new_prefixes = list(guild["prefixes"]) + [prefix]
+        await self.bot.db.guilds.set(ctx.guild.id, prefixes=new_prefixes)
 
         await ctx.send(t_("Added `{0}` to the prefixes.").format(prefix))
 
@@ -457,17 +400,10 @@ class Settings(commands.Cog):
                     await ctx.send(t_("Cancelled."))
                     return
                 to_remove = match
-        new_prefixes = guild["prefixes"]
+        new_prefixes = list(guild["prefixes"])
         new_prefixes.remove(to_remove)
 
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET prefixes=$1
-            WHERE id=$2""",
-            new_prefixes,
-            ctx.guild.id,
-        )
-        await self.bot.db.guilds.cache.delete(ctx.guild.id)
+        await self.bot.db.guilds.set(ctx.guild.id, prefixes=new_prefixes)
 
         await ctx.send(
             t_("Removed `{0}` from the prefixes.").format(to_remove)
@@ -487,12 +423,7 @@ class Settings(commands.Cog):
         ).start(ctx):
             await ctx.send(t_("Cancelled."))
             return
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET prefixes='{"sb!"}'
-            WHERE id=$1""",
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, prefixes=["sb!"])
         await ctx.send(t_("Cleared all prefixes and added `sb!`."))
 
     @commands.command(
@@ -522,12 +453,8 @@ class Settings(commands.Cog):
                 )
                 return
 
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET level_channel=$1
-            WHERE id=$2""",
-            channel.id if channel else None,
-            ctx.guild.id,
+        await self.bot.db.guilds.set(
+            ctx.guild.id, level_channel=channel.id if channel else None
         )
         if channel:
             await ctx.send(
@@ -545,11 +472,7 @@ class Settings(commands.Cog):
     async def set_level_ping(
         self, ctx: commands.Context, ping: converters.mybool
     ) -> None:
-        await self.bot.db.execute(
-            """UPDATE guilds SET ping_user=$1 WHERE id=$2""",
-            ping,
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, ping_user=ping)
         if ping:
             await ctx.send(t_("I will now ping users when the level up."))
         else:
@@ -582,14 +505,9 @@ class Settings(commands.Cog):
                 )
                 return
 
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET log_channel=$1
-            WHERE id=$2""",
-            channel.id if channel else None,
-            ctx.guild.id,
+        await self.bot.db.guilds.set(
+            ctx.guild.id, log_channel=channel.id if channel else None
         )
-        await self.bot.db.guilds.cache.delete(ctx.guild.id)
         if channel:
             await ctx.send(
                 t_("Set the log channel to {0}.").format(channel.mention)
@@ -616,13 +534,7 @@ class Settings(commands.Cog):
     async def set_allow_commands(
         self, ctx: commands.Context, value: converters.mybool
     ) -> None:
-        await self.bot.db.execute(
-            """UPDATE guilds
-            SET allow_commands=$1
-            WHERE id=$2""",
-            value,
-            ctx.guild.id,
-        )
+        await self.bot.db.guilds.set(ctx.guild.id, allow_commands=value)
         await ctx.send(t_("Set allowCommands to **{0}**.").format(value))
 
 
@@ -1,17 +1,28 @@
 import discord
 from discord.ext import commands
 
+import config
 from app import utils
 from app.classes.bot import Bot
 from app.cogs.utility import utility_funcs
 from app.i18n import t_
 
 from . import starboard_funcs
+from .starboard_queue import UpdateQueue
 
 
 class StarboardEvents(commands.Cog):
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
+        # Configs from before these settings existed use the defaults
+        self.queue = UpdateQueue(
+            bot,
+            getattr(config, "UPDATE_DELAY", 1),
+            getattr(config, "UPDATE_MAX_LATENCY", 5),
+        )
+
+    def cog_unload(self) -> None:
+        self.queue.cancel_all()
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(
@@ -19,7 +30,9 @@ class StarboardEvents(commands.Cog):
     ) -> None:
         if not isinstance(channel, discord.TextChannel):
             return
-        starboard = await self.bot.db.starboards.get(channel.id)
+        starboard = await self.bot.db.starboards.get(
+            channel.id, channel.guild.id
+        )
         if not starboard:
             return
         await self.bot.db.starboards.delete(channel.id)
@@ -33,11 +46,53 @@ class StarboardEvents(commands.Cog):
                 channel.guild,
             )
 
+    # Whether a reactor is counted depends on their roles and on them
+    # being in the guild, so the counters they appear in are dropped.
+    # The message is recounted the next time it is updated.
+    @commands.Cog.listener()
+    async def on_member_update(
+        self, before: discord.Member, after: discord.Member
+    ) -> None:
+        if before.roles != after.roles:
+            self.bot.point_counter.invalidate_member(after.guild.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member) -> None:
+        self.bot.point_counter.invalidate_member(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member) -> None:
+        self.bot.point_counter.invalidate_member(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(
+        self, payload: discord.RawMessageUpdateEvent
+    ) -> None:
+        guild_id = payload.data.get("guild_id")
+        if not guild_id:
+            return
+        # Most edited messages were never starred, so once the guild's
+        # starred messages are loaded this avoids touching the database
+        if not await self.bot.db.sb_messages.is_starred(
+            int(guild_id), payload.message_id
+        ):
+            return
+        # The cache is patched by CacheEvents, and the update waits long
+        # enough for that. Whether the starboard message is actually
+        # edited depends on the starboard's link_edits.
+        self.queue.schedule(payload.message_id, int(guild_id))
+
     @commands.Cog.listener()
     async def on_raw_message_delete(
         self, payload: discord.RawMessageDeleteEvent
     ) -> None:
-        sb_message = await self.bot.db.sb_messages.get(payload.message_id)
+        if payload.guild_id:
+            self.bot.db.sb_messages.starred.remove(
+                payload.guild_id, payload.message_id
+            )
+        sb_message = await self.bot.db.sb_messages.get(
+            payload.message_id, payload.guild_id
+        )
         if sb_message:
             # Delete the starboard message
             await self.bot.db.sb_messages.delete(sb_message["id"])
@@ -66,13 +121,9 @@ class StarboardEvents(commands.Cog):
         # Check if is starEmoji
         emoji = utils.clean_emoji(payload.emoji)
 
-        # Create necessary data
-        await self.bot.db.users.create(payload.member.id, payload.member.bot)
-        await self.bot.db.members.create(payload.member.id, payload.guild_id)
-
         # Get/create the message
         sql_message = await starboard_funcs.orig_message(
-            self.bot, payload.message_id
+            self.bot, payload.message_id, payload.guild_id
         )
         if sql_message:
             guild_id, channel_id, message_id = (
@@ -108,21 +159,20 @@ class StarboardEvents(commands.Cog):
         else:
             author_roles = [r.id for r in _author[author_id].roles]
 
+        # Create necessary data, and the message if needed
+        users = [(payload.member.id, payload.member.bot)]
+        new_message = None
         if not sql_message:
-            # Create message + needed data
-            await self.bot.db.users.create(
-                message.author.id, message.author.bot
-            )
-            await self.bot.db.members.create(
-                message.author.id, payload.guild_id
-            )
-            await self.bot.db.messages.create(
+            users.append((message.author.id, message.author.bot))
+            new_message = (
                 message.id,
-                message.guild.id,
                 message.channel.id,
                 message.author.id,
                 message.channel.is_nsfw(),
             )
+        await self.bot.db.entities.ensure(
+            payload.guild_id, users, message=new_message
+        )
 
         sql_author = await self.bot.db.users.get(author_id)
 
@@ -156,12 +206,20 @@ class StarboardEvents(commands.Cog):
             return
 
         # Create the reaction
-        await self.bot.db.reactions.create_reaction_user(
-            emoji, message_id, payload.user_id
-        )
-        await starboard_funcs.update_message(
-            self.bot, message_id, payload.guild_id
-        )
+        async with self.bot.point_counter.lock(message_id):
+            added = await self.bot.db.reactions.add(
+                emoji, message_id, payload.user_id
+            )
+            if sql_message and added:
+                await starboard_funcs.count_reaction(
+                    self.bot,
+                    sql_message,
+                    payload.user_id,
+                    [r.id for r in payload.member.roles],
+                    emoji,
+                    1,
+                )
+        self.queue.schedule(message_id, payload.guild_id)
 
         self.bot.dispatch(
             "star_update",
@@ -188,7 +246,7 @@ class StarboardEvents(commands.Cog):
             return
 
         orig_message = await starboard_funcs.orig_message(
-            self.bot, payload.message_id
+            self.bot, payload.message_id, payload.guild_id
         )
         if orig_message is None:
             return
@@ -196,17 +254,16 @@ class StarboardEvents(commands.Cog):
         if orig_message["frozen"] or orig_message["trashed"]:
             return
 
-        r_user = await self.bot.db.reactions.get_reaction_user(
-            emoji, int(orig_message["id"]), payload.user_id
-        )
-        if not r_user:
-            return
-        await self.bot.db.reactions.delete_reaction_user(
-            emoji, int(orig_message["id"]), payload.user_id
-        )
-        await starboard_funcs.update_message(
-            self.bot, orig_message["id"], payload.guild_id
-        )
+        async with self.bot.point_counter.lock(int(orig_message["id"])):
+            removed = await self.bot.db.reactions.remove(
+                emoji, int(orig_message["id"]), payload.user_id
+            )
+            if not removed:
+                return
+            await starboard_funcs.count_reaction(
+                self.bot, orig_message, payload.user_id, None, emoji, -1
+            )
+        self.queue.schedule(int(orig_message["id"]), payload.guild_id)
 
         self.bot.dispatch(
             "star_update",
@@ -1,10 +1,10 @@
-import asyncio
 from typing import Optional
 
 import discord
 
 from app import gifs, utils
 from app.classes.bot import Bot
+from app.classes.perm_table import PermTable
 from app.cogs.permroles import pr_functions
 from app.i18n import t_
 
@@ -34,15 +34,10 @@ async def can_add(
         return False, False  # Completely ignore bot reactions
 
     # First check if the emoji is a starEmoji on any of the starboards
-    _starboards = await bot.db.fetch(
-        """SELECT * FROM starboards
-        WHERE guild_id=$1
-        AND $2=any(star_emojis)""",
-        guild_id,
-        emoji,
-    )
     starboards: list[dict] = []
-    for s in _starboards:
+    for s in await bot.db.starboards.get_many(guild_id):
+        if emoji not in s["star_emojis"]:
+            continue
         if s["channel_wl"]:
             if channel_id not in [int(cid) for cid in s["channel_wl"]]:
                 continue
@@ -137,7 +132,9 @@ def get_plain_text(
 async def get_or_set_webhook(
     bot: Bot, starboard: discord.TextChannel
 ) -> Optional[discord.Webhook]:
-    sql_starboard = await bot.db.starboards.get(starboard.id)
+    sql_starboard = await bot.db.starboards.get(
+        starboard.id, starboard.guild.id
+    )
     webhook = None
     if sql_starboard["webhook_url"]:
         webhook = bot.get_webhook(sql_starboard["webhook_url"])
@@ -160,13 +157,15 @@ async def sbemojis(bot: Bot, guild_id: int) -> list[str]:
     return await bot.db.starboards.star_emojis(guild_id)
 
 
-async def orig_message(bot: Bot, message_id: int) -> Optional[dict]:
-    starboard_message = await bot.db.sb_messages.get(message_id)
+async def orig_message(
+    bot: Bot, message_id: int, guild_id: Optional[int] = None
+) -> Optional[dict]:
+    starboard_message = await bot.db.sb_messages.get(message_id, guild_id)
 
     if starboard_message is not None:
         return await bot.db.messages.get(starboard_message["orig_id"])
 
-    return await bot.db.messages.get(message_id)
+    return await bot.db.messages.get(message_id, guild_id)
 
 
 async def embed_message(
@@ -408,10 +407,19 @@ async def update_message(bot: Bot, message_id: int, guild_id: int) -> None:
     sql_author = await bot.db.users.get(sql_message["author_id"])
     all_tasks = []
     if not sql_message["trashed"]:
+        all_points = await get_points(bot, sql_message, sql_starboards, guild)
         for s in sql_starboards:
             all_tasks.append(
-                asyncio.create_task(
-                    handle_starboard(bot, s, sql_message, sql_author, guild)
+                bot.profiler.create_task(
+                    "handle_starboard",
+                    handle_starboard(
+                        bot,
+                        s,
+                        sql_message,
+                        sql_author,
+                        guild,
+                        points=all_points[int(s["id"])],
+                    ),
                 )
             )
         for t in all_tasks:
@@ -430,47 +438,144 @@ async def set_points(bot: Bot, points: int, message_id: int) -> None:
     )
 
 
+def points_key(table: PermTable, starboards: list[dict]) -> tuple:
+    """The config that point counters depend on. If any of this changes,
+    the counters of a message are recalculated from scratch."""
+    return (
+        table.version,
+        tuple(
+            (int(s["id"]), tuple(s["star_emojis"]), s["self_star"])
+            for s in starboards
+        ),
+    )
+
+
+async def get_user_emojis(bot: Bot, message_id: int) -> dict[int, list[str]]:
+    """Returns user_id -> the emojis they reacted with."""
+    _reactions = await bot.db.reactions.get_many(message_id)
+
+    user_emojis: dict[int, list[str]] = {}
+    for r in _reactions:
+        user_emojis.setdefault(int(r["user_id"]), []).append(r["emoji"])
+    return user_emojis
+
+
+async def calculate_reactors(
+    bot: Bot,
+    message: dict,
+    starboards: list[dict],
+    guild: discord.Guild,
+    user_emojis: Optional[dict[int, list[str]]] = None,
+) -> dict[int, dict[int, int]]:
+    """Finds the valid reactors of a message for several starboards at
+    once, using a single query and a single member lookup.
+
+    Returns starboard_id -> {user_id: number of valid emojis}"""
+    if user_emojis is None:
+        user_emojis = await get_user_emojis(bot, message["id"])
+
+    user_objs = await bot.cache.get_members(list(user_emojis.keys()), guild)
+    table = await bot.db.permgroups.get_table(guild.id)
+    author_id = int(message["author_id"])
+
+    result: dict[int, dict[int, int]] = {}
+    for s in starboards:
+        star_emojis = set(s["star_emojis"])
+        valid: dict[int, int] = {}
+        for uid, emojis in user_emojis.items():
+            if s["self_star"] is False and uid == author_id:
+                continue
+            count = len([e for e in emojis if e in star_emojis])
+            if count == 0:
+                continue
+            obj = user_objs.get(uid, None)
+            if not obj:
+                continue
+            perms = table.resolve(
+                [r.id for r in obj.roles], message["channel_id"], s["id"]
+            )
+            if not perms["give_stars"]:
+                continue
+            valid[uid] = count
+        result[int(s["id"])] = valid
+    return result
+
+
+async def calculate_points_many(
+    bot: Bot, message: dict, starboards: list[dict], guild: discord.Guild
+) -> dict[int, int]:
+    reactors = await calculate_reactors(bot, message, starboards, guild)
+    return {sid: len(users) for sid, users in reactors.items()}
+
+
 async def calculate_points(
     bot: Bot, message: dict, starboard: dict, guild: discord.Guild
 ) -> int:
-    _reactions = await bot.db.fetch(
-        """SELECT * FROM reactions
-        WHERE message_id=$1
-        AND emoji=any($2::TEXT[])""",
-        message["id"],
-        starboard["star_emojis"],
-    )
+    points = await calculate_points_many(bot, message, [starboard], guild)
+    return points[int(starboard["id"])]
+
+
+async def get_points(
+    bot: Bot, message: dict, starboards: list[dict], guild: discord.Guild
+) -> dict[int, int]:
+    """Returns the points of a message from the point counters, or
+    recounts them if the message isn't cached."""
+    table = await bot.db.permgroups.get_table(guild.id)
+    key = points_key(table, starboards)
+    message_id = int(message["id"])
+    async with bot.point_counter.lock(message_id):
+        points = bot.point_counter.get(message_id, key)
+        if points is None:
+            user_emojis = await get_user_emojis(bot, message_id)
+            reactors = await calculate_reactors(
+                bot, message, starboards, guild, user_emojis
+            )
+            bot.point_counter.set(
+                message_id, guild.id, key, reactors, user_emojis
+            )
+            points = {sid: len(users) for sid, users in reactors.items()}
+    return points
 
-    if starboard["self_star"] is False:
-        uid = message["author_id"]
-    else:
-        uid = None
-
-    _reactions = await bot.db.fetch(
-        """SELECT * FROM reaction_users
-        WHERE reaction_id=any($1::BIGINT[])
-        AND ($2::numeric IS NULL OR $2::numeric!=user_id)""",
-        [r["id"] for r in _reactions],
-        uid,
-    )
-    users = list(set(int(r["user_id"]) for r in _reactions))
-    user_objs = await bot.cache.get_members(users, guild)
-    valid = 0
-    for uid in users:
-        obj = user_objs.get(uid, None)
-        if not obj:
-            continue
-        perms = await pr_functions.get_perms(
-            bot,
-            [r.id for r in obj.roles],
-            guild.id,
-            message["channel_id"],
-            starboard["id"],
-        )
-        if not perms["give_stars"]:
+
+async def count_reaction(
+    bot: Bot,
+    message: dict,
+    user_id: int,
+    roles: Optional[list[int]],
+    emoji: str,
+    delta: int,
+) -> None:
+    """Applies a single added (delta=1) or removed (delta=-1) reaction to
+    the point counters of a message. Should be called while holding
+    bot.point_counter.lock(message_id), right after the reaction was
+    written to the database.
+
+    roles is only needed for added reactions, since removing a reaction
+    only has to undo a point if it was counted in the first place."""
+    guild_id = int(message["guild_id"])
+    starboards = await bot.db.starboards.get_many(guild_id)
+    table = await bot.db.permgroups.get_table(guild_id)
+    key = points_key(table, starboards)
+    message_id = int(message["id"])
+    if delta > 0:
+        bot.point_counter.track(message_id, user_id)
+
+    for s in starboards:
+        if emoji not in s["star_emojis"]:
             continue
-        valid += 1
-    return valid
+        if delta > 0:
+            if s["self_star"] is False and user_id == int(
+                message["author_id"]
+            ):
+                continue
+            perms = table.resolve(roles, message["channel_id"], s["id"])
+            if not perms["give_stars"]:
+                continue
+        if not bot.point_counter.apply(
+            message_id, key, int(s["id"]), user_id, delta
+        ):
+            # No valid counters, so the next update recounts anyways
+            return
 
 
 async def handle_trashed_message(
@@ -521,8 +626,7 @@ async def try_regex(
     string = message.system_content
     jump = message.jump_url
     try:
-        if utils.safe_regex(string, pattern):
-            return True
+        matched = await bot.regex.search(pattern, string)
     except TimeoutError:
         async with bot.temp_locale(message.guild):
             bot.dispatch(
@@ -537,7 +641,20 @@ async def try_regex(
                 message.guild,
             )
         return None
-    return False
+
+    if bot.regex.should_warn(pattern):
+        async with bot.temp_locale(message.guild):
+            bot.dispatch(
+                "guild_log",
+                t_(
+                    "The regex `{0}` is slow to match against messages. "
+                    "Try improving its efficiency, or it may start to "
+                    "time out."
+                ).format(pattern),
+                "info",
+                message.guild,
+            )
+    return matched
 
 
 async def handle_starboard(
@@ -546,6 +663,7 @@ async def handle_starboard(
     sql_message: dict,
     sql_author: dict,
     guild: discord.Guild,
+    points: Optional[int] = None,
 ) -> None:
     starboard: discord.TextChannel = guild.get_channel(
         int(sql_starboard["id"])
@@ -564,7 +682,10 @@ async def handle_starboard(
         sql_starboard["id"],
     )
     if not sql_message["frozen"] or sql_starboard_message is None:
-        points = await calculate_points(bot, sql_message, sql_starboard, guild)
+        if points is None:
+            points = await calculate_points(
+                bot, sql_message, sql_starboard, guild
+            )
     else:
         points = sql_starboard_message["points"]
     if sql_starboard_message is not None:
@@ -707,7 +828,12 @@ async def handle_starboard(
                     except discord.NotFound:
                         await bot.db.starboards.set_webhook(starboard.id, None)
                         return await handle_starboard(
-                            bot, sql_starboard, sql_message, sql_author, guild
+                            bot,
+                            sql_starboard,
+                            sql_message,
+                            sql_author,
+                            guild,
+                            points=points,
                         )
             except discord.Forbidden:
                 async with bot.temp_locale(guild):
@@ -724,7 +850,10 @@ async def handle_starboard(
                     )
                 return
             await bot.db.sb_messages.create(
-                m.id, message.id, sql_starboard["id"]
+                m.id,
+                message.id,
+                sql_starboard["id"],
+                guild_id=int(sql_message["guild_id"]),
             )
             await set_points(bot, points, m.id)
             if sql_starboard["autoreact"] is True:
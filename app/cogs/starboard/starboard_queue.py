@@ -0,0 +1,107 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.classes.bot import Bot
+
+from . import starboard_funcs
+
+
+class _PendingUpdate:
+    __slots__ = ("guild_id", "first", "last", "running", "dirty", "task")
+
+    def __init__(self, guild_id: int, now: float):
+        self.guild_id = guild_id
+        self.first = now
+        self.last = now
+        self.running = False
+        self.dirty = False
+        self.task: Optional[asyncio.Task] = None
+
+
+class UpdateQueue:
+    """Collapses bursts of updates to the same message into a single
+    call to update_message.
+
+    An update runs once no new events have arrived for `delay` seconds,
+    but never later than `max_latency` seconds after the first event of
+    the burst. Events that arrive while an update is running cause one
+    more update afterwards, so the last change is never lost."""
+
+    def __init__(self, bot: Bot, delay: float, max_latency: float) -> None:
+        self.bot = bot
+        self.delay = delay
+        self.max_latency = max_latency
+        self.pending: dict[int, _PendingUpdate] = {}
+
+        self.scheduled = 0
+        self.coalesced = 0
+        self.updates = 0
+
+    def schedule(self, message_id: int, guild_id: int) -> None:
+        now = time.monotonic()
+        self.scheduled += 1
+
+        entry = self.pending.get(message_id)
+        if entry is None:
+            entry = self.pending[message_id] = _PendingUpdate(guild_id, now)
+            entry.task = self.bot.profiler.create_task(
+                "starboard updates", self._worker(message_id)
+            )
+            return
+
+        if entry.running and not entry.dirty:
+            # Start a new window for the update that follows this one
+            entry.dirty = True
+            entry.first = now
+        else:
+            self.coalesced += 1
+        entry.last = now
+
+    async def _worker(self, message_id: int) -> None:
+        entry = self.pending[message_id]
+        try:
+            while True:
+                while True:
+                    deadline = min(
+                        entry.last + self.delay,
+                        entry.first + self.max_latency,
+                    )
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+
+                entry.running = True
+                try:
+                    await starboard_funcs.update_message(
+                        self.bot, message_id, entry.guild_id
+                    )
+                except Exception as e:
+                    self.bot.dispatch(
+                        "log_error",
+                        "Error in UpdateQueue",
+                        e,
+                        [message_id, entry.guild_id],
+                    )
+                self.updates += 1
+                entry.running = False
+
+                if not entry.dirty:
+                    break
+                entry.dirty = False
+        finally:
+            del self.pending[message_id]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self.pending),
+            "scheduled": self.scheduled,
+            "coalesced": self.coalesced,
+            "updates": self.updates,
+        }
+
+    def cancel_all(self) -> None:
+        for entry in list(self.pending.values()):
+            if entry.task:
+                entry.task.cancel()
@@ -108,6 +108,14 @@ async def debug_guild(bot: Bot, guild: discord.Guild) -> dict:
                         "**not** match this regex or they can't be starred."
                     ).format(obj.mention, s["exclude_regex"])
                 )
+            for pattern in (s["regex"], s["exclude_regex"]):
+                if pattern and bot.regex.is_expensive(pattern):
+                    result["warns"].append(
+                        t_(
+                            "The regex `{0}` on {1} is slow to match, and "
+                            "may time out on longer messages."
+                        ).format(pattern, obj.mention)
+                    )
 
             perms = obj.permissions_for(guild.me)
             if not perms.send_messages:
@@ -221,6 +229,14 @@ async def debug_guild(bot: Bot, guild: discord.Guild) -> dict:
                         "match or they will be ignored."
                     ).format(obj.mention, asc["exclude_regex"])
                 )
+        for pattern in (asc["regex"], asc["exclude_regex"]):
+            if pattern and bot.regex.is_expensive(pattern):
+                result["warns"].append(
+                    t_(
+                        "The regex `{0}` on {1} is slow to match, and "
+                        "may time out on longer messages."
+                    ).format(pattern, obj.mention)
+                )
 
         perms = obj.permissions_for(guild.me)
         if not perms.read_messages:
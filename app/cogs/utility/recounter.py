@@ -1,9 +1,36 @@
+import asyncio
+from typing import Awaitable, Callable, Optional, Sequence
+
 import discord
 
 from app import utils
 from app.classes.bot import Bot
 from app.cogs.starboard import starboard_funcs
 
+# Messages read from the channel history before they are recounted
+PAGE_SIZE = 100
+# Pages read ahead while the previous one is being recounted
+READ_AHEAD = 2
+# Messages whose reactors are fetched at once
+CONCURRENCY = 5
+
+
+class ScanProgress:
+    """How far a scan got. `last_id` is the oldest message of the last
+    page that was saved, so that a scan that stopped early can be
+    resumed by scanning before it. `read_all` is set once every message
+    was scanned, so that a failure while updating the starboards can be
+    told apart from one while scanning."""
+
+    __slots__ = ("scanned", "recounted", "updated", "last_id", "read_all")
+
+    def __init__(self) -> None:
+        self.scanned = 0
+        self.recounted = 0
+        self.updated = 0
+        self.last_id: Optional[int] = None
+        self.read_all = False
+
 
 def needs_recount(
     message: discord.Message, sbemojis: list[str], min_reactions: int
@@ -17,6 +44,52 @@ def needs_recount(
     return False
 
 
+async def get_reactors(
+    message: discord.Message, sbemojis: list[str]
+) -> list[tuple[str, list[discord.abc.User]]]:
+    """The users who reacted with each star emoji, excluding bots."""
+    result = []
+    for reaction in message.reactions:
+        clean = utils.clean_emoji(reaction)
+        if clean not in sbemojis:
+            continue
+        result.append(
+            (clean, [u async for u in reaction.users() if not u.bot])
+        )
+    return result
+
+
+async def save_reactions(
+    bot: Bot,
+    guild_id: int,
+    reactors: list[tuple[discord.Message, list]],
+    new_messages: Sequence[discord.Message] = (),
+) -> None:
+    """Saves the reactors of several messages, and creates the messages
+    in `new_messages`, with one statement for each table."""
+    users = {
+        u.id: u.bot for _, found in reactors for _, us in found for u in us
+    }
+    for m in new_messages:
+        users.setdefault(m.author.id, m.author.bot)
+    await bot.db.entities.ensure(guild_id, users.items())
+    await bot.db.messages.create_many(
+        guild_id,
+        [
+            (m.id, m.channel.id, m.author.id, m.channel.is_nsfw())
+            for m in new_messages
+        ],
+    )
+    await bot.db.reactions.add_many(
+        [
+            (emoji, message.id, u.id)
+            for message, found in reactors
+            for emoji, us in found
+            for u in us
+        ]
+    )
+
+
 async def recount_reactions(
     bot: Bot, message: discord.Message, sbemojis: list[str] = None
 ) -> None:
@@ -24,43 +97,131 @@ async def recount_reactions(
         starboards = await bot.db.starboards.get_many(message.guild.id)
         sbemojis = [e for s in starboards for e in s["star_emojis"]]
 
-    for reaction in message.reactions:
-        clean = utils.clean_emoji(reaction)
-        if clean not in sbemojis:
-            continue
-
-        async for user in reaction.users():
-            if user.bot:
-                continue
-            await bot.db.users.create(user.id, user.bot)
-            await bot.db.members.create(user.id, message.guild.id)
-            await bot.db.reactions.create_reaction_user(
-                clean, message.id, user.id
-            )
+    found = await get_reactors(message, sbemojis)
+    await save_reactions(bot, message.guild.id, [(message, found)])
 
+    bot.point_counter.invalidate(message.id)
     await starboard_funcs.update_message(bot, message.id, message.guild.id)
 
 
-async def scan_recount(
-    bot: Bot, channel: discord.TextChannel, limit: int
+async def _read_history(
+    channel: discord.TextChannel,
+    limit: int,
+    before: Optional[int],
+    pages: asyncio.Queue,
 ) -> None:
-    starboards = await bot.db.starboards.get_many(channel.guild.id)
-    sbemojis = [e for s in starboards for e in s["star_emojis"]]
+    """Puts pages of messages in `pages`, then None once the history has
+    been read, or the exception if reading it failed."""
+    page = []
+    try:
+        async for message in channel.history(
+            limit=limit, before=discord.Object(before) if before else None
+        ):
+            page.append(message)
+            if len(page) == PAGE_SIZE:
+                await pages.put(page)
+                page = []
+    except Exception as e:
+        await pages.put(e)
+        return
+    if page:
+        await pages.put(page)
+    await pages.put(None)
 
-    async for message in channel.history(limit=limit):
+
+async def _recount_page(
+    bot: Bot,
+    channel: discord.TextChannel,
+    page: list[discord.Message],
+    sbemojis: list[str],
+    to_update: dict[int, None],
+) -> int:
+    """Saves the reactions on a page of messages. Returns how many
+    messages were recounted."""
+    guild_id = channel.guild.id
+    messages: dict[int, discord.Message] = {}
+    new_messages: list[discord.Message] = []
+    for message in page:
         if not needs_recount(message, sbemojis, min_reactions=2):
             continue
-        orig = await starboard_funcs.orig_message(bot, message.id)
+        orig = await starboard_funcs.orig_message(bot, message.id, guild_id)
         if not orig:
-            await bot.db.messages.create(
-                message.id,
-                message.guild.id,
-                message.channel.id,
-                message.author.id,
-                message.channel.is_nsfw(),
-            )
-        else:
+            new_messages.append(message)
+        elif int(orig["id"]) != message.id:
+            # A starboard message, so the original is recounted instead.
+            # Reactions aren't cached, so it is always fetched.
             message = await bot.cache.fetch_message(
-                message.guild.id, int(orig["channel_id"]), int(orig["id"])
+                guild_id,
+                int(orig["channel_id"]),
+                int(orig["id"]),
+                fresh=True,
             )
-        await recount_reactions(bot, message, sbemojis=sbemojis)
+            if message is None:
+                continue
+        messages[message.id] = message
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def reactors(message: discord.Message):
+        async with semaphore:
+            return message, await get_reactors(message, sbemojis)
+
+    found = await asyncio.gather(*(reactors(m) for m in messages.values()))
+    await save_reactions(bot, guild_id, found, new_messages)
+
+    for message_id in messages:
+        to_update[message_id] = None
+    return len(messages)
+
+
+async def scan_recount(
+    bot: Bot,
+    channel: discord.TextChannel,
+    limit: int,
+    before: Optional[int] = None,
+    progress: Optional[ScanProgress] = None,
+    report: Optional[Callable[[ScanProgress], Awaitable[None]]] = None,
+) -> ScanProgress:
+    """Recounts the reactions on the last `limit` messages of a channel,
+    or on the `limit` messages before the message `before`.
+
+    History is read a page ahead of the recount, and each page is saved
+    with a few batched statements. Starboard messages are updated once
+    per message at the end, including when the scan stops early.
+    `report` is called after every page."""
+    progress = progress or ScanProgress()
+    starboards = await bot.db.starboards.get_many(channel.guild.id)
+    sbemojis = [e for s in starboards for e in s["star_emojis"]]
+
+    # Original message IDs, in the order they were found
+    to_update: dict[int, None] = {}
+    pages: asyncio.Queue = asyncio.Queue(maxsize=READ_AHEAD)
+    reader = asyncio.ensure_future(
+        _read_history(channel, limit, before, pages)
+    )
+    try:
+        while True:
+            page = await pages.get()
+            if page is None:
+                progress.read_all = True
+                break
+            if isinstance(page, Exception):
+                raise page
+
+            progress.recounted += await _recount_page(
+                bot, channel, page, sbemojis, to_update
+            )
+            progress.scanned += len(page)
+            progress.last_id = page[-1].id
+            if report:
+                await report(progress)
+    finally:
+        reader.cancel()
+        for message_id in to_update:
+            bot.point_counter.invalidate(message_id)
+            await starboard_funcs.update_message(
+                bot, message_id, channel.guild.id
+            )
+            progress.updated += 1
+
+    return progress
@@ -87,6 +87,7 @@ class Utility(commands.Cog):
             return
 
         await self.bot.db.guilds.delete(ctx.guild.id)
+        self.bot.xp_buffer.forget(ctx.guild.id)
         await ctx.send(t_("Starboard has been reset for this server."))
 
     @reset.command(
@@ -100,6 +101,7 @@ class Utility(commands.Cog):
         if not await menus.Confirm(t_("Reset the leaderboard?")).start(ctx):
             await ctx.send(t_("Cancelled."))
             return
+        await self.bot.xp_buffer.flush()
         await self.bot.db.execute(
             """UPDATE members
             SET xp=0,
@@ -107,6 +109,8 @@ class Utility(commands.Cog):
             WHERE guild_id=$1""",
             ctx.guild.id,
         )
+        self.bot.xp_buffer.forget(ctx.guild.id)
+        self.bot.db.xp_ranks.forget(ctx.guild.id)
         await ctx.send(t_("Reset the leaderboard."))
 
     @commands.command(name="setxp", help=t_("Sets the XP for a user.", True))
@@ -119,6 +123,7 @@ class Utility(commands.Cog):
         if xp > 9999:
             raise commands.BadArgument(t_("XP must be less than 10,000."))
 
+        await self.bot.xp_buffer.flush()
         sql_member = await self.bot.db.members.get(user.id, ctx.guild.id)
         if not sql_member:
             raise commands.BadArgument(
@@ -137,6 +142,9 @@ class Utility(commands.Cog):
             user.id,
             ctx.guild.id,
         )
+        self.bot.xp_buffer.forget(ctx.guild.id, user.id)
+        if not user.bot:
+            self.bot.db.xp_ranks.update(ctx.guild.id, user.id, xp, new_level)
 
         await ctx.send(
             t_(
@@ -156,7 +164,10 @@ class Utility(commands.Cog):
     @commands.bot_has_permissions(read_message_history=True)
     @commands.guild_only()
     async def scan_recount(
-        self, ctx: commands.Context, limit: converters.myint
+        self,
+        ctx: commands.Context,
+        limit: converters.myint,
+        before: converters.myint = None,
     ) -> None:
         if limit < 1:
             await ctx.send(t_("Must recount at least 1 message."))
@@ -164,8 +175,38 @@ class Utility(commands.Cog):
         if limit > 1000:
             await ctx.send(t_("Can only recount up to 1,000 messages."))
             return
-        async with ctx.typing():
-            await recounter.scan_recount(self.bot, ctx.channel, limit)
+
+        status = await ctx.send(t_("Scanning messages..."))
+
+        async def report(p: recounter.ScanProgress) -> None:
+            await status.edit(
+                content=t_("Scanned {0}/{1} messages ({2} recounted).").format(
+                    p.scanned, limit, p.recounted
+                )
+            )
+
+        progress = recounter.ScanProgress()
+        try:
+            async with ctx.typing():
+                await recounter.scan_recount(
+                    self.bot, ctx.channel, limit, before, progress, report
+                )
+        except Exception:
+            if progress.read_all:
+                await ctx.send(
+                    t_(
+                        "All messages were scanned, but updating the "
+                        "starboards failed."
+                    )
+                )
+            elif progress.last_id is not None and progress.scanned < limit:
+                await ctx.send(
+                    t_(
+                        "The scan stopped early. Run `scan {0} {1}` to "
+                        "continue where it left off."
+                    ).format(limit - progress.scanned, progress.last_id)
+                )
+            raise
         await ctx.send("Finished!")
 
     @commands.command(
@@ -194,6 +235,7 @@ class Utility(commands.Cog):
                 ctx.guild.id,
                 int(orig_sql_message["channel_id"]),
                 int(orig_sql_message["id"]),
+                fresh=True,
             )
         async with ctx.typing():
             await recounter.recount_reactions(self.bot, message)
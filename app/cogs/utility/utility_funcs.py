@@ -36,7 +36,9 @@ async def handle_purging(
         return True
 
     async for m in channel.history(limit=limit + 1):
-        sql_message = await starboard_funcs.orig_message(bot, m.id)
+        sql_message = await starboard_funcs.orig_message(
+            bot, m.id, channel.guild.id
+        )
         if not sql_message:
             continue
 
@@ -1,3 +1,4 @@
+import heapq
 import time
 
 
@@ -66,17 +67,16 @@ class Cooldown:
         )
 
 
-class FlexibleCooldownMapping:
-    """Same as CooldownMapping, but each key can have
-    a different rate/per setting"""
+class _BucketCache:
+    """Cooldown buckets by key. Buckets that haven't been used for a
+    whole window are dropped, using a heap of expiry times so that each
+    call only looks at the buckets that may have expired."""
 
     def __init__(self):
         self._cache = {}
-
-    def copy(self):
-        ret = FlexibleCooldownMapping(self._cooldown)
-        ret._cache = self._cache.copy()
-        return ret
+        # (expires at, key), one entry per bucket. A bucket that was used
+        # again after its entry was pushed is pushed again when popped.
+        self._expiry = []
 
     def _bucket_key(self, cooldown_key):
         return cooldown_key
@@ -87,18 +87,41 @@ class FlexibleCooldownMapping:
         # cooldown of 60s and it has not been used in 60s then that
         # key should be deleted
         current = current or time.time()
-        dead_keys = [
-            k for k, v in self._cache.items() if current > v._last + v.per
-        ]
-        for k in dead_keys:
-            del self._cache[k]
+        expiry = self._expiry
+        while expiry and expiry[0][0] < current:
+            _, key = heapq.heappop(expiry)
+            bucket = self._cache[key]
+            expires = bucket._last + bucket.per
+            if current > expires:
+                del self._cache[key]
+            else:
+                heapq.heappush(expiry, (expires, key))
+
+    def _add_bucket(self, key, bucket, current=None):
+        current = current or time.time()
+        self._cache[key] = bucket
+        heapq.heappush(self._expiry, (current + bucket.per, key))
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class FlexibleCooldownMapping(_BucketCache):
+    """Same as CooldownMapping, but each key can have
+    a different rate/per setting"""
+
+    def copy(self):
+        ret = FlexibleCooldownMapping()
+        ret._cache = self._cache.copy()
+        ret._expiry = self._expiry.copy()
+        return ret
 
     def get_bucket(self, cooldown_key, rate, per, current=None):
         self._verify_cache_integrity(current)
         key = self._bucket_key(cooldown_key)
         if key not in self._cache:
             bucket = Cooldown(rate, per)
-            self._cache[key] = bucket
+            self._add_bucket(key, bucket, current)
         else:
             bucket = self._cache[key]
 
@@ -109,14 +132,15 @@ class FlexibleCooldownMapping:
         return bucket.update_rate_limit(current)
 
 
-class CooldownMapping:
+class CooldownMapping(_BucketCache):
     def __init__(self, original):
-        self._cache = {}
+        super().__init__()
         self._cooldown = original
 
     def copy(self):
         ret = CooldownMapping(self._cooldown)
         ret._cache = self._cache.copy()
+        ret._expiry = self._expiry.copy()
         return ret
 
     @property
@@ -127,27 +151,12 @@ class CooldownMapping:
     def from_cooldown(cls, rate, per):
         return cls(Cooldown(rate, per))
 
-    def _bucket_key(self, cooldown_key):
-        return cooldown_key
-
-    def _verify_cache_integrity(self, current=None):
-        # we want to delete all cache objects that haven't been used
-        # in a cooldown window. e.g. if we have a  command that has a
-        # cooldown of 60s and it has not been used in 60s then that
-        # key should be deleted
-        current = current or time.time()
-        dead_keys = [
-            k for k, v in self._cache.items() if current > v._last + v.per
-        ]
-        for k in dead_keys:
-            del self._cache[k]
-
     def get_bucket(self, cooldown_key, current=None):
         self._verify_cache_integrity(current)
         key = self._bucket_key(cooldown_key)
         if key not in self._cache:
             bucket = self._cooldown.copy()
-            self._cache[key] = bucket
+            self._add_bucket(key, bucket, current)
         else:
             bucket = self._cache[key]
 
@@ -156,3 +165,49 @@ class CooldownMapping:
     def update_rate_limit(self, cooldown_key, current=None):
         bucket = self.get_bucket(cooldown_key, current)
         return bucket.update_rate_limit(current)
+
+
+def _benchmark(calls: int = 50_000) -> None:
+    """Per-call cost of FlexibleCooldownMapping.get_bucket as the number
+    of live (giver, receiver) pairs grows. Simulated time advances so
+    that pairs expire as fast as new ones arrive."""
+    import timeit
+
+    class ScanMapping(FlexibleCooldownMapping):
+        # The full scan used before the expiry heap
+        def _verify_cache_integrity(self, current=None):
+            dead_keys = [
+                k for k, v in self._cache.items() if current > v._last + v.per
+            ]
+            for k in dead_keys:
+                del self._cache[k]
+
+    per = 60.0
+    print(f"{'mapping':<10}{'pairs':>10}{'us/call':>10}")
+    for pairs in (1_000, 10_000, 100_000, 1_000_000):
+        for name, cls in (
+            ("heap", FlexibleCooldownMapping),
+            ("scan", ScanMapping),
+        ):
+            if cls is ScanMapping and pairs > 10_000:
+                continue
+            mapping = cls()
+            step = per / pairs
+            state = {"n": 0}
+
+            def call():
+                n = state["n"] = state["n"] + 1
+                now = 1_000_000.0 + n * step
+                key = (n, n >> 1)
+                mapping.get_bucket(key, 3, per, now).update_rate_limit(now)
+
+            for _ in range(pairs):
+                call()
+            runs = calls if cls is FlexibleCooldownMapping else 500
+            seconds = timeit.timeit(call, number=runs)
+            assert abs(len(mapping) - pairs) <= pairs // 100 + 1
+            print(f"{name:<10}{pairs:>10}{seconds / runs * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Optional, Union
 
@@ -47,7 +48,10 @@ async def get_guild(guild_id: int):
 async def get_guild_channels(guild_id: int) -> dict[str, dict[int, str]]:
     channels: dict[str, dict[int, str]] = {}
     for c in await app.config["WEBSOCKET"].send_command(
-        "guild_channels", {"guild_id": guild_id}, expect_resp=True
+        "guild_channels",
+        {"guild_id": guild_id},
+        expect_resp=True,
+        guild_id=guild_id,
     ):
         channels.update(c["data"])
     return channels
@@ -75,6 +79,8 @@ async def handle_command(msg: dict) -> Optional[Union[dict, str]]:
     resp = None
     if cmd == "ping":
         resp = "pont"
+    if cmd == "config_invalidate" and msg["author"] != "Dashboard":
+        db.db.configs.apply_change(data)
     if cmd == "set_stats":
         app.config["STATS"][msg["author"]] = {
             "guilds": data["guild_count"],
@@ -114,7 +120,7 @@ def can_manage_list(guilds: list) -> list:
 async def does_share(guild) -> bool:
     try:
         resp = await app.config["WEBSOCKET"].send_command(
-            "is_mutual", {"gid": guild.id}, expect_resp=True
+            "is_mutual", {"gid": guild.id}, expect_resp=True, guild_id=guild.id
         )
     except Exception as e:
         print(e)
@@ -227,6 +233,7 @@ async def server_starboards(guild_id: int):
         "channel_names",
         {"channel_ids": [int(s["id"]) for s in starboards]},
         expect_resp=True,
+        guild_id=guild_id,
     )
     name_dict = {}
     for c in names:  # each cluster returns it's own response
@@ -329,8 +336,9 @@ async def manage_starboard(guild_id: int, starboard_id: int):
         "channel_names",
         {"channel_ids": [int(starboard["id"])]},
         expect_resp=True,
+        guild_id=guild_id,
     ):
-        if c["data"][str(starboard["id"])]:
+        if c["data"].get(str(starboard["id"])):
             starboard["name"] = c["data"][str(starboard["id"])]
             break
     else:
@@ -436,8 +444,9 @@ async def handle_donate_event():
         "data": await request.get_json(),
         "auth": request.headers["Authorization"],
     }
+    # Guild 0 is always on shard 0, so exactly one cluster handles it
     await app.config["WEBSOCKET"].send_command(
-        "donate_event", data, expect_resp=False
+        "donate_event", data, expect_resp=False, guild_id=0
     )
     return "OK"
 
@@ -453,6 +462,13 @@ async def handle_access_denied(e):
     return redirect(url_for("index"))
 
 
+def send_config_change(change: dict) -> None:
+    # Lets the clusters drop their cached copy of the config
+    asyncio.ensure_future(
+        app.config["WEBSOCKET"].send_command("config_invalidate", change)
+    )
+
+
 @app.before_first_request
 async def before_first_request():
     try:
@@ -464,6 +480,7 @@ async def before_first_request():
             "Dashboard", handle_command
         )
         await app.config["WEBSOCKET"].ensure_connection()
+        db.db.configs.on_change = send_config_change
     except Exception as e:
         print("Unable to launch ipc, running with out it.")
         print(e)
@@ -0,0 +1,325 @@
+import time
+import typing
+from typing import Any, Awaitable, Callable, Optional
+
+from cachetools import LRUCache
+
+from app.classes.nonexist import nonexist
+from app.classes.perm_table import PermTable
+
+if typing.TYPE_CHECKING:
+    from app.database.database import Database
+
+
+class GuildConfig:
+    """A snapshot of everything that configures a single guild. Each
+    section is None until it is first used."""
+
+    __slots__ = (
+        "guild_id",
+        "guild",
+        "starboards",
+        "aschannels",
+        "xproles",
+        "permgroups",
+        "perm_table",
+        "previous_table",
+        "created",
+    )
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.created = time.monotonic()
+        self.guild: Any = None
+        self.starboards: Optional[dict[int, dict]] = None
+        self.aschannels: Optional[dict[int, dict]] = None
+        self.xproles: Optional[dict[int, dict]] = None
+        self.permgroups: Optional[list[dict]] = None
+        self.perm_table: Optional[PermTable] = None
+        # The table of the config this one replaced because of its age,
+        # which is kept if nothing changed, so that its version does too
+        self.previous_table: Optional[PermTable] = None
+
+
+class _GuildLRU(LRUCache):
+    def __init__(self, maxsize: int, on_evict: Callable[[GuildConfig], None]):
+        super().__init__(maxsize=maxsize)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._on_evict(value)
+        return key, value
+
+
+class ConfigCache:
+    """In-process cache of GuildConfigs. The database function classes
+    write their changes through to it.
+
+    Other processes (the clusters and the dashboard) have their own
+    caches, so every write is also passed to `on_change`, which should
+    send it to them to be applied with `apply_change`. Configs are also
+    reloaded after `max_age` seconds, in case a change was missed."""
+
+    def __init__(
+        self, db: "Database", maxsize: int = 5000, max_age: float = 300
+    ):
+        self.db = db
+        self.max_age = max_age
+        # Called with {"guild_id": ...} or {"permgroup_id": ...}
+        self.on_change: Optional[Callable[[dict[str, int]], None]] = None
+        self.guilds = _GuildLRU(maxsize, self._forget_channels)
+        # starboard/aschannel id -> guild id, for cached sections only
+        self.channels: dict[int, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        # guild_id -> number of sections being loaded
+        self._loads: dict[int, int] = {}
+        # guild_id -> writes since its loads started, so that a section
+        # that was being loaded while a write happened is never cached.
+        # Only kept for guilds with loads in progress.
+        self._writes: dict[int, int] = {}
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "guilds": len(self.guilds),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _forget_channels(self, config: GuildConfig) -> None:
+        for section in (config.starboards, config.aschannels):
+            for cid in section or ():
+                self.channels.pop(cid, None)
+
+    def _config(self, guild_id: int) -> GuildConfig:
+        config = self.guilds.get(guild_id)
+        previous_table = None
+        if config is not None and (
+            time.monotonic() - config.created > self.max_age
+        ):
+            previous_table = config.perm_table
+            self._drop(guild_id)
+            config = None
+        if config is None:
+            config = self.guilds[guild_id] = GuildConfig(guild_id)
+            config.previous_table = previous_table
+        return config
+
+    def _written(self, guild_id: int) -> None:
+        if guild_id in self._loads:
+            self._writes[guild_id] = self._writes.get(guild_id, 0) + 1
+
+    def _changed(self, **change: int) -> None:
+        if "guild_id" in change:
+            self._written(change["guild_id"])
+        if self.on_change is not None:
+            self.on_change(change)
+
+    def apply_change(self, change: dict[str, int]) -> None:
+        """Applies a change sent by another process's `on_change`."""
+        if "guild_id" in change:
+            self._written(int(change["guild_id"]))
+            self._drop(int(change["guild_id"]))
+        elif "permgroup_id" in change:
+            self._invalidate_permgroup(int(change["permgroup_id"]))
+
+    def cached(self, guild_id: int) -> Optional[GuildConfig]:
+        return self.guilds.get(guild_id)
+
+    async def _section(
+        self,
+        guild_id: int,
+        name: str,
+        load: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        config = self._config(guild_id)
+        value = getattr(config, name)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        self._loads[guild_id] = self._loads.get(guild_id, 0) + 1
+        writes = self._writes.get(guild_id, 0)
+        try:
+            value = await load()
+            written = self._writes.get(guild_id, 0) != writes
+        finally:
+            self._loads[guild_id] -= 1
+            if self._loads[guild_id] == 0:
+                del self._loads[guild_id]
+                self._writes.pop(guild_id, None)
+        if not written:
+            setattr(config, name, value)
+            if name in ("starboards", "aschannels"):
+                for cid in value:
+                    self.channels[cid] = guild_id
+        return value
+
+    async def guild(self, guild_id: int) -> Optional[dict]:
+        async def load():
+            row = await self.db.fetchrow(
+                """SELECT * FROM guilds WHERE id=$1""", guild_id
+            )
+            return row if row else nonexist
+
+        row = await self._section(guild_id, "guild", load)
+        return row if row is not nonexist else None
+
+    async def starboards(self, guild_id: int) -> dict[int, dict]:
+        async def load():
+            rows = await self.db.fetch(
+                """SELECT * FROM starboards WHERE guild_id=$1""", guild_id
+            )
+            return {int(r["id"]): r for r in rows}
+
+        return await self._section(guild_id, "starboards", load)
+
+    async def aschannels(self, guild_id: int) -> dict[int, dict]:
+        async def load():
+            rows = await self.db.fetch(
+                """SELECT * FROM aschannels WHERE guild_id=$1""", guild_id
+            )
+            return {int(r["id"]): r for r in rows}
+
+        return await self._section(guild_id, "aschannels", load)
+
+    async def xproles(self, guild_id: int) -> dict[int, dict]:
+        async def load():
+            rows = await self.db.fetch(
+                """SELECT * FROM xproles WHERE guild_id=$1""", guild_id
+            )
+            return {int(r["role_id"]): r for r in rows}
+
+        return await self._section(guild_id, "xproles", load)
+
+    async def permgroups(self, guild_id: int) -> list[dict]:
+        async def load():
+            return await self.db.fetch(
+                """SELECT * FROM permgroups
+                WHERE guild_id=$1 ORDER BY index""",
+                guild_id,
+            )
+
+        return await self._section(guild_id, "permgroups", load)
+
+    async def perm_table(self, guild_id: int) -> PermTable:
+        async def load():
+            groups = await self.permgroups(guild_id)
+            permroles = await self.db.fetch(
+                """SELECT permroles.* FROM permroles
+                JOIN permgroups ON permgroups.id=permroles.permgroup_id
+                WHERE permgroups.guild_id=$1
+                ORDER BY permroles.permgroup_id, permroles.role_id""",
+                guild_id,
+            )
+            table = PermTable(groups, permroles)
+            config = self._config(guild_id)
+            previous, config.previous_table = config.previous_table, None
+            if previous is not None and table.same_as(previous):
+                return previous
+            return table
+
+        return await self._section(guild_id, "perm_table", load)
+
+    def guild_of(self, channel_id: int) -> Optional[int]:
+        return self.channels.get(channel_id)
+
+    # Write-through
+    def set_guild(self, guild_id: int, row: Optional[dict]) -> None:
+        self._changed(guild_id=guild_id)
+        config = self.guilds.get(guild_id)
+        if config is not None:
+            config.guild = row if row else nonexist
+
+    def reload_guild(self, guild_id: int) -> None:
+        self._changed(guild_id=guild_id)
+        config = self.guilds.get(guild_id)
+        if config is not None:
+            config.guild = None
+
+    def _set_row(
+        self, guild_id: int, section: str, key: int, row: dict
+    ) -> None:
+        self._changed(guild_id=guild_id)
+        config = self.guilds.get(guild_id)
+        if config is None:
+            return
+        rows = getattr(config, section)
+        if rows is None:
+            return
+        rows[key] = row
+        if section in ("starboards", "aschannels"):
+            self.channels[key] = guild_id
+
+    def _remove_row(self, guild_id: int, section: str, key: int) -> None:
+        self._changed(guild_id=guild_id)
+        if section in ("starboards", "aschannels"):
+            self.channels.pop(key, None)
+        config = self.guilds.get(guild_id)
+        if config is None:
+            return
+        rows = getattr(config, section)
+        if rows is not None:
+            rows.pop(key, None)
+
+    def set_starboard(self, row: dict) -> None:
+        self._set_row(int(row["guild_id"]), "starboards", int(row["id"]), row)
+
+    def remove_starboard(self, guild_id: int, starboard_id: int) -> None:
+        self._remove_row(guild_id, "starboards", starboard_id)
+
+    def set_aschannel(self, row: dict) -> None:
+        self._set_row(int(row["guild_id"]), "aschannels", int(row["id"]), row)
+
+    def remove_aschannel(self, guild_id: int, aschannel_id: int) -> None:
+        self._remove_row(guild_id, "aschannels", aschannel_id)
+
+    def set_xprole(self, row: dict) -> None:
+        self._set_row(
+            int(row["guild_id"]), "xproles", int(row["role_id"]), row
+        )
+
+    def remove_xprole(self, guild_id: int, role_id: int) -> None:
+        self._remove_row(guild_id, "xproles", role_id)
+
+    def invalidate_perms(self, guild_id: int) -> None:
+        """Permgroups are reordered by writes that touch several rows, so
+        they are reloaded instead of being patched."""
+        self._changed(guild_id=guild_id)
+        config = self.guilds.get(guild_id)
+        if config is not None:
+            config.permgroups = None
+            config.perm_table = None
+            config.previous_table = None
+
+    def invalidate_permgroup(self, permgroup_id: int) -> None:
+        self._changed(permgroup_id=permgroup_id)
+        self._invalidate_permgroup(permgroup_id)
+
+    def _invalidate_permgroup(self, permgroup_id: int) -> None:
+        # The guild of a group isn't known, so loads in progress in any
+        # guild might include it
+        for guild_id in self._loads:
+            self._written(guild_id)
+        for config in list(self.guilds.values()):
+            group_ids = set(g["id"] for g in config.permgroups or ())
+            if config.perm_table:
+                group_ids.update(config.perm_table.group_ids)
+            if config.previous_table:
+                group_ids.update(config.previous_table.group_ids)
+            if permgroup_id in group_ids:
+                config.permgroups = None
+                config.perm_table = None
+                config.previous_table = None
+
+    def drop(self, guild_id: int) -> None:
+        self._changed(guild_id=guild_id)
+        self._drop(guild_id)
+
+    def _drop(self, guild_id: int) -> None:
+        config = self.guilds.pop(guild_id, None)
+        if config is not None:
+            self._forget_channels(config)
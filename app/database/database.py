@@ -3,8 +3,10 @@ from typing import Any, Optional
 
 import asyncpg
 
+from .config_cache import ConfigCache
 from .database_functions import (
     aschannels,
+    entities,
     guilds,
     members,
     messages,
@@ -16,9 +18,14 @@ from .database_functions import (
     users,
     xproles,
 )
+from .message_index import MessageIndex
 from .pg_indexes import ALL_INDEXES
+from .pg_migrations import ALL_MIGRATIONS
 from .pg_tables import ALL_TABLES
 from .pg_types import ALL_TYPES
+from .sql_stats import SQLStats
+from .statements import REGISTRY
+from .xp_ranks import XPRanks
 
 
 class Database:
@@ -29,9 +36,16 @@ class Database:
 
         self.pool: Optional[asyncpg.pool.Pool] = None
 
-        self.sql_times: dict = {}
+        self.sql_stats = SQLStats()
+        # sql -> the last arguments a read-only statement was run with
+        self._sample_args: dict[str, tuple] = {}
+
+        self.configs = ConfigCache(self)
+        self.message_index = MessageIndex(self)
+        self.xp_ranks = XPRanks(self)
 
         self.guilds = guilds.Guilds(self)
+        self.entities = entities.Entities(self)
         self.members = members.Members(self)
         self.users = users.Users(self)
         self.aschannels = aschannels.ASChannels(self)
@@ -43,51 +57,126 @@ class Database:
         self.sb_messages = sb_messags.SBMessages(self)
         self.reactions = reactions.Reactions(self)
 
-    def log(self, sql: str, time: float) -> None:
-        self.sql_times.setdefault(sql, [])
-        self.sql_times[sql].append(time)
+    @staticmethod
+    def _row_count(method: str, result: Any) -> int:
+        if method == "execute" and isinstance(result, str):
+            # The status of the command, e.g. "UPDATE 3"
+            last = result.rsplit(" ", 1)[-1]
+            return int(last) if last.isdigit() else 0
+        if isinstance(result, list):
+            return len(result)
+        return 0 if result is None else 1
 
     async def init_database(self) -> None:
         self.pool = await asyncpg.create_pool(
-            database=self.name, user=self.user, password=self.password
+            database=self.name,
+            user=self.user,
+            password=self.password,
+            # asyncpg prepares every query once per connection and keeps
+            # it in this cache, so registered statements get room on top
+            # of the default of 100
+            statement_cache_size=100 + len(REGISTRY),
         )
 
         async with self.pool.acquire() as con:
             async with con.transaction():
                 for table in ALL_TABLES:
                     await con.execute(table)
-                for index in ALL_INDEXES:
-                    await con.execute(index)
+                await self._create_indexes(con)
                 for pg_type in ALL_TYPES:
                     await con.execute(pg_type)
+                for migration in ALL_MIGRATIONS:
+                    await con.execute(migration)
 
-    async def execute(self, sql: str, *args: Any) -> None:
-        async with self.pool.acquire() as con:
-            async with con.transaction():
-                s = time.time()
-                await con.execute(sql, *args)
-        self.log(sql, time.time() - s)
+    async def _create_indexes(self, con: asyncpg.Connection) -> None:
+        versions = {
+            r["name"]: r["version"]
+            for r in await con.fetch("""SELECT * FROM managed_indexes""")
+        }
+        for index in ALL_INDEXES:
+            version = versions.get(index.name)
+            if version == index.version:
+                continue
+            # Indexes from before they were versioned are kept as is
+            if version is not None:
+                await con.execute(f"""DROP INDEX IF EXISTS {index.name}""")
+            await con.execute(index.sql)
+            await con.execute(
+                """INSERT INTO managed_indexes (name, version)
+                VALUES ($1, $2)
+                ON CONFLICT (name) DO UPDATE SET version=$2""",
+                index.name,
+                index.version,
+            )
 
-    async def fetch(self, sql: str, *args: Any) -> list[dict]:
+    async def _run(self, method: str, sql: str, args: tuple) -> Any:
+        start = time.perf_counter()
         async with self.pool.acquire() as con:
-            async with con.transaction():
-                s = time.time()
-                result = await con.fetch(sql, *args)
-        self.log(sql, time.time() - s)
+            acquired = time.perf_counter()
+            if sql in REGISTRY and REGISTRY[sql].readonly:
+                # A single read is consistent on its own, so no
+                # transaction is opened around it
+                self._sample_args[sql] = args
+                result = await getattr(con, method)(sql, *args)
+            else:
+                async with con.transaction():
+                    result = await getattr(con, method)(sql, *args)
+            done = time.perf_counter()
+        self.sql_stats.record(
+            sql,
+            acquired - start,
+            done - acquired,
+            self._row_count(method, result),
+        )
         return result
 
+    async def execute(self, sql: str, *args: Any) -> None:
+        await self._run("execute", sql, args)
+
+    async def fetch(self, sql: str, *args: Any) -> list[dict]:
+        return await self._run("fetch", sql, args)
+
     async def fetchrow(self, sql: str, *args: Any) -> Optional[dict]:
-        async with self.pool.acquire() as con:
-            async with con.transaction():
-                s = time.time()
-                result = await con.fetchrow(sql, *args)
-        self.log(sql, time.time() - s)
-        return result
+        return await self._run("fetchrow", sql, args)
 
     async def fetchval(self, sql: str, *args: Any) -> Optional[Any]:
-        async with self.pool.acquire() as con:
-            async with con.transaction():
-                s = time.time()
-                result = await con.fetchval(sql, *args)
-        self.log(sql, time.time() - s)
-        return result
+        return await self._run("fetchval", sql, args)
+
+    async def benchmark_statements(
+        self, runs: int = 100, top: int = 10
+    ) -> list[tuple[str, float, float]]:
+        """Times the read-only registered statements that have taken the
+        most time in total, both inside a transaction (as queries used to
+        be run) and on their own. Each uses the arguments it was last
+        called with.
+
+        Returns (name, old seconds per run, new seconds per run)."""
+        queries = sorted(
+            (
+                sql
+                for sql in self._sample_args
+                if sql in self.sql_stats.queries
+            ),
+            key=lambda sql: self.sql_stats.queries[sql].execute.total,
+            reverse=True,
+        )[:top]
+
+        results: list[tuple[str, float, float]] = []
+        for sql in queries:
+            args = self._sample_args[sql]
+
+            start = time.perf_counter()
+            for _ in range(runs):
+                async with self.pool.acquire() as con:
+                    async with con.transaction():
+                        await con.fetch(sql, *args)
+            old = (time.perf_counter() - start) / runs
+
+            start = time.perf_counter()
+            for _ in range(runs):
+                async with self.pool.acquire() as con:
+                    await con.fetch(sql, *args)
+            new = (time.perf_counter() - start) / runs
+
+            results.append((REGISTRY[sql].name, old, new))
+        return results
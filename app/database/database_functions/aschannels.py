@@ -1,38 +1,38 @@
 from typing import Optional
 
 import asyncpg
-from aiocache import Cache, SimpleMemoryCache
 from discord.ext import commands
 
 from app import errors
-from app.classes.nonexist import nonexist
 from app.i18n import t_
 
 
 class ASChannels:
     def __init__(self, db) -> None:
         self.db = db
-        self.id_cache: SimpleMemoryCache = Cache(namespace="asc_id", ttl=10)
 
-    async def get(self, aschannel_id: int) -> Optional[dict]:
-        r = await self.id_cache.get(aschannel_id)
-        if r is not None:
-            return r if r is not nonexist else None
-
-        r = await self.db.fetchrow(
-            """SELECT * FROM aschannels
-            WHERE id=$1""",
-            aschannel_id,
-        )
-        await self.id_cache.set(aschannel_id, r if r else nonexist)
-        return r
+    async def get(
+        self, aschannel_id: int, guild_id: Optional[int] = None
+    ) -> Optional[dict]:
+        """Returns the aschannel from the config cache. Passing guild_id
+        avoids querying the database for channels that aren't known."""
+        if guild_id is None:
+            guild_id = self.db.configs.guild_of(aschannel_id)
+        if guild_id is None:
+            r = await self.db.fetchrow(
+                """SELECT guild_id FROM aschannels
+                WHERE id=$1""",
+                aschannel_id,
+            )
+            if not r:
+                return None
+            guild_id = int(r["guild_id"])
+        aschannels = await self.db.configs.aschannels(guild_id)
+        return aschannels.get(aschannel_id)
 
     async def get_many(self, guild_id: int) -> list[dict]:
-        return await self.db.fetch(
-            """SELECT * FROM aschannels
-            WHERE guild_id=$1""",
-            guild_id,
-        )
+        aschannels = await self.db.configs.aschannels(guild_id)
+        return list(aschannels.values())
 
     async def create(
         self, channel_id: int, guild_id: int, check_first: bool = True
@@ -48,24 +48,27 @@ class ASChannels:
 
         await self.db.guilds.create(guild_id)
         try:
-            await self.db.execute(
+            r = await self.db.fetchrow(
                 """INSERT INTO aschannels (id, guild_id)
-                VALUES ($1, $2)""",
+                VALUES ($1, $2)
+                RETURNING *""",
                 channel_id,
                 guild_id,
             )
         except asyncpg.exceptions.UniqueViolationError:
             return True
-        await self.id_cache.delete(channel_id)
+        self.db.configs.set_aschannel(r)
         return False
 
     async def delete(self, aschannel_id: int) -> None:
-        await self.db.execute(
+        guild_id = await self.db.fetchval(
             """DELETE FROM aschannels
-            WHERE id=$1""",
+            WHERE id=$1
+            RETURNING guild_id""",
             aschannel_id,
         )
-        await self.id_cache.delete(aschannel_id)
+        if guild_id is not None:
+            self.db.configs.remove_aschannel(int(guild_id), aschannel_id)
 
     async def edit(
         self,
@@ -103,7 +106,7 @@ class ASChannels:
                 t_("minChars cannot be grater than 2,000.")
             )
 
-        await self.db.execute(
+        r = await self.db.fetchrow(
             """UPDATE aschannels
             SET emojis=$2::text[],
             min_chars=$3,
@@ -111,7 +114,8 @@ class ASChannels:
             delete_invalid=$5,
             regex=$6,
             exclude_regex=$7
-            WHERE id=$1""",
+            WHERE id=$1
+            RETURNING *""",
             aschannel_id,
             settings["emojis"],
             settings["min_chars"],
@@ -120,7 +124,7 @@ class ASChannels:
             settings["regex"],
             settings["exclude_regex"],
         )
-        await self.id_cache.delete(aschannel_id)
+        self.db.configs.set_aschannel(r)
 
     async def add_asemoji(self, aschannel_id: int, emoji: str) -> None:
         aschannel = await self.get(aschannel_id)
@@ -130,7 +134,7 @@ class ASChannels:
             )
         if emoji in aschannel["emojis"]:
             raise errors.AlreadyASEmoji(emoji, aschannel_id)
-        new_emojis: list = aschannel["emojis"]
+        new_emojis: list = list(aschannel["emojis"])
         new_emojis.append(emoji)
         await self.edit(aschannel_id, emojis=new_emojis)
 
@@ -142,6 +146,6 @@ class ASChannels:
             )
         if emoji not in aschannel["emojis"]:
             raise errors.NotASEmoji(emoji, str(aschannel_id))
-        new_emojis: list = aschannel["emojis"]
+        new_emojis: list = list(aschannel["emojis"])
         new_emojis.remove(emoji)
         await self.edit(aschannel_id, emojis=new_emojis)
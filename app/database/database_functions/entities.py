@@ -0,0 +1,119 @@
+from typing import Iterable, Optional
+
+from cachetools import LRUCache
+
+from app.database.statements import statement
+
+
+class Entities:
+    """Creates the guild, user, member and message rows that other rows
+    depend on, in a single round-trip.
+
+    IDs that were ensured recently are remembered, so that repeat
+    reactors and command users don't touch the database at all."""
+
+    # Foreign keys are checked at the end of the statement, so the
+    # rows inserted by each CTE can depend on the ones before it.
+    # members has no unique constraint, so it can't use ON CONFLICT.
+    ENSURE = statement(
+        "entities.ensure",
+        """WITH new_guild AS (
+            INSERT INTO guilds (id) VALUES ($1)
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        ), new_users AS (
+            INSERT INTO users (id, is_bot)
+            SELECT DISTINCT ON (u.id) u.id, u.is_bot
+            FROM unnest($2::numeric[], $3::bool[]) AS u(id, is_bot)
+            ON CONFLICT DO NOTHING
+        ), new_members AS (
+            INSERT INTO members (user_id, guild_id)
+            SELECT DISTINCT m.id, $1::numeric
+            FROM unnest($4::numeric[]) AS m(id)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM members
+                WHERE user_id=m.id AND guild_id=$1
+            )
+        ), new_message AS (
+            INSERT INTO messages
+            (id, guild_id, channel_id, author_id, is_nsfw)
+            SELECT $5::numeric, $1, $6::numeric, $7::numeric, $8::bool
+            WHERE $5::numeric IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM starboard_messages WHERE id=$5
+            )
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        )
+        SELECT
+            EXISTS(SELECT 1 FROM new_guild) AS guild_created,
+            EXISTS(SELECT 1 FROM new_message) AS message_created""",
+    )
+
+    def __init__(self, db, maxsize: int = 50_000) -> None:
+        self.db = db
+        self.ensured: LRUCache = LRUCache(maxsize=maxsize)
+
+    def forget(self) -> None:
+        # Deleting a guild cascades to its members and messages, which
+        # are not tracked per guild, so everything is forgotten instead
+        self.ensured.clear()
+
+    async def ensure(
+        self,
+        guild_id: int,
+        users: Iterable[tuple[int, bool]] = (),
+        message: Optional[tuple[int, int, int, bool]] = None,
+    ) -> bool:
+        """Makes sure the guild exists, and that each (user_id, is_bot)
+        exists as both a user and a member of the guild. If `message` is
+        passed as (message_id, channel_id, author_id, is_nsfw), the
+        message is created as well unless it is a starboard message. The
+        author must be one of the users, or already exist.
+
+        Returns whether the message was created."""
+
+        user_ids: list[int] = []
+        user_bots: list[bool] = []
+        member_ids: list[int] = []
+        for user_id, is_bot in users:
+            if ("user", user_id) not in self.ensured:
+                user_ids.append(user_id)
+                user_bots.append(is_bot)
+            if ("member", user_id, guild_id) not in self.ensured:
+                member_ids.append(user_id)
+
+        if (
+            not user_ids
+            and not member_ids
+            and message is None
+            and ("guild", guild_id) in self.ensured
+        ):
+            return False
+
+        message_id, channel_id, author_id, is_nsfw = message or (None,) * 4
+        result = await self.db.fetchrow(
+            self.ENSURE,
+            guild_id,
+            user_ids,
+            user_bots,
+            member_ids,
+            message_id,
+            channel_id,
+            author_id,
+            is_nsfw,
+        )
+
+        if result["guild_created"]:
+            self.db.configs.reload_guild(guild_id)
+        self.ensured[("guild", guild_id)] = True
+        for user_id in user_ids:
+            self.ensured[("user", user_id)] = True
+        for user_id in member_ids:
+            self.ensured[("member", user_id, guild_id)] = True
+        if message_id is not None:
+            # Either created or already there. If it was skipped because
+            # it's a starboard message, it's already in the index too.
+            self.db.message_index.add(guild_id, message_id)
+
+        return result["message_created"]
@@ -1,7 +1,6 @@
-from typing import Optional
+from typing import Any, Optional
 
 import asyncpg
-from aiocache import Cache, SimpleMemoryCache
 from discord.ext import commands
 
 from app import errors, i18n
@@ -11,11 +10,31 @@ from app.i18n import t_
 class Guilds:
     def __init__(self, db) -> None:
         self.db = db
-        self.cache: SimpleMemoryCache = Cache(namespace="guilds", ttl=10)
 
     async def delete(self, guild_id: int):
         await self.db.execute("""DELETE FROM guilds WHERE id=$1""", guild_id)
-        await self.cache.delete(guild_id)
+        self.db.configs.drop(guild_id)
+        self.db.entities.forget()
+        self.db.message_index.forget(guild_id)
+        self.db.sb_messages.starred.forget(guild_id)
+        self.db.xp_ranks.forget(guild_id)
+
+    async def set(self, guild_id: int, **settings: Any) -> None:
+        """Updates columns of a guild, and writes the new row through
+        to the config cache. Keys must be column names."""
+        columns = ", ".join(
+            f"{key}=${x}" for x, key in enumerate(settings.keys(), 2)
+        )
+        row = await self.db.fetchrow(
+            f"""UPDATE guilds
+            SET {columns}
+            WHERE id=$1
+            RETURNING *""",
+            guild_id,
+            *settings.values(),
+        )
+        if row:
+            self.db.configs.set_guild(guild_id, row)
 
     async def set_cooldown(self, guild_id: int, ammount: int, per: int):
         if ammount < 1:
@@ -34,40 +53,15 @@ class Guilds:
                 )
             )
 
-        await self.db.execute(
-            """UPDATE guilds
-            SET xp_cooldown=$1,
-            xp_cooldown_per=$2
-            WHERE id=$3""",
-            ammount,
-            per,
-            guild_id,
-        )
-        await self.cache.delete(guild_id)
+        await self.set(guild_id, xp_cooldown=ammount, xp_cooldown_per=per)
 
     async def set_locale(self, guild_id: int, locale: str) -> None:
         if locale not in i18n.locales:
             raise errors.InvalidLocale(locale)
-        await self.db.execute(
-            """UPDATE guilds
-            SET locale=$1
-            WHERE id=$2""",
-            locale,
-            guild_id,
-        )
-        await self.cache.delete(guild_id)
+        await self.set(guild_id, locale=locale)
 
     async def get(self, guild_id: int) -> Optional[dict]:
-        r = await self.cache.get(guild_id)
-        if r:
-            return r
-        sql_guild = await self.db.fetchrow(
-            """SELECT * FROM guilds
-            WHERE id=$1""",
-            guild_id,
-        )
-        await self.cache.set(guild_id, sql_guild)
-        return sql_guild
+        return await self.db.configs.guild(guild_id)
 
     async def create(self, guild_id: int, check_first: bool = True) -> bool:
         if check_first:
@@ -76,12 +70,13 @@ class Guilds:
                 return False
 
         try:
-            await self.db.execute(
+            row = await self.db.fetchrow(
                 """INSERT INTO guilds (id)
-                VALUES ($1)""",
+                VALUES ($1)
+                RETURNING *""",
                 guild_id,
             )
         except asyncpg.exceptions.UniqueViolationError:
             return False
-        await self.cache.delete(guild_id)
+        self.db.configs.set_guild(guild_id, row)
         return True
@@ -2,18 +2,22 @@ from typing import Optional
 
 import asyncpg
 
+from app.database.statements import statement
+
 
 class Members:
+    GET = statement(
+        "members.get",
+        """SELECT * FROM members
+        WHERE user_id=$1 AND guild_id=$2""",
+        readonly=True,
+    )
+
     def __init__(self, db) -> None:
         self.db = db
 
     async def get(self, user_id: int, guild_id: int) -> Optional[dict]:
-        return await self.db.fetchrow(
-            """SELECT * FROM members
-            WHERE user_id=$1 AND guild_id=$2""",
-            user_id,
-            guild_id,
-        )
+        return await self.db.fetchrow(self.GET, user_id, guild_id)
 
     async def create(
         self, user_id: int, guild_id: int, check_first: bool = True
@@ -1,18 +1,45 @@
+from typing import Optional
+
 import asyncpg
 
 from app import errors
+from app.database.statements import statement
 
 
 class Messages:
+    GET = statement(
+        "messages.get",
+        """SELECT * FROM messages
+        WHERE id=$1""",
+        readonly=True,
+    )
+    CREATE_MANY = statement(
+        "messages.create_many",
+        """INSERT INTO messages
+        (id, guild_id, channel_id, author_id, is_nsfw)
+        SELECT m.id, $1::numeric, m.channel_id, m.author_id, m.is_nsfw
+        FROM unnest(
+            $2::numeric[], $3::numeric[], $4::numeric[], $5::bool[]
+        ) AS m(id, channel_id, author_id, is_nsfw)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM starboard_messages WHERE id=m.id
+        )
+        ON CONFLICT DO NOTHING""",
+    )
+
     def __init__(self, db) -> None:
         self.db = db
 
-    async def get(self, message_id: int) -> dict:
-        return await self.db.fetchrow(
-            """SELECT * FROM messages
-            WHERE id=$1""",
-            message_id,
-        )
+    async def get(
+        self, message_id: int, guild_id: Optional[int] = None
+    ) -> dict:
+        """Passing the guild lets messages that aren't tracked be ruled
+        out without a query."""
+        if guild_id is not None and not await self.db.message_index.contains(
+            guild_id, message_id
+        ):
+            return None
+        return await self.db.fetchrow(self.GET, message_id)
 
     async def create(
         self,
@@ -24,12 +51,12 @@ class Messages:
         check_first: bool = True,
     ) -> bool:
         if check_first:
-            exists = await self.get(message_id) is not None
+            exists = await self.get(message_id, guild_id) is not None
             if exists:
                 return True
 
         is_starboard_message = (
-            await self.db.sb_messages.get(message_id) is not None
+            await self.db.sb_messages.get(message_id, guild_id) is not None
         )
         if is_starboard_message:
             raise errors.AlreadyStarboardMessage(
@@ -51,5 +78,26 @@ class Messages:
                 is_nsfw,
             )
         except asyncpg.exceptions.UniqueViolationError:
+            self.db.message_index.add(guild_id, message_id)
             return True
+        self.db.message_index.add(guild_id, message_id)
         return False
+
+    async def create_many(
+        self, guild_id: int, messages: list[tuple[int, int, int, bool]]
+    ) -> None:
+        """Creates (message_id, channel_id, author_id, is_nsfw) messages
+        in one statement. Messages that already exist or are starboard
+        messages are skipped. The guild and authors must already exist."""
+        if not messages:
+            return
+        await self.db.execute(
+            self.CREATE_MANY,
+            guild_id,
+            [m[0] for m in messages],
+            [m[1] for m in messages],
+            [m[2] for m in messages],
+            [m[3] for m in messages],
+        )
+        for m in messages:
+            self.db.message_index.add(guild_id, m[0])
@@ -2,6 +2,7 @@ import typing
 from typing import Optional
 
 from app import errors
+from app.classes.perm_table import PermTable
 
 if typing.TYPE_CHECKING:
     from app.database.database import Database
@@ -11,6 +12,15 @@ class PermGroups:
     def __init__(self, db: "Database"):
         self.db = db
 
+    def invalidate(self, guild_id: int) -> None:
+        self.db.configs.invalidate_perms(guild_id)
+
+    def invalidate_group(self, permgroup_id: int) -> None:
+        self.db.configs.invalidate_permgroup(permgroup_id)
+
+    async def get_table(self, guild_id: int) -> PermTable:
+        return await self.db.configs.perm_table(guild_id)
+
     async def create(self, guild_id: int, name: str) -> int:
         name = name.casefold()
         groups = await self.get_many(guild_id)
@@ -22,13 +32,15 @@ class PermGroups:
         else:
             index = 1
 
-        return await self.db.fetchval(
+        permgroup_id = await self.db.fetchval(
             """INSERT INTO permgroups (guild_id, name, index)
             VALUES ($1, $2, $3)""",
             guild_id,
             name,
             index,
         )
+        self.invalidate(guild_id)
+        return permgroup_id
 
     async def delete(self, permgroup_id: int):
         group = await self.get_id(permgroup_id)
@@ -45,6 +57,7 @@ class PermGroups:
             group["index"],
             group["guild_id"],
         )
+        self.invalidate(int(group["guild_id"]))
 
     async def move(self, permgroup_id: int, new_index: int) -> int:
         group = await self.get_id(permgroup_id)
@@ -80,6 +93,7 @@ class PermGroups:
             new_index,
             permgroup_id,
         )
+        self.invalidate(int(group["guild_id"]))
         return new_index
 
     async def set_starboards(self, permgroup_id: int, starboards: list[int]):
@@ -90,6 +104,7 @@ class PermGroups:
             starboards,
             permgroup_id,
         )
+        self.invalidate_group(permgroup_id)
 
     async def set_channels(self, permgroup_id: int, channels: list[int]):
         await self.db.execute(
@@ -99,13 +114,10 @@ class PermGroups:
             channels,
             permgroup_id,
         )
+        self.invalidate_group(permgroup_id)
 
     async def get_many(self, guild_id: int) -> list[dict]:
-        return await self.db.fetch(
-            """SELECT * FROM permgroups
-            WHERE guild_id=$1 ORDER BY index""",
-            guild_id,
-        )
+        return await self.db.configs.permgroups(guild_id)
 
     async def get_name(self, guild_id: int, name: str) -> Optional[dict]:
         return await self.db.fetchrow(
@@ -24,6 +24,7 @@ class PermRoles:
             role_id,
             next_index,
         )
+        self.db.permgroups.invalidate_group(permgroup_id)
 
     async def delete(self, role_id: int, group_id: int):
         permrole = await self.get(role_id, group_id)
@@ -40,6 +41,7 @@ class PermRoles:
             group_id,
             permrole["index"],
         )
+        self.db.permgroups.invalidate_group(group_id)
 
     async def move(self, role_id: int, group_id: int, index: int) -> int:
         permroles = await self.get_many(group_id)
@@ -78,6 +80,7 @@ class PermRoles:
             role_id,
             group_id,
         )
+        self.db.permgroups.invalidate_group(group_id)
 
         return index
 
@@ -112,6 +115,7 @@ class PermRoles:
             role_id,
             group_id,
         )
+        self.db.permgroups.invalidate_group(group_id)
 
     async def set_on_starboard(
         self,
@@ -128,6 +132,7 @@ class PermRoles:
             role_id,
             group_id,
         )
+        self.db.permgroups.invalidate_group(group_id)
 
     async def set_give_stars(
         self,
@@ -144,6 +149,7 @@ class PermRoles:
             role_id,
             group_id,
         )
+        self.db.permgroups.invalidate_group(group_id)
 
     async def set_gain_xp(
         self,
@@ -160,6 +166,7 @@ class PermRoles:
             role_id,
             group_id,
         )
+        self.db.permgroups.invalidate_group(group_id)
 
     async def set_pos_roles(
         self,
@@ -176,6 +183,7 @@ class PermRoles:
             role_id,
             group_id,
         )
+        self.db.permgroups.invalidate_group(group_id)
 
     async def set_xp_roles(
         self,
@@ -192,3 +200,4 @@ class PermRoles:
             role_id,
             group_id,
         )
+        self.db.permgroups.invalidate_group(group_id)
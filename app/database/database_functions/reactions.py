@@ -1,99 +1,61 @@
-from typing import Optional
-
-import asyncpg
-
-from app import errors
+from app.database.statements import statement
 
 
 class Reactions:
+    """Stores each user's reactions as a (message_id, emoji, user_id) row,
+    so that adding or removing one is a single statement."""
+
+    GET_MANY = statement(
+        "reactions.get_many",
+        """SELECT emoji, user_id FROM message_reactions
+        WHERE message_id=$1""",
+        readonly=True,
+    )
+    ADD = statement(
+        "reactions.add",
+        """INSERT INTO message_reactions (message_id, emoji, user_id)
+        VALUES ($1, $2, $3)
+        ON CONFLICT DO NOTHING
+        RETURNING true""",
+    )
+    ADD_MANY = statement(
+        "reactions.add_many",
+        """INSERT INTO message_reactions (message_id, emoji, user_id)
+        SELECT * FROM unnest($1::numeric[], $2::text[], $3::numeric[])
+        ON CONFLICT DO NOTHING""",
+    )
+    REMOVE = statement(
+        "reactions.remove",
+        """DELETE FROM message_reactions
+        WHERE message_id=$1 AND emoji=$2 AND user_id=$3
+        RETURNING true""",
+    )
+
     def __init__(self, db) -> None:
         self.db = db
 
-    async def get_reaction(
-        self, emoji: str, message_id: int
-    ) -> Optional[dict]:
-        return await self.db.fetchrow(
-            """SELECT * FROM reactions
-            WHERE emoji=$1 AND message_id=$2""",
-            emoji,
-            message_id,
-        )
-
-    async def create_reaction(
-        self, emoji: str, message_id: int, check_first: bool = True
-    ) -> bool:
-        if check_first:
-            exists = await self.get_reaction(emoji, message_id)
-            if exists:
-                return True
-
-        try:
-            await self.db.execute(
-                """INSERT INTO reactions
-                (emoji, message_id)
-                VALUES ($1, $2)""",
-                emoji,
-                message_id,
-            )
-        except asyncpg.exceptions.UniqueViolationError:
-            return True
-        return False
+    async def get_many(self, message_id: int) -> list[dict]:
+        return await self.db.fetch(self.GET_MANY, message_id)
 
-    async def get_reaction_user(
-        self, emoji: str, message_id: int, user_id: int
-    ) -> Optional[dict]:
-        reaction = await self.get_reaction(emoji, message_id)
-        if reaction is None:
-            return None
-        return await self.db.fetchrow(
-            """SELECT * FROM reaction_users
-            WHERE reaction_id=$1 AND user_id=$2""",
-            reaction["id"],
-            user_id,
+    async def add(self, emoji: str, message_id: int, user_id: int) -> bool:
+        """Returns False if the user had already reacted."""
+        return bool(
+            await self.db.fetchval(self.ADD, message_id, emoji, user_id)
         )
 
-    async def create_reaction_user(
-        self,
-        emoji: str,
-        message_id: int,
-        user_id: int,
-        check_first: bool = True,
-    ) -> bool:
-        if check_first:
-            exists = await self.get_reaction_user(emoji, message_id, user_id)
-            if exists:
-                return True
-
-        await self.create_reaction(emoji, message_id)
-
-        reaction = await self.get_reaction(emoji, message_id)
-        if not reaction:
-            raise errors.NotInDatabase(
-                f"Created reaction {emoji}, {message_id}, but "
-                "count not find it."
-            )
-
-        try:
-            await self.db.execute(
-                """INSERT INTO reaction_users
-                (reaction_id, user_id)
-                VALUES ($1, $2)""",
-                reaction["id"],
-                user_id,
-            )
-        except asyncpg.exceptions.UniqueViolationError:
-            return True
-        return False
-
-    async def delete_reaction_user(
-        self, emoji: str, message_id: int, user_id: int
-    ) -> None:
-        reaction = await self.get_reaction(emoji, message_id)
-        if reaction is None:
+    async def add_many(self, reactions: list[tuple[str, int, int]]) -> None:
+        """Adds (emoji, message_id, user_id) reactions in one statement."""
+        if not reactions:
             return
         await self.db.execute(
-            """DELETE FROM reaction_users
-            WHERE reaction_id=$1 AND user_id=$2""",
-            reaction["id"],
-            user_id,
+            self.ADD_MANY,
+            [r[1] for r in reactions],
+            [r[0] for r in reactions],
+            [r[2] for r in reactions],
+        )
+
+    async def remove(self, emoji: str, message_id: int, user_id: int) -> bool:
+        """Returns False if the user hadn't reacted."""
+        return bool(
+            await self.db.fetchval(self.REMOVE, message_id, emoji, user_id)
         )
@@ -3,18 +3,37 @@ from typing import Optional
 import asyncpg
 
 from app import errors
+from app.database.message_index import StarredIndex
+from app.database.statements import statement
 
 
 class SBMessages:
+    GET = statement(
+        "sb_messages.get",
+        """SELECT * FROM starboard_messages
+        WHERE id=$1""",
+        readonly=True,
+    )
+
     def __init__(self, db) -> None:
         self.db = db
+        self.starred = StarredIndex(db)
 
-    async def get(self, message_id: int) -> Optional[dict]:
-        return await self.db.fetchrow(
-            """SELECT * FROM starboard_messages
-            WHERE id=$1""",
-            message_id,
-        )
+    async def is_starred(self, guild_id: int, message_id: int) -> bool:
+        """Whether the message may have starboard messages. The guild's
+        starred messages are loaded the first time this is called."""
+        return await self.starred.contains(guild_id, message_id)
+
+    async def get(
+        self, message_id: int, guild_id: Optional[int] = None
+    ) -> Optional[dict]:
+        """Passing the guild lets messages that aren't tracked be ruled
+        out without a query."""
+        if guild_id is not None and not await self.db.message_index.contains(
+            guild_id, message_id
+        ):
+            return None
+        return await self.db.fetchrow(self.GET, message_id)
 
     async def create(
         self,
@@ -22,14 +41,21 @@ class SBMessages:
         orig_id: int,
         starboard_id: int,
         check_first: bool = True,
+        guild_id: Optional[int] = None,
     ) -> bool:
+        """`guild_id` is the guild of the starboard. If it isn't passed,
+        it is looked up."""
+        if guild_id is None:
+            guild_id = int(
+                (await self.db.starboards.get(starboard_id))["guild_id"]
+            )
         if check_first:
-            exists = await self.get(message_id)
+            exists = await self.get(message_id, guild_id)
             if exists:
                 return True
 
         already_orig_message = (
-            await self.db.messages.get(message_id) is not None
+            await self.db.messages.get(message_id, guild_id) is not None
         )
         if already_orig_message:
             raise errors.AlreadyOrigMessage(
@@ -47,7 +73,10 @@ class SBMessages:
                 starboard_id,
             )
         except asyncpg.exceptions.UniqueViolationError:
+            self.db.message_index.add(guild_id, message_id)
             return True
+        self.db.message_index.add(guild_id, message_id)
+        self.starred.add(guild_id, orig_id)
         return False
 
     async def delete(self, message_id: int) -> None:
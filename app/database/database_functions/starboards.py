@@ -1,7 +1,6 @@
 from typing import Optional
 
 import asyncpg
-from aiocache import Cache, SimpleMemoryCache
 from discord.ext import commands
 
 from app import errors
@@ -11,63 +10,35 @@ from app.i18n import t_
 class Starboards:
     def __init__(self, db) -> None:
         self.db = db
-        self.cache: SimpleMemoryCache = Cache(namespace="starboards", ttl=10)
-        self.many_cache: SimpleMemoryCache = Cache(namespace="many_sb", ttl=10)
-        self.emoji_cache: SimpleMemoryCache = Cache(
-            namespace="sb_emojis", ttl=10
-        )
-
-    async def _starboard_edited(
-        self, starboard_id: int, guild_id: Optional[int] = None
-    ):
-        await self.cache.delete(starboard_id)
-        if guild_id:
-            await self.emoji_cache.delete(guild_id)
-            await self.many_cache.delete(guild_id)
 
     async def star_emojis(self, guild_id: int) -> list[str]:
-        r = await self.emoji_cache.get(guild_id)
-        if r:
-            return r
-
-        _emojis = await self.db.execute(
-            """SELECT star_emojis FROM starboards
-            WHERE guild_id=$1""",
-            guild_id,
-        )
-        if _emojis:
-            emojis = [
-                emoji for record in _emojis for emoji in record["star_emojis"]
-            ]
-        else:
-            emojis = []
+        starboards = await self.db.configs.starboards(guild_id)
+        return [
+            emoji for s in starboards.values() for emoji in s["star_emojis"]
+        ]
 
-        await self.emoji_cache.set(guild_id, emojis)
-        return emojis
-
-    async def get(self, starboard_id: int) -> Optional[dict]:
-        r = await self.cache.get(starboard_id)
-        if r:
-            return r
-        sql_starboard = await self.db.fetchrow(
-            """SELECT * FROM starboards
-            WHERE id=$1""",
-            starboard_id,
-        )
-        await self.cache.set(starboard_id, sql_starboard)
-        return sql_starboard
+    async def get(
+        self, starboard_id: int, guild_id: Optional[int] = None
+    ) -> Optional[dict]:
+        """Returns the starboard from the config cache. Passing guild_id
+        avoids querying the database for channels that aren't known."""
+        if guild_id is None:
+            guild_id = self.db.configs.guild_of(starboard_id)
+        if guild_id is None:
+            sql_starboard = await self.db.fetchrow(
+                """SELECT guild_id FROM starboards
+                WHERE id=$1""",
+                starboard_id,
+            )
+            if not sql_starboard:
+                return None
+            guild_id = int(sql_starboard["guild_id"])
+        starboards = await self.db.configs.starboards(guild_id)
+        return starboards.get(starboard_id)
 
     async def get_many(self, guild_id: int) -> list[dict]:
-        r = await self.many_cache.get(guild_id)
-        if r:
-            return r
-        sql_starboards = await self.db.fetch(
-            """SELECT * FROM starboards
-            WHERE guild_id=$1""",
-            guild_id,
-        )
-        await self.many_cache.set(guild_id, sql_starboards)
-        return sql_starboards
+        starboards = await self.db.configs.starboards(guild_id)
+        return list(starboards.values())
 
     async def create(
         self, channel_id: int, guild_id: int, check_first: bool = True
@@ -83,16 +54,17 @@ class Starboards:
 
         await self.db.guilds.create(guild_id)
         try:
-            await self.db.execute(
+            sql_starboard = await self.db.fetchrow(
                 """INSERT INTO starboards (id, guild_id)
-                VALUES ($1, $2)""",
+                VALUES ($1, $2)
+                RETURNING *""",
                 channel_id,
                 guild_id,
             )
         except asyncpg.exceptions.UniqueViolationError:
             return True
 
-        await self._starboard_edited(channel_id, guild_id)
+        self.db.configs.set_starboard(sql_starboard)
 
         return False
 
@@ -105,37 +77,44 @@ class Starboards:
             """DELETE FROM starboards WHERE id=$1""", starboard_id
         )
 
-        await self._starboard_edited(starboard_id, int(s["guild_id"]))
+        self.db.configs.remove_starboard(int(s["guild_id"]), starboard_id)
+        self.db.sb_messages.starred.forget(int(s["guild_id"]))
 
     async def set_webhook(self, starboard_id: int, url: Optional[str]):
-        await self.db.execute(
+        sql_starboard = await self.db.fetchrow(
             """UPDATE starboards
             SET webhook_url=$1
-            WHERE id=$2""",
+            WHERE id=$2
+            RETURNING *""",
             url,
             starboard_id,
         )
-        await self._starboard_edited(starboard_id)
+        if sql_starboard:
+            self.db.configs.set_starboard(sql_starboard)
 
     async def set_webhook_name(self, starboard_id: int, name: str):
-        await self.db.execute(
+        sql_starboard = await self.db.fetchrow(
             """UPDATE starboards
             SET webhook_name=$1
-            WHERE id=$2""",
+            WHERE id=$2
+            RETURNING *""",
             name,
             starboard_id,
         )
-        await self._starboard_edited(starboard_id)
+        if sql_starboard:
+            self.db.configs.set_starboard(sql_starboard)
 
     async def set_webhook_avatar(self, starboard_id: int, url: str):
-        await self.db.execute(
+        sql_starboard = await self.db.fetchrow(
             """UPDATE starboards
             SET webhook_avatar=$1
-            WHERE id=$2""",
+            WHERE id=$2
+            RETURNING *""",
             url,
             starboard_id,
         )
-        await self._starboard_edited(starboard_id)
+        if sql_starboard:
+            self.db.configs.set_starboard(sql_starboard)
 
     async def edit(
         self,
@@ -236,7 +215,7 @@ class Starboards:
                 t_("requiredRemove cannot be greater than 495.")
             )
 
-        await self.db.execute(
+        sql_starboard = await self.db.fetchrow(
             """UPDATE starboards
             SET required = $1,
             required_remove = $2,
@@ -258,7 +237,8 @@ class Starboards:
             channel_wl = $18,
             use_webhook = $19,
             remove_invalid = $20
-            WHERE id = $21""",
+            WHERE id = $21
+            RETURNING *""",
             settings["required"],
             settings["required_remove"],
             settings["autoreact"],
@@ -282,7 +262,7 @@ class Starboards:
             starboard_id,
         )
 
-        await self._starboard_edited(starboard_id, int(s["guild_id"]))
+        self.db.configs.set_starboard(sql_starboard)
 
     async def add_star_emoji(self, starboard_id: int, emoji: str) -> None:
         if type(emoji) is not str:
@@ -297,7 +277,7 @@ class Starboards:
             raise errors.AlreadySBEmoji(emoji, starboard["id"])
 
         await self.edit(
-            starboard_id, star_emojis=starboard["star_emojis"] + [emoji]
+            starboard_id, star_emojis=list(starboard["star_emojis"]) + [emoji]
         )
 
     async def remove_star_emoji(self, starboard_id: int, emoji: str) -> None:
@@ -312,7 +292,7 @@ class Starboards:
         if emoji not in starboard["star_emojis"]:
             raise errors.AlreadySBEmoji(emoji, starboard["id"])
 
-        new_emojis = starboard["star_emojis"]
+        new_emojis = list(starboard["star_emojis"])
         new_emojis.remove(emoji)
 
         await self.edit(starboard_id, star_emojis=new_emojis)
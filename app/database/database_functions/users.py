@@ -2,8 +2,17 @@ from typing import Optional
 
 import asyncpg
 
+from app.database.statements import statement
+
 
 class Users:
+    GET = statement(
+        "users.get",
+        """SELECT * FROM users
+        WHERE id=$1""",
+        readonly=True,
+    )
+
     def __init__(self, db) -> None:
         self.db = db
 
@@ -42,11 +51,7 @@ class Users:
         )
 
     async def get(self, user_id: int) -> Optional[dict]:
-        return await self.db.fetchrow(
-            """SELECT * FROM users
-            WHERE id=$1""",
-            user_id,
-        )
+        return await self.db.fetchrow(self.GET, user_id)
 
     async def create(
         self, user_id: int, is_bot: bool, check_first: bool = True
@@ -18,9 +18,8 @@ class XPRoles:
         )
 
     async def get_many(self, guild_id: int) -> list[dict]:
-        return await self.db.fetch(
-            """SELECT * FROM xproles WHERE guild_id=$1""", guild_id
-        )
+        xproles = await self.db.configs.xproles(guild_id)
+        return list(xproles.values())
 
     async def create(
         self,
@@ -31,23 +30,32 @@ class XPRoles:
         if required <= 0:
             raise commands.BadArgument(t_("Required must be greater than 0."))
 
-        await self.db.execute(
+        r = await self.db.fetchrow(
             """INSERT INTO xproles (role_id, guild_id, required)
-            VALUES ($1, $2, $3)""",
+            VALUES ($1, $2, $3)
+            RETURNING *""",
             role_id,
             guild_id,
             required,
         )
+        self.db.configs.set_xprole(r)
 
     async def delete(self, role_id: int):
-        await self.db.execute(
-            """DELETE FROM xproles WHERE role_id=$1""", role_id
+        guild_id = await self.db.fetchval(
+            """DELETE FROM xproles WHERE role_id=$1
+            RETURNING guild_id""",
+            role_id,
         )
+        if guild_id is not None:
+            self.db.configs.remove_xprole(int(guild_id), role_id)
 
     async def set_required(self, role_id: int, required: int):
-        await self.db.execute(
+        r = await self.db.fetchrow(
             """UPDATE xproles SET required=$1
-            WHERE role_id=$2""",
+            WHERE role_id=$2
+            RETURNING *""",
             required,
             role_id,
         )
+        if r:
+            self.db.configs.set_xprole(r)
@@ -0,0 +1,69 @@
+import json
+import typing
+from typing import Iterator, NamedTuple
+
+import asyncpg
+
+if typing.TYPE_CHECKING:
+    from app.database.database import Database
+
+
+class SeqScan(NamedTuple):
+    sql: str
+    tables: list[str]
+    executions: int
+    total: float
+
+
+def _seq_scans(plan: dict) -> Iterator[str]:
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", ()):
+        yield from _seq_scans(child)
+
+
+async def _explain(con: asyncpg.Connection, sql: str) -> list[str]:
+    # Plan the query without any parameter values, the same way a
+    # prepared statement that is reused many times would be planned
+    params = len((await con.prepare(sql)).get_parameters())
+    await con.execute("""SET plan_cache_mode = force_generic_plan""")
+    await con.execute(f"""PREPARE index_advisor AS {sql}""")
+    try:
+        args = f"({', '.join(['NULL'] * params)})" if params else ""
+        result = await con.fetchval(
+            f"""EXPLAIN (FORMAT JSON) EXECUTE index_advisor{args}"""
+        )
+    finally:
+        await con.execute("""DEALLOCATE index_advisor""")
+    return sorted(set(_seq_scans(json.loads(result)[0]["Plan"])))
+
+
+async def find_seq_scans(
+    db: "Database", min_executions: int = 10
+) -> list[SeqScan]:
+    """EXPLAINs every query in db.sql_stats that ran at least
+    min_executions times, and returns the ones that sequentially scan
+    a table, slowest in total first."""
+    # A separate connection, so that the session settings and prepared
+    # statement never leak into the pool
+    con = await asyncpg.connect(
+        database=db.name, user=db.user, password=db.password
+    )
+    results: list[SeqScan] = []
+    try:
+        for sql, stats in list(db.sql_stats.queries.items()):
+            if stats.calls < min_executions:
+                continue
+            try:
+                tables = await _explain(con, sql)
+            except asyncpg.PostgresError:
+                continue
+            if tables:
+                results.append(
+                    SeqScan(sql, tables, stats.calls, stats.execute.total)
+                )
+    finally:
+        await con.close()
+
+    results.sort(key=lambda r: r.total, reverse=True)
+    return results
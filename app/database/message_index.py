@@ -0,0 +1,128 @@
+import asyncio
+from array import array
+from bisect import bisect_left
+from itertools import chain
+from typing import Iterable
+
+from cachetools import LRUCache
+
+# New IDs are kept in a set until there are this many, and then merged
+# into the sorted array
+MERGE_AT = 256
+
+
+class GuildIndex:
+    """A sorted array of message IDs, plus a set of recently added IDs.
+    Uses 8 bytes per ID, instead of ~70 for a set."""
+
+    __slots__ = ("ids", "recent")
+
+    def __init__(self, ids: Iterable[int]) -> None:
+        self.ids = array("Q", sorted(ids))
+        self.recent: set[int] = set()
+
+    def __contains__(self, message_id: int) -> bool:
+        if message_id in self.recent:
+            return True
+        pos = bisect_left(self.ids, message_id)
+        return pos < len(self.ids) and self.ids[pos] == message_id
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.recent)
+
+    def add(self, message_id: int) -> None:
+        if message_id in self:
+            return
+        self.recent.add(message_id)
+        if len(self.recent) >= MERGE_AT:
+            self.ids = array("Q", sorted(chain(self.ids, self.recent)))
+            self.recent.clear()
+
+    def remove(self, message_id: int) -> None:
+        self.recent.discard(message_id)
+        pos = bisect_left(self.ids, message_id)
+        if pos < len(self.ids) and self.ids[pos] == message_id:
+            del self.ids[pos]
+
+
+class MessageIndex:
+    """Knows the IDs of every message and starboard message in the
+    database, per guild, so that lookups of messages that aren't tracked
+    don't need to query Postgres.
+
+    A guild's IDs are loaded the first time one of its messages is looked
+    up. Database functions that insert messages must call `add`. Deleted
+    messages don't need to be removed; they only cost a query."""
+
+    LOAD = """SELECT id FROM messages WHERE guild_id=$1
+        UNION ALL
+        SELECT sb.id FROM starboard_messages sb
+        JOIN messages m ON m.id=sb.orig_id
+        WHERE m.guild_id=$1"""
+
+    def __init__(self, db, max_guilds: int = 5000) -> None:
+        self.db = db
+        self.guilds: LRUCache = LRUCache(maxsize=max_guilds)
+        # guild_id -> the load in progress
+        self._loading: dict[int, asyncio.Future] = {}
+        # guild_id -> IDs added while the guild was loading
+        self._added: dict[int, set[int]] = {}
+
+    async def contains(self, guild_id: int, message_id: int) -> bool:
+        index = self.guilds.get(guild_id)
+        if index is None:
+            index = await self._load(guild_id)
+        return message_id in index
+
+    async def _load(self, guild_id: int) -> GuildIndex:
+        future = self._loading.get(guild_id)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._loading[guild_id] = (
+            asyncio.get_event_loop().create_future()
+        )
+        self._added[guild_id] = set()
+        try:
+            rows = await self.db.fetch(self.LOAD, guild_id)
+            index = GuildIndex(
+                chain((int(r["id"]) for r in rows), self._added.pop(guild_id))
+            )
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved, so that it isn't logged if nobody else waited
+            future.exception()
+            raise
+        finally:
+            self._added.pop(guild_id, None)
+            del self._loading[guild_id]
+
+        self.guilds[guild_id] = index
+        future.set_result(index)
+        return index
+
+    def add(self, guild_id: int, message_id: int) -> None:
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            index.add(message_id)
+        elif guild_id in self._added:
+            self._added[guild_id].add(message_id)
+
+    def remove(self, guild_id: int, message_id: int) -> None:
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            index.remove(message_id)
+
+    def forget(self, guild_id: int) -> None:
+        self.guilds.pop(guild_id, None)
+
+
+class StarredIndex(MessageIndex):
+    """Knows the IDs of the original messages that have at least one
+    starboard message, per guild. Starboard messages that are deleted
+    leave their original behind until the guild is reloaded, which only
+    costs an update that finds nothing to do."""
+
+    LOAD = """SELECT DISTINCT sb.orig_id AS id FROM starboard_messages sb
+        JOIN messages m ON m.id=sb.orig_id
+        WHERE m.guild_id=$1"""
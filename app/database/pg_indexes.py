@@ -1,20 +1,81 @@
-MEMBERS__USER_ID__GUILD_ID = """CREATE INDEX IF NOT EXISTS
-    members__user_id__guild_id ON members (user_id, guild_id)"""
+from typing import NamedTuple
 
-STARBOARDS__GUILD_ID = """CREATE INDEX IF NOT EXISTS
-    starboards__guild_id ON starboards USING HASH (guild_id)"""
 
-REACTION_USERS__REACTION_ID__USER_ID = """CREATE UNIQUE INDEX IF NOT EXISTS
-    reaction_users__reaction_id__user_id ON reaction_users
-    (reaction_id, user_id)"""
+class Index(NamedTuple):
+    name: str
+    # Bump the version whenever the definition changes, so that the
+    # index is dropped and recreated on the next startup
+    version: int
+    sql: str
 
-STARBOARD_MESSAGES__STARBOARD_ID = """CREATE INDEX IF NOT EXISTS
+
+MEMBERS__USER_ID__GUILD_ID = Index(
+    "members__user_id__guild_id",
+    1,
+    """CREATE INDEX IF NOT EXISTS
+    members__user_id__guild_id ON members (user_id, guild_id)""",
+)
+
+STARBOARDS__GUILD_ID = Index(
+    "starboards__guild_id",
+    1,
+    """CREATE INDEX IF NOT EXISTS
+    starboards__guild_id ON starboards USING HASH (guild_id)""",
+)
+
+STARBOARD_MESSAGES__STARBOARD_ID = Index(
+    "starboard_messages__starboard_id",
+    1,
+    """CREATE INDEX IF NOT EXISTS
     starboard_messages__starboard_id ON starboard_messages
-    USING HASH (starboard_id)"""
+    USING HASH (starboard_id)""",
+)
+
+STARBOARD_MESSAGES__ORIG_ID__STARBOARD_ID = Index(
+    "starboard_messages__orig_id__starboard_id",
+    1,
+    """CREATE INDEX IF NOT EXISTS
+    starboard_messages__orig_id__starboard_id ON starboard_messages
+    (orig_id, starboard_id)""",
+)
+
+MESSAGES__GUILD_ID__TRASHED = Index(
+    "messages__guild_id__trashed",
+    1,
+    """CREATE INDEX IF NOT EXISTS
+    messages__guild_id__trashed ON messages (guild_id, trashed)""",
+)
+
+PERMGROUPS__GUILD_ID = Index(
+    "permgroups__guild_id",
+    1,
+    """CREATE INDEX IF NOT EXISTS
+    permgroups__guild_id ON permgroups (guild_id, index)""",
+)
+
+PERMROLES__PERMGROUP_ID__ROLE_ID = Index(
+    "permroles__permgroup_id__role_id",
+    1,
+    """CREATE INDEX IF NOT EXISTS
+    permroles__permgroup_id__role_id ON permroles (permgroup_id, role_id)""",
+)
+
+XPROLES__GUILD_ID__REQUIRED = Index(
+    "xproles__guild_id__required",
+    1,
+    """CREATE INDEX IF NOT EXISTS
+    xproles__guild_id__required ON xproles (guild_id, required)""",
+)
+
+# message_reactions (message_id, emoji) is covered by its primary key
 
 ALL_INDEXES = [
     MEMBERS__USER_ID__GUILD_ID,
     STARBOARDS__GUILD_ID,
-    REACTION_USERS__REACTION_ID__USER_ID,
     STARBOARD_MESSAGES__STARBOARD_ID,
+    STARBOARD_MESSAGES__ORIG_ID__STARBOARD_ID,
+    MESSAGES__GUILD_ID__TRASHED,
+    PERMGROUPS__GUILD_ID,
+    PERMROLES__PERMGROUP_ID__ROLE_ID,
+    XPROLES__GUILD_ID__REQUIRED,
 ]
@@ -0,0 +1,24 @@
+# Migrations must be safe to run on every startup, since they run after
+# the tables in pg_tables have been created.
+
+# reactions + reaction_users -> message_reactions
+MERGE_REACTION_TABLES = """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT * FROM pg_tables WHERE tablename = 'reaction_users'
+        ) THEN
+            INSERT INTO message_reactions (message_id, emoji, user_id)
+            SELECT reactions.message_id, reactions.emoji,
+                reaction_users.user_id
+            FROM reaction_users
+            JOIN reactions ON reactions.id=reaction_users.reaction_id
+            ON CONFLICT DO NOTHING;
+
+            DROP TABLE reaction_users;
+            DROP TABLE reactions;
+        END IF;
+    END;
+    $$"""
+
+ALL_MIGRATIONS = [MERGE_REACTION_TABLES]
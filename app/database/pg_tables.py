@@ -183,25 +183,25 @@ STARBOARD_MESSAGES = """CREATE TABLE IF NOT EXISTS starboard_messages (
             ON DELETE CASCADE
     )"""
 
-REACTIONS = """CREATE TABLE IF NOT EXISTS reactions (
-        id SERIAL PRIMARY KEY,
-        emoji TEXT NOT NULL,
+MESSAGE_REACTIONS = """CREATE TABLE IF NOT EXISTS message_reactions (
         message_id NUMERIC NOT NULL,
-
-        FOREIGN KEY (message_id) REFERENCES messages (id)
-            ON DELETE CASCADE
-    )"""
-
-REACTION_USERS = """CREATE TABLE IF NOT EXISTS reaction_users (
-        reaction_id BIGINT NOT NULL,
+        emoji TEXT NOT NULL,
         user_id NUMERIC NOT NULL,
 
-        FOREIGN KEY (reaction_id) REFERENCES reactions (id)
+        -- Also covers the lookup of all reactions on a message
+        PRIMARY KEY (message_id, emoji, user_id),
+
+        FOREIGN KEY (message_id) REFERENCES messages (id)
             ON DELETE CASCADE,
         FOREIGN KEY (user_id) REFERENCES users (id)
             ON DELETE CASCADE
     )"""
 
+MANAGED_INDEXES = """CREATE TABLE IF NOT EXISTS managed_indexes (
+        name TEXT PRIMARY KEY,
+        version SMALLINT NOT NULL
+    )"""
+
 ALL_TABLES = [
     GUILDS,
     USERS,
@@ -213,6 +213,6 @@ ALL_TABLES = [
     XP_ROLES,
     MESSAGES,
     STARBOARD_MESSAGES,
-    REACTIONS,
-    REACTION_USERS,
+    MESSAGE_REACTIONS,
+    MANAGED_INDEXES,
 ]
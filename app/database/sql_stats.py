@@ -0,0 +1,181 @@
+import math
+import time
+from collections import deque
+from typing import Any, Iterable, Optional
+
+from cachetools import LRUCache
+
+# Each power of two is split into this many buckets, so that a recorded
+# value is off by at most 1/SUB_BUCKETS (12.5%)
+SUB_BUCKETS = 8
+_SUB_BITS = SUB_BUCKETS.bit_length() - 1
+
+
+def _bucket(us: int) -> int:
+    if us < SUB_BUCKETS:
+        return us
+    shift = us.bit_length() - _SUB_BITS - 1
+    return SUB_BUCKETS * (shift + 1) + (us >> shift) - SUB_BUCKETS
+
+
+def _upper_bound(bucket: int) -> int:
+    if bucket < SUB_BUCKETS:
+        return bucket + 1
+    shift, sub = divmod(bucket - SUB_BUCKETS, SUB_BUCKETS)
+    return (SUB_BUCKETS + sub + 1) << shift
+
+
+class Histogram:
+    """A log-linear latency histogram with a fixed number of buckets, in
+    the style of HdrHistogram. Values are recorded in seconds."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self) -> None:
+        # bucket -> count. Sparse, but never more than ~300 buckets.
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def record(self, seconds: float) -> None:
+        bucket = _bucket(int(seconds * 1_000_000))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "Histogram") -> None:
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        target = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(_upper_bound(bucket) / 1_000_000, self.max)
+        return self.max
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "buckets": self.buckets,
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Histogram":
+        hist = cls()
+        # Keys become strings when sent as JSON
+        hist.buckets = {int(b): c for b, c in data["buckets"].items()}
+        hist.count = data["count"]
+        hist.total = data["total"]
+        hist.max = data["max"]
+        return hist
+
+
+class QueryStats:
+    __slots__ = ("calls", "rows", "execute", "windows")
+
+    def __init__(self, windows: int) -> None:
+        self.calls = 0
+        self.rows = 0
+        self.execute = Histogram()
+        # (window start, histogram), newest last
+        self.windows: deque[tuple[float, Histogram]] = deque(maxlen=windows)
+
+    def record(self, seconds: float, rows: int, window_start: float) -> None:
+        self.calls += 1
+        self.rows += rows
+        self.execute.record(seconds)
+        if not self.windows or self.windows[-1][0] != window_start:
+            self.windows.append((window_start, Histogram()))
+        self.windows[-1][1].record(seconds)
+
+    def recent(self, since: float) -> Histogram:
+        hist = Histogram()
+        for start, window in self.windows:
+            if start >= since:
+                hist.merge(window)
+        return hist
+
+
+class SQLStats:
+    """Fixed-memory timing of SQL queries. Keeps a lifetime histogram and
+    a few rolling windows per query, and a single histogram of the time
+    spent waiting for a connection from the pool."""
+
+    def __init__(
+        self, max_queries: int = 500, window: float = 60, windows: int = 5
+    ) -> None:
+        self.window = window
+        self.windows = windows
+        self.queries: LRUCache = LRUCache(maxsize=max_queries)
+        self.acquire = Histogram()
+
+    def _window_start(self, now: float) -> float:
+        return now - now % self.window
+
+    def record(
+        self, sql: str, acquire: float, execute: float, rows: int
+    ) -> None:
+        self.acquire.record(acquire)
+        stats: Optional[QueryStats] = self.queries.get(sql)
+        if stats is None:
+            stats = self.queries[sql] = QueryStats(self.windows)
+        stats.record(execute, rows, self._window_start(time.time()))
+
+    def export(self) -> dict[str, Any]:
+        """A JSON-serializable snapshot, so that stats can be sent over
+        IPC and merged with merge_exports."""
+        since = self._window_start(time.time()) - self.window * (
+            self.windows - 1
+        )
+        return {
+            "acquire": self.acquire.to_dict(),
+            "queries": {
+                sql: {
+                    "calls": stats.calls,
+                    "rows": stats.rows,
+                    "execute": stats.execute.to_dict(),
+                    "recent": stats.recent(since).to_dict(),
+                }
+                for sql, stats in self.queries.items()
+            },
+        }
+
+    @staticmethod
+    def merge_exports(exports: Iterable[dict[str, Any]]) -> dict[str, Any]:
+        """Merges exports from several clusters. Histograms in the result
+        are Histogram objects instead of dicts."""
+        acquire = Histogram()
+        queries: dict[str, dict[str, Any]] = {}
+        for export in exports:
+            acquire.merge(Histogram.from_dict(export["acquire"]))
+            for sql, data in export["queries"].items():
+                query = queries.setdefault(
+                    sql,
+                    {
+                        "calls": 0,
+                        "rows": 0,
+                        "execute": Histogram(),
+                        "recent": Histogram(),
+                    },
+                )
+                query["calls"] += data["calls"]
+                query["rows"] += data["rows"]
+                query["execute"].merge(Histogram.from_dict(data["execute"]))
+                query["recent"].merge(Histogram.from_dict(data["recent"]))
+        return {"acquire": acquire, "queries": queries}
@@ -0,0 +1,23 @@
+from typing import NamedTuple
+
+
+class Statement(NamedTuple):
+    name: str
+    sql: str
+    readonly: bool
+
+
+# sql -> Statement
+REGISTRY: dict[str, Statement] = {}
+
+
+def statement(name: str, sql: str, readonly: bool = False) -> str:
+    """Registers a query, so that the connection pool keeps room for it
+    in its statement cache, and returns its SQL to be passed to
+    Database.fetch etc. as usual. Read-only queries are run without a
+    transaction.
+
+    Queries should be declared as class attributes of the database
+    function classes, so that they are registered on import."""
+    REGISTRY[sql] = Statement(name, sql, readonly)
+    return sql
@@ -0,0 +1,124 @@
+import asyncio
+from bisect import bisect_left, insort
+from typing import Optional
+
+from cachetools import LRUCache
+
+
+class GuildRanking:
+    """The members of a guild with XP, sorted by XP. Ties are broken by
+    user ID, so that every member has a distinct rank."""
+
+    __slots__ = ("keys", "members")
+
+    def __init__(self) -> None:
+        # (-xp, user_id), sorted
+        self.keys: list[tuple[int, int]] = []
+        # user_id -> (xp, level)
+        self.members: dict[int, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def set(self, user_id: int, xp: int, level: int) -> None:
+        old = self.members.pop(user_id, None)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, (-old[0], user_id))]
+        if xp > 0:
+            self.members[user_id] = (xp, level)
+            insort(self.keys, (-xp, user_id))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        member = self.members.get(user_id)
+        if member is None:
+            return None
+        return bisect_left(self.keys, (-member[0], user_id)) + 1
+
+    def page(self, offset: int, limit: int) -> list[tuple[int, int, int, int]]:
+        """Returns (rank, user_id, xp, level) for `limit` members,
+        starting at rank `offset + 1`."""
+        return [
+            (rank, user_id, -neg_xp, self.members[user_id][1])
+            for rank, (neg_xp, user_id) in enumerate(
+                self.keys[offset : offset + limit], offset + 1
+            )
+        ]
+
+
+class XPRanks:
+    """Per-guild XP rankings, so that a member's rank and pages of the
+    leaderboard can be found without sorting the members table.
+
+    A guild is loaded the first time it is used. Code that changes XP
+    must call `update`, or `forget` if it changes many members."""
+
+    LOAD = """SELECT m.user_id, m.xp, m.level FROM members m
+        JOIN users u ON u.id=m.user_id
+        WHERE m.guild_id=$1 AND m.xp > 0 AND NOT u.is_bot"""
+
+    def __init__(self, db, max_guilds: int = 1000) -> None:
+        self.db = db
+        self.guilds: LRUCache = LRUCache(maxsize=max_guilds)
+        # guild_id -> the load in progress
+        self._loading: dict[int, asyncio.Future] = {}
+        # guild_id -> updates made while the guild was loading, in order
+        self._updates: dict[int, list[tuple[int, int, int]]] = {}
+
+    async def get(self, guild_id: int) -> GuildRanking:
+        ranking = self.guilds.get(guild_id)
+        if ranking is not None:
+            return ranking
+
+        future = self._loading.get(guild_id)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._loading[guild_id] = (
+            asyncio.get_event_loop().create_future()
+        )
+        self._updates[guild_id] = []
+        try:
+            rows = await self.db.fetch(self.LOAD, guild_id)
+            ranking = GuildRanking()
+            rows = sorted(
+                rows, key=lambda r: (-int(r["xp"]), int(r["user_id"]))
+            )
+            ranking.keys = [(-int(r["xp"]), int(r["user_id"])) for r in rows]
+            ranking.members = {
+                int(r["user_id"]): (int(r["xp"]), int(r["level"]))
+                for r in rows
+            }
+            # Updates that happened after the query are newer
+            for update in self._updates[guild_id]:
+                ranking.set(*update)
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved, so that it isn't logged if nobody else waited
+            future.exception()
+            raise
+        finally:
+            del self._updates[guild_id]
+            del self._loading[guild_id]
+
+        self.guilds[guild_id] = ranking
+        future.set_result(ranking)
+        return ranking
+
+    async def rank(self, guild_id: int, user_id: int) -> Optional[int]:
+        return (await self.get(guild_id)).rank(user_id)
+
+    async def page(
+        self, guild_id: int, offset: int, limit: int
+    ) -> list[tuple[int, int, int, int]]:
+        return (await self.get(guild_id)).page(offset, limit)
+
+    def update(self, guild_id: int, user_id: int, xp: int, level: int) -> None:
+        """Records a member's new XP. Bots should not be passed."""
+        ranking = self.guilds.get(guild_id)
+        if ranking is not None:
+            ranking.set(user_id, xp, level)
+        elif guild_id in self._updates:
+            self._updates[guild_id].append((user_id, xp, level))
+
+    def forget(self, guild_id: int) -> None:
+        self.guilds.pop(guild_id, None)
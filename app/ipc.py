@@ -1,37 +1,160 @@
 import asyncio
+import json
 import pathlib
 import signal
 import ssl
+from typing import Any, Optional
 
 import websockets
 
-CLIENTS: dict[str, websockets.WebSocketServerProtocol] = {}
+from app.classes import ipc_codec
+
+# Messages queued for a client before it is considered too slow, and new
+# messages to it are dropped
+MAX_QUEUE = 1000
 
 SSL_CONTEXT = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
 SSL_CONTEXT.load_cert_chain(pathlib.Path("localhost.pem"))
 
 
-async def dispatch(data):
-    for cluster_name, client in CLIENTS.items():
-        await client.send(data)
+class Client:
+    def __init__(
+        self,
+        name: str,
+        ws: websockets.WebSocketServerProtocol,
+        shard_ids: list[int],
+        shard_count: int,
+        codec=ipc_codec.DEFAULT,
+    ):
+        self.name = name
+        self.ws = ws
+        self.shard_ids = set(shard_ids)
+        self.shard_count = shard_count
+        self.codec = codec
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUE)
+        self.dropped = 0
+        self.task = asyncio.get_event_loop().create_task(self.writer())
+
+    def send(self, data: bytes) -> None:
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            if self.dropped == 0:
+                print(f"IPC: {self.name} is too slow, dropping messages")
+            self.dropped += 1
+
+    async def writer(self) -> None:
+        while True:
+            data = await self.queue.get()
+            try:
+                await self.ws.send(data)
+            except websockets.ConnectionClosed:
+                return
+            if self.dropped:
+                print(f"IPC: {self.name} caught up, dropped {self.dropped}")
+                self.dropped = 0
+
+    def has_guild(self, guild_id: int) -> bool:
+        if not self.shard_count:
+            return False
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
+
+
+CLIENTS: dict[str, Client] = {}
+
+
+def dispatch(
+    msg: dict[str, Any], recipients: Optional[list[Client]] = None
+) -> None:
+    # Encoded once per codec, not once per client
+    encoded: dict[str, bytes] = {}
+    for client in CLIENTS.values() if recipients is None else recipients:
+        data = encoded.get(client.codec.name)
+        if data is None:
+            data = encoded[client.codec.name] = client.codec.encode(msg)
+        client.send(data)
+
+
+def broadcast_clients():
+    dispatch({"type": "clients", "clients": list(CLIENTS)})
+
+
+def route(msg: dict[str, Any]) -> list[Client]:
+    """Finds the clients a message is addressed to. Messages without an
+    address go to every client."""
+    if msg.get("to") is not None:
+        client = CLIENTS.get(msg["to"])
+        return [client] if client else []
+    if msg.get("guild_id") is not None:
+        guild_id = int(msg["guild_id"])
+        return [c for c in CLIENTS.values() if c.has_guild(guild_id)]
+    return list(CLIENTS.values())
+
+
+def handle(sender: Client, data: bytes):
+    msg = sender.codec.decode(data)
+    recipients = route(msg)
+    if msg["type"] == "command" and msg.get("respond"):
+        # Let the sender know who to wait for. This is queued before the
+        # command is forwarded, so it always arrives before any response.
+        dispatch(
+            {
+                "type": "routed",
+                "callback": msg["callback"],
+                "recipients": [c.name for c in recipients],
+            },
+            [sender],
+        )
+    # Clients may have negotiated different codecs, so the message is
+    # re-encoded instead of forwarded as is
+    dispatch(msg, recipients)
 
 
 async def serve(ws: websockets.WebSocketServerProtocol, path: str):
-    cluster_name = await ws.recv()
-    if isinstance(cluster_name, bytes):
-        cluster_name = cluster_name.decode()
+    handshake = await ws.recv()
+    if isinstance(handshake, bytes):
+        handshake = handshake.decode()
+    try:
+        info = json.loads(handshake)
+    except json.JSONDecodeError:
+        info = None
+    if not isinstance(info, dict):
+        # Clients that only send their name
+        info = {"name": handshake}
+    cluster_name = info["name"]
+
     if cluster_name in CLIENTS:
         print(f"IPC: {cluster_name} attempted reconnection")
         await ws.close(4029, "already connected")
         return
-    CLIENTS[cluster_name] = ws
+    codec = ipc_codec.negotiate(info.get("codecs"))
+    await ws.send(
+        json.dumps(
+            {
+                "status": "ok",
+                "clients": [*CLIENTS, cluster_name],
+                "codec": codec.name,
+            }
+        ).encode()
+    )
+    # Everything sent after the handshake goes through the client's queue
+    client = CLIENTS[cluster_name] = Client(
+        cluster_name,
+        ws,
+        info.get("shard_ids") or [],
+        info.get("shard_count") or 0,
+        codec,
+    )
     try:
-        await ws.send(b'{"status":"ok"}')
+        broadcast_clients()
         print(f"IPC: {cluster_name} connected successfully")
         async for msg in ws:
-            await dispatch(msg)
+            handle(client, msg)
     finally:
         CLIENTS.pop(cluster_name)
+        client.task.cancel()
+        broadcast_clients()
         print(f"IPC: {cluster_name} disconnected")
 
 
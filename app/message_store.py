@@ -0,0 +1,75 @@
+import asyncio
+import collections
+import os
+import signal
+import time
+from typing import Any
+
+from app.classes.store_connection import pack_frame, read_frame
+
+# Messages kept before the least recently used ones are evicted
+MAX_MESSAGES = 200_000
+
+
+class Store:
+    """An LRU of message projections, each with its own expiry."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        # key -> (expires at, value)
+        self.items: collections.OrderedDict[int, tuple[float, Any]] = (
+            collections.OrderedDict()
+        )
+
+    def get(self, key: int) -> Any:
+        item = self.items.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self.items[key]
+            return None
+        self.items.move_to_end(key)
+        return item[1]
+
+    def set(self, key: int, value: Any, ttl: float) -> None:
+        self.items[key] = (time.monotonic() + ttl, value)
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def delete(self, key: int) -> None:
+        self.items.pop(key, None)
+
+
+STORE = Store(MAX_MESSAGES)
+
+
+async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            op, key, *args = await read_frame(reader)
+            if op == "get":
+                writer.write(pack_frame(STORE.get(key)))
+                await writer.drain()
+            elif op == "set":
+                STORE.set(key, *args)
+            elif op == "delete":
+                STORE.delete(key)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def run(path: str):
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    # Left behind if the last store didn't exit cleanly
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server = asyncio.start_unix_server(serve, path)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(server)
+    loop.run_forever()
@@ -1,9 +1,5 @@
-import errno
-import os
 import re
-import signal
 import typing
-from functools import wraps
 from typing import Any, Generator, Iterable, Optional, Union
 
 import discord
@@ -16,26 +12,6 @@ if typing.TYPE_CHECKING:
     from app.classes.bot import Bot
 
 
-# Decoraters
-def timeout(seconds=10, error_message=os.strerror(errno.ETIME)):
-    def decorator(func):
-        def _handle_timeout(signum, frame):
-            raise TimeoutError(error_message)
-
-        def wrapper(*args, **kwargs):
-            signal.signal(signal.SIGALRM, _handle_timeout)
-            signal.setitimer(signal.ITIMER_REAL, seconds)
-            try:
-                result = func(*args, **kwargs)
-            finally:
-                signal.alarm(0)
-            return result
-
-        return wraps(func)(wrapper)
-
-    return decorator
-
-
 # Functions
 def webhooklog(content: str, url: Optional[str]) -> None:
     if not url:
@@ -112,16 +88,6 @@ def ms(seconds: float) -> float:
     return round(seconds * 1000, 2)
 
 
-def safe_regex(
-    string: str, pattern: str, max_time: float = 0.01
-) -> Optional[re.Match]:
-    @timeout(seconds=max_time)
-    def run_regex(string: str, pattern: str) -> Optional[re.Match]:
-        return re.search(pattern, string)
-
-    return run_regex(string, pattern)
-
-
 def clean_emoji(
     emoji: Union[str, int, discord.Emoji, discord.Reaction]
 ) -> str:
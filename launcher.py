@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import multiprocessing
+import multiprocessing.connection
 import os
 import sys
 import time
@@ -9,7 +10,8 @@ import requests
 from dotenv import load_dotenv
 
 import config
-from app import ipc
+from app import ipc, message_store
+from app.classes.boot_scheduler import BootScheduler
 from app.classes.cluster import Cluster
 from app.utils import webhooklog
 
@@ -18,6 +20,13 @@ load_dotenv()
 WEBHOOK_URL = os.getenv("UPTIME_HOOK")
 TOKEN = os.getenv("TOKEN")
 SHARDS = config.SHARDS
+SHARDS_PER_CLUSTER = config.SHARDS_PER_CLUSTER
+MAX_CONCURRENCY = config.MAX_CONCURRENCY
+
+# Clusters that miss this many heartbeats in a row are restarted
+MISSED_HEARTBEATS = 12
+# Event loop lag, in seconds, that is logged as a warning
+LAG_WARNING = 1
 
 log = logging.getLogger("Cluster#Launcher")
 log.setLevel(logging.DEBUG)
@@ -68,12 +77,21 @@ class Launcher:
         self.alive = True
 
         self.keep_alive = None
+        self.scheduler = None
+        self.rolling_restart_task = None
         self.init = time.perf_counter()
 
-    def get_shard_count(self):
+    def get_gateway_info(self) -> tuple[int, int]:
+        """Returns the shard count and identify concurrency to use."""
+        if SHARDS != 0 and MAX_CONCURRENCY != 0:
+            log.info(
+                f"Launching with {SHARDS} shards, max concurrency "
+                f"{MAX_CONCURRENCY}"
+            )
+            return SHARDS, MAX_CONCURRENCY
         if SHARDS != 0:
             log.info(f"Launching with {SHARDS} shards")
-            return SHARDS
+            return SHARDS, 1
         data = requests.get(
             "https://discordapp.com/api/v7/gateway/bot",
             headers={
@@ -86,11 +104,15 @@ class Launcher:
         )
         data.raise_for_status()
         content = data.json()
+        max_concurrency = MAX_CONCURRENCY or content.get(
+            "session_start_limit", {}
+        ).get("max_concurrency", 1)
         log.info(
-            f"Successfully got shard count of {content['shards']}"
+            f"Successfully got shard count of {content['shards']} and "
+            f"max concurrency of {max_concurrency}"
             f" ({data.status_code, data.reason})"
         )
-        return content["shards"]
+        return content["shards"], max_concurrency
 
     def start(self):
         self.fut = asyncio.ensure_future(self.startup(), loop=self.loop)
@@ -117,8 +139,13 @@ class Launcher:
             self.keep_alive.add_done_callback(self.task_complete)
 
     async def startup(self):
-        shards = list(range(self.get_shard_count()))
-        size = [shards[x : x + 4] for x in range(0, len(shards), 4)]
+        shard_count, max_concurrency = self.get_gateway_info()
+        self.scheduler = BootScheduler(max_concurrency)
+        shards = list(range(shard_count))
+        size = [
+            shards[x : x + SHARDS_PER_CLUSTER]
+            for x in range(0, len(shards), SHARDS_PER_CLUSTER)
+        ]
         log.info(f"Preparing {len(size)} clusters")
         for shard_ids in size:
             self.cluster_queue.append(
@@ -139,52 +166,137 @@ class Launcher:
             cluster.stop()
 
     async def rebooter(self):
+        """Reads heartbeats from the clusters, and restarts the ones that
+        exited or stopped sending them."""
         while self.alive:
-            # log.info("Cycle!")
             if not self.clusters:
                 log.warning("All clusters appear to be dead")
                 asyncio.ensure_future(self.shutdown())
-            to_remove = []
+            await self.read_pipes(timeout=5)
+
             for cluster in self.clusters:
+                if cluster.restarting:
+                    continue
                 if not cluster.process.is_alive():
-                    webhooklog(
-                        f":red_circle: Cluster **{cluster.name}** "
-                        "is offline.",
-                        WEBHOOK_URL,
+                    reason = f"exited with code {cluster.process.exitcode}"
+                elif not cluster.is_responsive(MISSED_HEARTBEATS):
+                    reason = (
+                        f"missed {MISSED_HEARTBEATS} heartbeats "
+                        f"(last loop lag {cluster.loop_lag:.2f}s)"
                     )
-                    # if cluster.process.exitcode != 0:
-                    #    # ignore safe exits
-                    log.info(
-                        f"Cluster#{cluster.name} exited with code "
-                        f"{cluster.process.exitcode}"
-                    )
-                    log.info(f"Restarting cluster#{cluster.name}")
-                    await cluster.start()
-                    # else:
-                    #    log.info(f"Cluster#{cluster.name} found dead")
-                    #    to_remove.append(cluster)
-                    #    cluster.stop()  # ensure stopped
-            for rem in to_remove:
-                self.clusters.remove(rem)
-            await asyncio.sleep(5)
+                else:
+                    if cluster.loop_lag > LAG_WARNING:
+                        log.warning(
+                            f"Cluster#{cluster.name} event loop lag is "
+                            f"{cluster.loop_lag:.2f}s"
+                        )
+                    continue
+                webhooklog(
+                    f":red_circle: Cluster **{cluster.name}** is offline.",
+                    WEBHOOK_URL,
+                )
+                log.info(f"Cluster#{cluster.name} {reason}")
+                self.loop.create_task(self.restart(cluster))
+
+    async def read_pipes(self, timeout: float):
+        """Waits up to `timeout` seconds for messages from the clusters,
+        and handles them."""
+        pipes = {c.pipe: c for c in self.clusters if c.pipe}
+        if not pipes:
+            await asyncio.sleep(timeout)
+            return
+        ready = await self.loop.run_in_executor(
+            None, multiprocessing.connection.wait, list(pipes), timeout
+        )
+        for pipe in ready:
+            cluster = pipes[pipe]
+            # The cluster may have been stopped or restarted while waiting
+            if cluster.pipe is not pipe:
+                continue
+            try:
+                for msg in cluster.read_pipe():
+                    self.on_cluster_message(cluster, msg)
+            except Exception:
+                log.exception(f"Error reading from cluster#{cluster.name}")
+
+    def on_cluster_message(self, cluster: Cluster, msg):
+        if not isinstance(msg, tuple):
+            # The bot sends 1 again whenever it becomes ready
+            return
+        if msg == ("restart", "rolling"):
+            log.info(f"Cluster#{cluster.name} requested a rolling restart")
+            task = self.rolling_restart_task
+            if task and not task.done():
+                log.info("A rolling restart is already running")
+                return
+            self.rolling_restart_task = self.loop.create_task(
+                self.rolling_restart()
+            )
+
+    async def restart(self, cluster: Cluster):
+        cluster.restarting = True
+        try:
+            if cluster.process.is_alive():
+                await cluster.stop_gracefully()
+            log.info(f"Restarting cluster#{cluster.name}")
+            await self.scheduler.start(cluster)
+        finally:
+            cluster.restarting = False
+
+    async def rolling_restart(self):
+        """Restarts the clusters one at a time, so that only the shards
+        of one cluster are offline at once."""
+        started = time.perf_counter()
+        for cluster in list(self.clusters):
+            if not self.alive:
+                return
+            if cluster.restarting:
+                continue
+            await self.restart(cluster)
+        log.info(
+            f"Rolling restart completed in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
 
     async def start_cluster(self):
-        if self.cluster_queue:
-            cluster = self.cluster_queue.pop(0)
+        """Starts every queued cluster, as many at once as the identify
+        concurrency allows."""
+        queue, self.cluster_queue = self.cluster_queue, []
+        started = time.perf_counter()
+
+        async def launch(cluster: Cluster):
             log.info(f"Starting Cluster#{cluster.name}")
-            await cluster.start()
-            log.info("Done!")
+            if await self.scheduler.start(cluster):
+                log.info(f"Cluster#{cluster.name} done!")
+            # Clusters that failed are restarted by the rebooter
             self.clusters.append(cluster)
-            await self.start_cluster()
-        else:
-            log.info("All clusters launched")
+
+        await asyncio.gather(*(launch(c) for c in queue))
+
+        timings = ", ".join(
+            f"{c.name}: "
+            + (f"{c.boot_time:.1f}s" if c.boot_time is not None else "failed")
+            for c in queue
+        )
+        log.info(
+            f"All clusters launched in {time.perf_counter() - started:.1f}s "
+            f"({timings})"
+        )
 
 
 if __name__ == "__main__":
     p = multiprocessing.Process(target=ipc.run, daemon=True)
     p.start()
+    store = None
+    if config.MESSAGE_STORE:
+        store = multiprocessing.Process(
+            target=message_store.run, args=(config.MESSAGE_STORE,), daemon=True
+        )
+        store.start()
     loop = asyncio.get_event_loop()
     webhooklog(":white_circle: Bot logging in...", WEBHOOK_URL)
     Launcher(loop).start()
     p.kill()
+    if store:
+        store.kill()
     webhooklog(":brown_circle: Bot logged out.", WEBHOOK_URL)